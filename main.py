@@ -13,13 +13,22 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from src.database.database_manager import DatabaseManager
 from src.ui.main_application import MainApplication
+from src.utils.log_manager import HANG_FILE, METRICS_FILE, LogManager
+from src.utils.metrics import metrics
+from src.utils.stall_monitor import stall_monitor
 
 class POSApplication:
     def __init__(self):
         self.app = QApplication(sys.argv)
+        self.setup_logging()
         self.setup_application()
         self.init_database()
         
+    def setup_logging(self):
+        """Start logging and the metrics file"""
+        LogManager.setup()
+        metrics.start_exporter(LogManager.file_path(METRICS_FILE))
+        
     def setup_application(self):
         """Setup application properties"""
         self.app.setApplicationName("LKS POS System")
@@ -43,9 +52,15 @@ class POSApplication:
         
     def init_database(self):
         """Initialize database"""
+        if os.environ.get("LKS_POS_SERVER"):
+            # The POS server owns and initializes the database
+            return
+        
         self.db_manager = DatabaseManager()
         self.db_manager.create_tables()
         self.db_manager.create_default_admin()
+        self.db_manager.stock.compact()
+        self.db_manager.change_feed.prune()
         
     def run(self):
         """Run the application"""
@@ -53,7 +68,13 @@ class POSApplication:
         self.main_app = MainApplication()
         self.main_app.show()
         
-        return self.app.exec()
+        # Watches for anything that blocks the event loop started below
+        stall_monitor.start(LogManager.file_path(HANG_FILE))
+        exit_code = self.app.exec()
+        stall_monitor.stop()
+        metrics.stop_exporter()
+        LogManager.shutdown()
+        return exit_code
 
 if __name__ == "__main__":
     app = POSApplication()
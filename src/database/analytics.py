@@ -0,0 +1,306 @@
+"""
+Sales Analytics - Vectorized sales, margin and productivity reporting
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.database.repositories import CategoryRepo
+from src.database.returns import ReturnsManager
+from src.database.rows import ColumnBatch
+
+class SalesAnalytics:
+    """Computes sales analytics over NumPy column arrays.
+
+    Line items are loaded in chunks of whole sales (by sale ID window), so a
+    basket never straddles two chunks. Every metric is an additive aggregate
+    (bincount group-bys), which keeps memory bounded by the chunk size no
+    matter how long the date range is.
+    """
+
+    BASKET_SIZE_CAP = 50  # Baskets with more units than this share the last bin
+
+    def __init__(self, db_manager, chunk_sales: int = 20000):
+        self.db_manager = db_manager
+        self.chunk_sales = chunk_sales
+
+    def iter_line_item_chunks(self, start_date: str, end_date: str, category_id: Optional[int] = None):
+        """Yield line items in the date range as dicts of NumPy arrays, one chunk at a time
+
+        Archived years are read partition by partition, so each join stays
+        on one database file's indexes. category_id limits the items to
+        that category's branch of the category tree.
+        """
+        category_filter = f"AND p.category_id {CategoryRepo.IN_SUBTREE}" if category_id else ""
+        category_params = (category_id,) if category_id else ()
+        for conn, schemas in self.db_manager.archive.reporting_batches(start_date, end_date):
+            cursor = conn.cursor()
+            for schema in schemas:
+                # Lines sold before costs were snapshotted (or archived without the column) use the current cost
+                unit_cost = ("si.unit_cost" if any(row[1] == 'unit_cost' for row in
+                                                   cursor.execute(f"PRAGMA {schema}.table_info(sale_items)"))
+                             else "NULL")
+                # Returned units come off their lines; restocked ones off the cost too
+                returned = ReturnsManager.returned_units_sql(conn, schema)
+                restocked = ReturnsManager.returned_units_sql(conn, schema, restocked_only=True)
+                cursor.execute(f'''
+                    SELECT MIN(id), MAX(id) FROM {schema}.sales
+                    WHERE created_at >= ? AND created_at < DATE(?, '+1 day')
+                ''', (start_date, end_date))
+                first_id, last_id = cursor.fetchone()
+                if first_id is None:
+                    continue
+
+                for low_id in range(first_id, last_id + 1, self.chunk_sales):
+                    cursor.execute(f'''
+                        SELECT si.sale_id, si.quantity - {returned} AS quantity,
+                               si.total_price * (si.quantity - {returned}) * 1.0 / si.quantity AS total_price,
+                               (si.quantity - {restocked}) * COALESCE({unit_cost}, p.cost_price, 0) AS line_cost,
+                               COALESCE(p.category_id, 0) AS category_id,
+                               s.user_id,
+                               CAST(strftime('%H', s.created_at, 'localtime') AS INTEGER) AS hour,
+                               CAST(strftime('%w', s.created_at, 'localtime') AS INTEGER) AS weekday
+                        FROM {schema}.sales s
+                        JOIN {schema}.sale_items si ON si.sale_id = s.id
+                        LEFT JOIN main.products p ON si.product_id = p.id
+                        WHERE s.id BETWEEN ? AND ?
+                          AND s.created_at >= ? AND s.created_at < DATE(?, '+1 day')
+                          {category_filter}
+                    ''', (low_id, low_id + self.chunk_sales - 1, start_date, end_date, *category_params))
+
+                    batch = ColumnBatch.from_cursor(cursor)
+                    if len(batch):
+                        yield {name: np.asarray(column, dtype=np.float64 if name in ('total_price', 'line_cost') else np.int64)
+                               for name, column in batch.to_numpy().items()}
+
+    @staticmethod
+    def accumulate(total: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Add a bincount result into a running total, growing it when needed"""
+        if len(values) > len(total):
+            total = np.pad(total, (0, len(values) - len(total)))
+        total[:len(values)] += values
+        return total
+
+    def compute(self, start_date: str, end_date: str, category_id: Optional[int] = None) -> Dict:
+        """Compute the full analytics report for a date range (served from the report cache when current)
+
+        category_id limits the report to the sales of one branch of the category tree.
+        """
+        return self.db_manager.report_cache.get_or_compute(
+            'sales_analytics', start_date, end_date,
+            lambda: self.compute_uncached(start_date, end_date, category_id),
+            filters={'category_id': category_id} if category_id else None
+        )
+
+    def compute_uncached(self, start_date: str, end_date: str, category_id: Optional[int] = None) -> Dict:
+        """Compute the full analytics report for a date range"""
+        revenue = cost = 0.0
+        units = line_items = transactions = 0
+
+        category_revenue = np.zeros(0)
+        category_cost = np.zeros(0)
+        cashier_revenue = np.zeros(0)
+        cashier_cost = np.zeros(0)
+        cashier_units = np.zeros(0)
+        cashier_transactions = np.zeros(0)
+        heatmap_revenue = np.zeros(7 * 24)
+        heatmap_transactions = np.zeros(7 * 24)
+        basket_sizes = np.zeros(self.BASKET_SIZE_CAP + 1)
+
+        for chunk in self.iter_line_item_chunks(start_date, end_date, category_id):
+            total_price = chunk['total_price']
+            line_cost = chunk['line_cost']
+            quantity = chunk['quantity']
+
+            revenue += total_price.sum()
+            cost += line_cost.sum()
+            units += int(quantity.sum())
+            line_items += len(total_price)
+
+            category_revenue = self.accumulate(category_revenue, np.bincount(chunk['category_id'], weights=total_price))
+            category_cost = self.accumulate(category_cost, np.bincount(chunk['category_id'], weights=line_cost))
+
+            # Per-sale (basket) aggregates
+            sale_ids, first_index, sale_index = np.unique(chunk['sale_id'], return_index=True, return_inverse=True)
+            transactions += len(sale_ids)
+            basket_units = np.bincount(sale_index, weights=quantity)
+            basket_sizes += np.bincount(np.minimum(basket_units.astype(np.int64), self.BASKET_SIZE_CAP),
+                                        minlength=self.BASKET_SIZE_CAP + 1)
+
+            slot = chunk['weekday'] * 24 + chunk['hour']
+            heatmap_revenue += np.bincount(slot, weights=total_price, minlength=7 * 24)
+            heatmap_transactions += np.bincount(slot[first_index], minlength=7 * 24)
+
+            user_id = chunk['user_id']
+            cashier_revenue = self.accumulate(cashier_revenue, np.bincount(user_id, weights=total_price))
+            cashier_cost = self.accumulate(cashier_cost, np.bincount(user_id, weights=line_cost))
+            cashier_units = self.accumulate(cashier_units, np.bincount(user_id, weights=quantity))
+            cashier_transactions = self.accumulate(cashier_transactions, np.bincount(user_id[first_index]))
+
+        gross_profit = revenue - cost
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'category_id': category_id,
+            'revenue': float(revenue),
+            'cost': float(cost),
+            'gross_profit': float(gross_profit),
+            'margin': float(gross_profit / revenue) if revenue else 0.0,
+            'transactions': transactions,
+            'line_items': line_items,
+            'units': units,
+            'avg_basket_value': float(revenue / transactions) if transactions else 0.0,
+            'avg_basket_units': float(units / transactions) if transactions else 0.0,
+            'categories': self.category_rows(category_revenue, category_cost),
+            'cashiers': self.cashier_rows(cashier_revenue, cashier_cost, cashier_units, cashier_transactions),
+            'heatmap_revenue': heatmap_revenue.reshape(7, 24),
+            'heatmap_transactions': heatmap_transactions.reshape(7, 24),
+            'basket_sizes': basket_sizes,
+        }
+
+    def lookup_names(self, query: str) -> Dict[int, str]:
+        """Load an id -> name mapping"""
+        conn = self.db_manager.get_connection()
+        try:
+            return {row[0]: row[1] for row in conn.execute(query).fetchall()}
+        finally:
+            conn.close()
+
+    def category_closure(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Every (ancestor, descendant) pair of the category tree as two arrays"""
+        conn = self.db_manager.get_connection()
+        try:
+            pairs = np.array(conn.execute("SELECT ancestor_id, descendant_id FROM category_closure").fetchall(),
+                             dtype=np.int64).reshape(-1, 2)
+        finally:
+            conn.close()
+        return pairs[:, 0], pairs[:, 1]
+
+    def category_rows(self, revenue: np.ndarray, cost: np.ndarray) -> List[Dict]:
+        """Build per-category margin rows rolled up over the category tree
+
+        A category's revenue, cost and margin cover its whole branch;
+        own_revenue is what was sold from products filed directly under it.
+        The roll-up is one bincount over the closure pairs. Rows come
+        depth-first with the biggest branch first among siblings, and
+        branches without sales are left out.
+        """
+        ancestors, descendants = self.category_closure()
+        size = max(len(revenue), int(descendants.max()) + 1 if len(descendants) else 0)
+        revenue = np.pad(revenue, (0, size - len(revenue)))
+        cost = np.pad(cost, (0, size - len(cost)))
+
+        branch_revenue = np.bincount(ancestors, weights=revenue[descendants], minlength=size)
+        branch_cost = np.bincount(ancestors, weights=cost[descendants], minlength=size)
+        # Uncategorized sales (ID 0) and deleted categories are not in the tree and stand alone
+        outside = np.ones(size, dtype=bool)
+        outside[descendants] = False
+        branch_revenue[outside] = revenue[outside]
+        branch_cost[outside] = cost[outside]
+
+        profit = branch_revenue - branch_cost
+        margin = np.divide(profit, branch_revenue, out=np.zeros_like(profit), where=branch_revenue != 0)
+
+        categories = {category['id']: category for category in self.db_manager.category_registry.list()}
+        children: Dict[Optional[int], List[int]] = {}
+        for category_id in np.flatnonzero(branch_revenue):
+            category = categories.get(int(category_id))
+            parent_id = category['parent_id'] if category and category['parent_id'] in categories else None
+            children.setdefault(parent_id, []).append(int(category_id))
+        for siblings in children.values():
+            siblings.sort(key=lambda category_id: -branch_revenue[category_id])
+
+        rows = []
+        stack = [(category_id, 0) for category_id in reversed(children.get(None, []))]
+        while stack:
+            category_id, depth = stack.pop()
+            category = categories.get(category_id)
+            rows.append({
+                'category_id': category_id,
+                'category_name': category['name'] if category else "Uncategorized",
+                'parent_id': category['parent_id'] if category else None,
+                'depth': depth,
+                'revenue': float(branch_revenue[category_id]),
+                'cost': float(branch_cost[category_id]),
+                'gross_profit': float(profit[category_id]),
+                'margin': float(margin[category_id]),
+                'own_revenue': float(revenue[category_id]),
+            })
+            stack.extend((child_id, depth + 1) for child_id in reversed(children.get(category_id, [])))
+        return rows
+
+    def cashier_rows(self, revenue: np.ndarray, cost: np.ndarray, units: np.ndarray,
+                     transactions: np.ndarray) -> List[Dict]:
+        """Build per-cashier productivity rows, highest revenue first"""
+        names = self.lookup_names("SELECT id, full_name FROM users")
+        avg_sale = np.divide(revenue, transactions, out=np.zeros_like(revenue), where=transactions != 0)
+
+        rows = []
+        for user_id in np.flatnonzero(transactions)[np.argsort(-revenue[transactions != 0])]:
+            rows.append({
+                'user_id': int(user_id),
+                'cashier_name': names.get(int(user_id), f"User #{user_id}"),
+                'transactions': int(transactions[user_id]),
+                'revenue': float(revenue[user_id]),
+                'gross_profit': float(revenue[user_id] - cost[user_id]),
+                'units': int(units[user_id]),
+                'avg_sale': float(avg_sale[user_id]),
+            })
+        return rows
+
+WEEKDAY_NAMES = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
+
+def format_report(report: Dict) -> str:
+    """Format an analytics report as plain text"""
+    lines = [
+        f"Sales analytics {report['start_date']} to {report['end_date']}",
+        f"  Revenue:       {report['revenue']:.2f}",
+        f"  Gross profit:  {report['gross_profit']:.2f} ({report['margin'] * 100:.1f}%)",
+        f"  Transactions:  {report['transactions']}",
+        f"  Avg basket:    {report['avg_basket_value']:.2f} ({report['avg_basket_units']:.1f} units)",
+        "",
+        "Margin by category:",
+    ]
+    for row in report['categories']:
+        lines.append(f"  {'  ' * row['depth'] + row['category_name']:<24} {row['revenue']:>12.2f} {row['gross_profit']:>12.2f} "
+                     f"{row['margin'] * 100:>6.1f}%")
+
+    lines += ["", "Cashier productivity:"]
+    for row in report['cashiers']:
+        lines.append(f"  {row['cashier_name']:<24} {row['transactions']:>6} sales {row['revenue']:>12.2f} "
+                     f"avg {row['avg_sale']:.2f}")
+
+    heatmap = report['heatmap_revenue']
+    if heatmap.any():
+        weekday, hour = np.unravel_index(np.argmax(heatmap), heatmap.shape)
+        lines += ["", f"Busiest hour: {WEEKDAY_NAMES[weekday]} {hour:02d}:00 ({heatmap[weekday, hour]:.2f})"]
+
+    return "\n".join(lines)
+
+def main(argv=None):
+    """Command line entry point: python -m src.database.analytics START END"""
+    from src.database.database_manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="LKS POS sales analytics")
+    parser.add_argument("start_date", help="First day (YYYY-MM-DD)")
+    parser.add_argument("end_date", help="Last day (YYYY-MM-DD)")
+    parser.add_argument("--db", default="pos_system.db", help="Database path")
+    parser.add_argument("--category", type=int, help="Only this category and its subcategories")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = SalesAnalytics(DatabaseManager(args.db)).compute(args.start_date, args.end_date, args.category)
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2,
+                  default=lambda value: value.tolist() if isinstance(value, np.ndarray) else str(value))
+        print()
+    else:
+        print(format_report(report))
+
+if __name__ == "__main__":
+    main()
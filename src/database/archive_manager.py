@@ -0,0 +1,336 @@
+"""
+Archive Manager - Moves closed sales periods into per-year archive databases
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+class ArchiveManager:
+    """Keeps the live database small by moving old history into yearly archives.
+
+    Sales (with their line items, payments and returns) and activity logs older than the retention
+    period are moved, one calendar month per transaction, into
+    ``pos_archive_<year>.db`` files. Rows keep their ids, so the archives and
+    the live tables never overlap.
+
+    Reads that may reach into history go through ``reporting_batches``,
+    which attaches only the archive years a date range touches (as many at
+    a time as SQLite allows) and exposes
+    ``all_sales``, ``all_sale_items``, ``all_payments``, ``all_returns``,
+    ``all_return_items`` and ``all_activity_logs`` views that union them
+    with the live tables.
+    """
+
+    ARCHIVED_TABLES = ('sales', 'sale_items', 'payments', 'returns', 'return_items', 'activity_logs')
+    ARCHIVE_FILE_PATTERN = re.compile(r"^pos_archive_(\d{4})\.db$")
+
+    SETTING_DEFAULTS = {
+        'archive_directory': '',
+        'archive_retention_months': '13',
+    }
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    @property
+    def directory(self) -> str:
+        """Directory holding the archive files (setting, or an archive folder next to the database)"""
+        return self.db_manager.get_setting('archive_directory') or os.path.join(
+            os.path.dirname(os.path.abspath(self.db_manager.db_path)), "archive")
+
+    @property
+    def retention_months(self) -> int:
+        """Number of months of history kept in the live database"""
+        value = self.db_manager.get_setting('archive_retention_months')
+        return max(1, int(value or self.SETTING_DEFAULTS['archive_retention_months']))
+
+    def archive_path(self, year: str) -> str:
+        """Get the archive file for a year"""
+        return os.path.join(self.directory, f"pos_archive_{year}.db")
+
+    def archive_files(self, start_date: Optional[str] = None,
+                      end_date: Optional[str] = None) -> List[Tuple[str, str]]:
+        """List (year, path) of the archives overlapping a date range, newest first"""
+        directory = self.directory
+        if not os.path.isdir(directory):
+            return []
+
+        archives = []
+        for name in os.listdir(directory):
+            match = self.ARCHIVE_FILE_PATTERN.match(name)
+            if not match:
+                continue
+            year = match.group(1)
+            if (start_date and year < start_date[:4]) or (end_date and year > end_date[:4]):
+                continue
+            archives.append((year, os.path.join(directory, name)))
+        return sorted(archives, reverse=True)
+
+    @staticmethod
+    def cutoff_date(retention_months: int, today: Optional[datetime] = None) -> str:
+        """First day (UTC) of the oldest month kept live; everything before it is archived"""
+        today = today or datetime.now(timezone.utc)
+        month_index = today.year * 12 + (today.month - 1) - retention_months
+        return f"{month_index // 12:04d}-{month_index % 12 + 1:02d}-01"
+
+    # Archiving
+
+    def archive(self, retention_months: Optional[int] = None, vacuum: bool = False,
+                progress=None) -> Dict:
+        """Move whole months older than the retention period into the yearly archives
+
+        Each month is moved in its own transaction, so tills are only blocked
+        briefly and an interrupted run simply resumes where it stopped.
+        progress, if given, is called as progress(month, months_done, months_total).
+        Returns a summary dict with the cutoff and the number of rows moved.
+        """
+        cutoff = self.cutoff_date(retention_months or self.retention_months)
+
+        conn = self.db_manager.get_connection()
+        try:
+            months = sorted({row[0] for row in conn.execute('''
+                SELECT DISTINCT substr(created_at, 1, 7) FROM sales WHERE created_at < ?
+                UNION
+                SELECT DISTINCT substr(created_at, 1, 7) FROM activity_logs WHERE created_at < ?
+            ''', (cutoff, cutoff)).fetchall()})
+        finally:
+            conn.close()
+
+        moved = dict.fromkeys(self.ARCHIVED_TABLES, 0)
+        for done, month in enumerate(months, 1):
+            for table, count in self.archive_month(month).items():
+                moved[table] += count
+            if progress:
+                progress(month, done, len(months))
+
+        if months:
+            # Cached reports are stale
+            self.db_manager.report_cache.clear()
+
+        if vacuum and months:
+            self.vacuum()
+
+        return {'cutoff': cutoff, 'months': months, 'moved': moved}
+
+    def archive_month(self, month: str) -> Dict[str, int]:
+        """Move one month (YYYY-MM) of sales, line items, payments, returns and activity logs into its year's archive"""
+        path = self.archive_path(month[:4])
+        self.ensure_archive(path)
+
+        month_start = f"{month}-01"
+        conn = self.db_manager.get_connection()
+        conn.isolation_level = None
+        try:
+            conn.execute("ATTACH DATABASE ? AS archive", (path,))
+            try:
+                self.sync_columns(conn)
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    moved = self.move_rows(conn, month_start)
+                    # The deletes reach the backups only through a new full snapshot
+                    self.db_manager.backup_scheduler.mark_full_required(conn)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            finally:
+                conn.execute("DETACH DATABASE archive")
+        finally:
+            conn.close()
+        return moved
+
+    @staticmethod
+    def move_rows(conn, month_start: str) -> Dict[str, int]:
+        """Copy a month's rows into the attached archive and delete them from the live tables"""
+        sale_range = "SELECT id FROM main.sales WHERE created_at >= ? AND created_at < DATE(?, '+1 month')"
+        return_range = f"SELECT id FROM main.returns WHERE sale_id IN ({sale_range})"
+        filters = {
+            'sales': ("created_at >= ? AND created_at < DATE(?, '+1 month')", (month_start, month_start)),
+            'sale_items': (f"sale_id IN ({sale_range})", (month_start, month_start)),
+            'payments': (f"sale_id IN ({sale_range})", (month_start, month_start)),
+            # Returns follow the sale they refund, whenever they were made, so return_items never outlive their lines
+            'returns': (f"sale_id IN ({sale_range})", (month_start, month_start)),
+            'return_items': (f"return_id IN ({return_range})", (month_start, month_start)),
+            'activity_logs': ("created_at >= ? AND created_at < DATE(?, '+1 month')", (month_start, month_start)),
+        }
+
+        moved = {}
+        # Children first, while the rows they are selected by are still there
+        for table in ('return_items', 'returns', 'sale_items', 'payments', 'sales', 'activity_logs'):
+            condition, params = filters[table]
+            columns = ", ".join(f'"{row[1]}"' for row in conn.execute(f"PRAGMA main.table_info({table})"))
+            cursor = conn.execute(f"INSERT OR REPLACE INTO archive.{table} ({columns}) "
+                                  f"SELECT {columns} FROM main.{table} WHERE {condition}", params)
+            moved[table] = cursor.rowcount
+            conn.execute(f"DELETE FROM main.{table} WHERE {condition}", params)
+        return moved
+
+    def ensure_archive(self, path: str):
+        """Create an archive file with the live tables' schema if it does not exist yet"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        live = self.db_manager.get_connection()
+        try:
+            schema = live.execute(f'''
+                SELECT type, name, sql FROM sqlite_master
+                WHERE tbl_name IN ({", ".join("?" for _ in self.ARCHIVED_TABLES)})
+                  AND type IN ('table', 'index') AND sql IS NOT NULL
+                ORDER BY type DESC
+            ''', self.ARCHIVED_TABLES).fetchall()
+        finally:
+            live.close()
+
+        conn = sqlite3.connect(path)
+        try:
+            existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+            for _, name, sql in schema:
+                if name not in existing:
+                    conn.execute(sql)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def sync_columns(self, conn):
+        """Add columns added to the live tables since the attached archive was created"""
+        for table in self.ARCHIVED_TABLES:
+            archive_columns = {row[1] for row in conn.execute(f"PRAGMA archive.table_info({table})")}
+            for row in conn.execute(f"PRAGMA main.table_info({table})").fetchall():
+                if row[1] not in archive_columns:
+                    conn.execute(f'ALTER TABLE archive.{table} ADD COLUMN "{row[1]}" {row[2]}')
+
+    def vacuum(self):
+        """Give the space freed by archiving back to the filesystem (locks the database while it runs)"""
+        conn = self.db_manager.get_connection()
+        try:
+            conn.isolation_level = None
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+
+    # Reading across the live and archived data
+
+    def attach_limit(self) -> int:
+        """Number of archives one connection can attach (SQLITE_LIMIT_ATTACHED)"""
+        conn = sqlite3.connect(":memory:")
+        try:
+            return conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        finally:
+            conn.close()
+
+    @contextmanager
+    def reporting_connection(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                             archives: Optional[List[Tuple[str, str]]] = None, include_main: bool = True):
+        """Lease a connection with the archives for a date range attached
+
+        Yields (conn, schemas) where schemas lists 'main' followed by the
+        attached archive schemas, newest first. The connection also has
+        an ``all_<table>`` view over all of them for each archived table.
+        archives overrides the (year, path) list picked by the range, and
+        include_main=False leaves the live tables out of the schemas and
+        views. More archives than SQLite can attach raise
+        sqlite3.OperationalError; use ``reporting_batches`` for such ranges.
+        """
+        if archives is None:
+            archives = self.archive_files(start_date, end_date)
+        limit = self.attach_limit()
+        if len(archives) > limit:
+            raise sqlite3.OperationalError(
+                f"{len(archives)} archives overlap the range but only {limit} can be attached at once")
+
+        conn = self.db_manager.get_connection()
+        schemas = ['main'] if include_main else []
+        attached = []
+        try:
+            for year, path in archives:
+                schema = f"archive_{year}"
+                conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+                attached.append(schema)
+                schemas.append(schema)
+            self.create_views(conn, schemas)
+            yield conn, schemas
+        finally:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+                for table in self.ARCHIVED_TABLES:
+                    conn.execute(f"DROP VIEW IF EXISTS temp.all_{table}")
+                for schema in attached:
+                    conn.execute(f"DETACH DATABASE {schema}")
+            finally:
+                conn.close()
+
+    def reporting_batches(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                          include_main: bool = True) -> Iterator[Tuple[sqlite3.Connection, List[str]]]:
+        """Yield reporting connections covering a date range, newest data first
+
+        The archives are attached as many at a time as SQLite allows, so
+        long ranges (or no range at all) read every year without hitting
+        the attach limit. 'main' is only in the first batch's schemas.
+        Without a range every archive is covered.
+        """
+        archives = self.archive_files(start_date, end_date)
+        limit = self.attach_limit()
+        while include_main or archives:
+            batch, archives = archives[:limit], archives[limit:]
+            with self.reporting_connection(archives=batch, include_main=include_main) as leased:
+                yield leased
+            include_main = False
+
+    def create_views(self, conn, schemas: List[str]):
+        """Create temp views unioning each archived table across the schemas"""
+        for table in self.ARCHIVED_TABLES:
+            columns = [row[1] for row in conn.execute(f"PRAGMA main.table_info({table})")]
+            selects = []
+            for schema in schemas:
+                present = {row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")}
+                if not present:
+                    # Archived before the table existed
+                    continue
+                # Archives made before a column was added read it as NULL
+                column_list = ", ".join(f'"{column}"' if column in present else f'NULL AS "{column}"'
+                                        for column in columns)
+                selects.append(f"SELECT {column_list} FROM {schema}.{table}")
+            if not selects:
+                # None of the schemas has the table (an archive-only batch of old years)
+                selects.append("SELECT " + ", ".join(f'NULL AS "{column}"' for column in columns) + " WHERE 0")
+            conn.execute(f"CREATE TEMP VIEW IF NOT EXISTS all_{table} AS {' UNION ALL '.join(selects)}")
+
+    def get_archive_summary(self) -> List[Dict]:
+        """Describe each archive file: year, size and row counts"""
+        summary = []
+        for year, path in self.archive_files():
+            conn = sqlite3.connect(path)
+            try:
+                existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+                counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                          if table in existing else 0
+                          for table in self.ARCHIVED_TABLES}
+            finally:
+                conn.close()
+            summary.append(dict(counts, year=year, path=path, size=os.path.getsize(path)))
+        return summary
+
+def main(argv=None):
+    """Command line entry point: python -m src.database.archive_manager [--months N]"""
+    from src.database.database_manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="LKS POS sales archival")
+    parser.add_argument("--db", default="pos_system.db", help="Database path")
+    parser.add_argument("--months", type=int, help="Months of history to keep live (default: setting, 13)")
+    parser.add_argument("--vacuum", action="store_true", help="Shrink the live database afterwards")
+    args = parser.parse_args(argv)
+
+    archive = DatabaseManager(args.db).archive
+    result = archive.archive(args.months, vacuum=args.vacuum,
+                             progress=lambda month, done, total: print(f"Archived {month} ({done}/{total})"))
+
+    print(f"Archived everything before {result['cutoff']}: "
+          + ", ".join(f"{count} {table}" for table, count in result['moved'].items()))
+
+if __name__ == "__main__":
+    main()
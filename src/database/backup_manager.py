@@ -0,0 +1,732 @@
+"""
+Backup Manager - Online, scheduled and incremental backups of the live database
+"""
+
+import gzip
+import json
+import logging
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class BackupError(Exception):
+    """Raised when a backup cannot be created or fails verification"""
+
+class RestoreError(BackupError):
+    """Raised when a backup is not fit to be restored"""
+
+class BackupInProgress(BackupError):
+    """Raised when another process is already backing up to the same directory"""
+
+class BackupRestarted(Exception):
+    """Internal signal that a stepped backup keeps restarting under write load"""
+
+class BackupEngine:
+    """Creates consistent copies of the live database while it stays in use.
+
+    The copy is made with ``sqlite3.Connection.backup`` a few pages at a
+    time, sleeping between steps so tills can keep committing sales. The
+    result is written to a temporary file, optionally integrity-checked and
+    compressed, and only then moved to its final name, so a failed backup
+    never leaves a half-written file behind.
+
+    SQLite restarts a stepped backup whenever another connection writes to
+    the source. After ``max_restarts`` restarts the remaining copy is done in
+    a single step, which briefly holds a read lock but always finishes.
+    """
+
+    def __init__(self, db_manager, pages_per_step: int = 256, step_sleep: float = 0.005,
+                 max_restarts: int = 3):
+        self.db_manager = db_manager
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+        self.max_restarts = max_restarts
+
+    def create_backup(self, destination: str, compress: bool = False, verify: bool = True,
+                      progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """Back up the database to ``destination``
+
+        progress, if given, is called as progress(pages_copied, total_pages).
+        Returns a summary dict with the final path, size and timings.
+        """
+        started = time.monotonic()
+        temp_path = f"{destination}.partial"
+
+        state = {'remaining': None, 'restarts': 0}
+
+        def report_progress(status, remaining, total):
+            if state['remaining'] is not None and remaining > state['remaining']:
+                state['restarts'] += 1
+                if state['restarts'] > self.max_restarts:
+                    raise BackupRestarted()
+            state['remaining'] = remaining
+            if progress:
+                progress(total - remaining, total)
+
+        try:
+            # A pooled source connection means a restore waits for the copy to finish
+            source = self.db_manager.get_connection()
+            target = sqlite3.connect(temp_path)
+            try:
+                try:
+                    source.backup(target, pages=self.pages_per_step, progress=report_progress,
+                                  sleep=self.step_sleep)
+                except BackupRestarted:
+                    source.backup(target, pages=-1)
+                page_count = target.execute("PRAGMA page_count").fetchone()[0]
+                if progress:
+                    progress(page_count, page_count)
+            finally:
+                target.close()
+                source.close()
+
+            if verify:
+                self.verify_database(temp_path)
+
+            if compress:
+                with open(temp_path, 'rb') as raw_file, gzip.open(destination, 'wb', compresslevel=6) as gz_file:
+                    shutil.copyfileobj(raw_file, gz_file, 1024 * 1024)
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, destination)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return {
+            'path': destination,
+            'size': os.path.getsize(destination),
+            'pages': page_count,
+            'compressed': compress,
+            'verified': verify,
+            'duration': time.monotonic() - started,
+        }
+
+    @staticmethod
+    def verify_database(path: str, quick: bool = False):
+        """Run an integrity check on a database file, raising BackupError if it fails"""
+        conn = sqlite3.connect(path)
+        try:
+            pragma = "quick_check" if quick else "integrity_check"
+            results = [row[0] for row in conn.execute(f"PRAGMA {pragma}").fetchall()]
+        except sqlite3.DatabaseError as e:
+            raise BackupError(f"{path} is not a valid database: {e}") from e
+        finally:
+            conn.close()
+
+        if results != ['ok']:
+            raise BackupError(f"Integrity check failed for {path}: {'; '.join(results[:5])}")
+
+class BackupScheduler:
+    """Takes periodic backups as generations of one full snapshot plus row deltas.
+
+    A generation is a directory holding a full copy made with BackupEngine,
+    followed by small incremental files. Each incremental is a SQLite file
+    containing only what changed since the previous watermark:
+
+    * append-only tables: rows whose id is above the last exported id
+    * timestamped tables: rows whose change column is at or after the last run
+    * every other table: a full copy (these are small lookup tables)
+
+    so hourly protection of a multi-GB database costs a few pages of I/O.
+    Every ``backup_full_every`` incrementals a new generation is started and
+    only the newest ``backup_retention_generations`` generations are kept.
+    The schedule is configured through the ``settings`` table and re-read on
+    every run, so changes made in the Settings screen apply without restart.
+    """
+
+    APPEND_ONLY_TABLES = ('sales', 'sale_items', 'payments', 'returns', 'return_items', 'activity_logs',
+                          'stock_movements', 'stock_checkpoints', 'change_log', 'goods_receipts', 'goods_receipt_items')
+    TIMESTAMPED_TABLES = {'products': 'updated_at', 'demand_forecasts': 'generated_at',
+                          'purchase_orders': 'updated_at', 'purchase_order_items': 'updated_at'}
+    # Written by triggers when the other tables are applied; the delta's own rows are authoritative
+    TRIGGER_FED_TABLES = ('change_log',)
+
+    # Append-only rows that a later append-only row updates: (table, referencing table, column)
+    TOUCHED_BY = {'sales': ('returns', 'sale_id')}
+
+    SETTING_DEFAULTS = {
+        'backup_schedule_enabled': '1',
+        'backup_directory': '',
+        'backup_interval_minutes': '60',
+        'backup_full_every': '24',
+        'backup_retention_generations': '7',
+        'backup_compress': '0',
+    }
+
+    # Set by whatever deletes or replaces rows, in the settings so every process sharing the file sees it
+    FULL_REQUIRED_SETTING = 'backup_full_required'
+
+    MANIFEST_NAME = "manifest.json"
+    LOCK_NAME = "backup.lock"
+    # A lock file this old was left behind by a process that died mid-backup
+    STALE_LOCK_SECONDS = 6 * 3600
+    POLL_SECONDS = 60
+
+    def __init__(self, db_manager, engine: Optional[BackupEngine] = None):
+        self.db_manager = db_manager
+        self.engine = engine or BackupEngine(db_manager)
+        self.run_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.last_result: Optional[Dict] = None
+        self.last_error: Optional[str] = None
+
+    def load_config(self) -> Dict:
+        """Read the schedule configuration from settings, falling back to defaults"""
+        values = {}
+        for key, default in self.SETTING_DEFAULTS.items():
+            value = self.db_manager.get_setting(key)
+            values[key] = default if value in (None, "") else value
+
+        directory = values['backup_directory'] or os.path.join(
+            os.path.dirname(os.path.abspath(self.db_manager.db_path)), "backups")
+
+        return {
+            'enabled': values['backup_schedule_enabled'] == '1',
+            'directory': directory,
+            'interval': max(1, int(values['backup_interval_minutes'])) * 60,
+            'full_every': max(0, int(values['backup_full_every'])),
+            'retention': max(1, int(values['backup_retention_generations'])),
+            'compress': values['backup_compress'] == '1',
+        }
+
+    # Scheduling
+
+    def start(self):
+        """Start the background scheduling thread"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run_loop, name="backup-scheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the scheduling thread, letting a running backup finish"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def run_loop(self):
+        """Wake up periodically and run a backup whenever one is due"""
+        while not self.stop_event.is_set():
+            wait = self.POLL_SECONDS
+            try:
+                config = self.load_config()
+                if config['enabled']:
+                    remaining = self.seconds_until_due(config)
+                    if remaining <= 0:
+                        self.run_once(config)
+                    else:
+                        wait = min(wait, remaining)
+            except BackupInProgress as e:
+                logger.info("Scheduled backup skipped: %s", e)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error("Scheduled backup failed: %s", e)
+            self.stop_event.wait(wait)
+
+    def seconds_until_due(self, config: Dict) -> float:
+        """Get the number of seconds until the next scheduled backup"""
+        latest = self.latest_generation(config['directory'])
+        if latest is None:
+            return 0
+        return latest['last_backup_at'] + config['interval'] - time.time()
+
+    def run_once(self, config: Optional[Dict] = None, full: bool = False) -> Dict:
+        """Take the next backup of the schedule: a new generation or an incremental
+
+        Returns a summary dict including 'kind' ('full' or 'incremental').
+        """
+        config = config or self.load_config()
+        with self.run_lock:
+            os.makedirs(config['directory'], exist_ok=True)
+            with self.directory_lock(config['directory']):
+                latest = self.latest_generation(config['directory'])
+                required = self.full_required()
+
+                if (full or required or latest is None
+                        or len(latest['manifest']['incrementals']) >= config['full_every']):
+                    # Cleared before the snapshot starts, so rows deleted while it runs require the next one
+                    if required:
+                        self.set_full_required(False)
+                    try:
+                        result = self.create_generation(config)
+                    except Exception:
+                        if required:
+                            self.set_full_required(True)
+                        raise
+                    self.prune(config['directory'], config['retention'])
+                else:
+                    result = self.create_incremental(latest['path'], latest['manifest'])
+
+            self.last_result = result
+            self.last_error = None
+            return result
+
+    @contextmanager
+    def directory_lock(self, directory: str):
+        """Hold the backup directory's lock file for the length of a run
+
+        Every process opening the database runs a scheduler, so the lock
+        keeps two of them from writing the same generations at once.
+        Raises BackupInProgress if another process holds it.
+        """
+        path = os.path.join(directory, self.LOCK_NAME)
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                stale = time.time() - os.path.getmtime(path) > self.STALE_LOCK_SECONDS
+            except FileNotFoundError:
+                stale = True
+            if not stale:
+                raise BackupInProgress(f"Another process is backing up to {directory}")
+            logger.warning("Removing stale backup lock %s", path)
+            try:
+                os.remove(path)
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except (FileNotFoundError, FileExistsError):
+                raise BackupInProgress(f"Another process is backing up to {directory}")
+
+        try:
+            os.write(fd, f"{socket.gethostname()} {os.getpid()}\n".encode("utf-8"))
+            os.close(fd)
+            yield
+        finally:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def full_required(self) -> bool:
+        """Whether rows were deleted or replaced since the last full snapshot"""
+        return self.db_manager.get_setting(self.FULL_REQUIRED_SETTING) == '1'
+
+    @classmethod
+    def mark_full_required(cls, conn):
+        """Require a new generation on the next run, in the caller's transaction
+
+        Deletes cannot be expressed as incremental deltas, so code that
+        deletes rows calls this before committing.
+        """
+        conn.execute("INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES (?, '1', CURRENT_TIMESTAMP)",
+                     (cls.FULL_REQUIRED_SETTING,))
+
+    def set_full_required(self, required: bool):
+        """Set or clear the flag that forces the next run to start a new generation"""
+        self.db_manager.update_setting(self.FULL_REQUIRED_SETTING, '1' if required else '0')
+
+    def request_full(self):
+        """Start a new generation on the next run (e.g. after the database was replaced)"""
+        self.set_full_required(True)
+
+    # Generations
+
+    def list_generations(self, directory: Optional[str] = None) -> List[Dict]:
+        """List complete generations, oldest first"""
+        directory = directory or self.load_config()['directory']
+        if not os.path.isdir(directory):
+            return []
+
+        generations = []
+        for name in sorted(os.listdir(directory)):
+            manifest_path = os.path.join(directory, name, self.MANIFEST_NAME)
+            if not name.startswith("gen-") or not os.path.exists(manifest_path):
+                continue
+            with open(manifest_path, 'r', encoding='utf-8') as manifest_file:
+                manifest = json.load(manifest_file)
+            incrementals = manifest['incrementals']
+            generations.append({
+                'name': name,
+                'path': os.path.join(directory, name),
+                'manifest': manifest,
+                'last_backup_at': incrementals[-1]['timestamp'] if incrementals else manifest['full']['timestamp'],
+                'size': manifest['full']['size'] + sum(item['size'] for item in incrementals),
+            })
+        return generations
+
+    def latest_generation(self, directory: str) -> Optional[Dict]:
+        """Get the newest complete generation, or None"""
+        generations = self.list_generations(directory)
+        return generations[-1] if generations else None
+
+    def create_generation(self, config: Dict) -> Dict:
+        """Start a new generation with a full snapshot"""
+        started = time.monotonic()
+        name = f"gen-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        while os.path.exists(os.path.join(config['directory'], name)):
+            name += "a"
+        path = os.path.join(config['directory'], name)
+        os.makedirs(path)
+
+        # Anything changed from here on is at or after this timestamp
+        changed_since = self.current_timestamp()
+
+        full_name = "full.db.gz" if config['compress'] else "full.db"
+        snapshot_path = os.path.join(path, "full.db")
+        result = self.engine.create_backup(snapshot_path, verify=True)
+        watermarks = {'ids': self.max_ids(snapshot_path), 'changed_since': changed_since}
+
+        if config['compress']:
+            with open(snapshot_path, 'rb') as raw_file, \
+                    gzip.open(os.path.join(path, full_name), 'wb', compresslevel=6) as gz_file:
+                shutil.copyfileobj(raw_file, gz_file, 1024 * 1024)
+            os.remove(snapshot_path)
+
+        manifest = {
+            'generation': name,
+            'full': {
+                'file': full_name,
+                'size': os.path.getsize(os.path.join(path, full_name)),
+                'pages': result['pages'],
+                'timestamp': time.time(),
+                'watermarks': watermarks,
+            },
+            'incrementals': [],
+        }
+        self.write_manifest(path, manifest)
+
+        return {'kind': 'full', 'generation': name, 'path': os.path.join(path, full_name),
+                'size': manifest['full']['size'], 'rows': None,
+                'duration': time.monotonic() - started}
+
+    def create_incremental(self, generation_path: str, manifest: Dict) -> Dict:
+        """Export the rows changed since the generation's last watermark"""
+        started = time.monotonic()
+        previous = (manifest['incrementals'][-1] if manifest['incrementals'] else manifest['full'])['watermarks']
+        file_name = f"incr-{len(manifest['incrementals']) + 1:04d}.db"
+        delta_path = os.path.join(generation_path, file_name)
+        temp_path = f"{delta_path}.partial"
+
+        try:
+            watermarks, rows = self.export_delta(temp_path, previous)
+            self.engine.verify_database(temp_path, quick=True)
+            os.replace(temp_path, delta_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        entry = {
+            'file': file_name,
+            'size': os.path.getsize(delta_path),
+            'rows': rows,
+            'timestamp': time.time(),
+            'watermarks': watermarks,
+        }
+        manifest['incrementals'].append(entry)
+        self.write_manifest(generation_path, manifest)
+
+        return {'kind': 'incremental', 'generation': manifest['generation'], 'path': delta_path,
+                'size': entry['size'], 'rows': rows, 'duration': time.monotonic() - started}
+
+    def export_delta(self, delta_path: str, previous: Dict) -> Tuple[Dict, int]:
+        """Write the rows changed since ``previous`` watermarks into a new database file
+
+        Everything is read in one transaction so the delta is a consistent
+        point-in-time view. Returns the new watermarks and the row count.
+        """
+        conn = sqlite3.connect(self.db_manager.db_path, isolation_level=None)
+        try:
+            conn.execute("ATTACH DATABASE ? AS delta", (delta_path,))
+            conn.execute("BEGIN")
+            changed_since = conn.execute("SELECT CURRENT_TIMESTAMP").fetchone()[0]
+
+            schema = conn.execute('''
+                SELECT name, sql FROM main.sqlite_master
+                WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+            ''').fetchall()
+            conn.execute("CREATE TABLE delta.backup_schema (name TEXT PRIMARY KEY, sql TEXT, mode TEXT)")
+
+            ids = dict(previous['ids'])
+            rows = 0
+            for table, sql in schema:
+                quoted = f'"{table}"'
+                if table in self.APPEND_ONLY_TABLES:
+                    mode = 'append'
+                    condition, params = "id > ?", [ids.get(table, 0)]
+                    if table in self.TOUCHED_BY:
+                        # e.g. a sale whose payment status a new return changed
+                        source, column = self.TOUCHED_BY[table]
+                        condition += f" OR id IN (SELECT {column} FROM main.{source} WHERE id > ?)"
+                        params.append(previous['ids'].get(source, 0))
+                    conn.execute(f"CREATE TABLE delta.{quoted} AS SELECT * FROM main.{quoted} WHERE {condition}",
+                                 params)
+                    new_max = conn.execute(f"SELECT MAX(id) FROM main.{quoted} WHERE id > ?",
+                                           (ids.get(table, 0),)).fetchone()[0]
+                    ids[table] = new_max or ids.get(table, 0)
+                elif table in self.TIMESTAMPED_TABLES:
+                    mode = 'upsert'
+                    conn.execute(f"CREATE TABLE delta.{quoted} AS SELECT * FROM main.{quoted} "
+                                 f"WHERE {self.TIMESTAMPED_TABLES[table]} >= ?", (previous['changed_since'],))
+                else:
+                    mode = 'snapshot'
+                    conn.execute(f"CREATE TABLE delta.{quoted} AS SELECT * FROM main.{quoted}")
+
+                conn.execute("INSERT INTO delta.backup_schema (name, sql, mode) VALUES (?, ?, ?)",
+                             (table, sql, mode))
+                if mode != 'snapshot':
+                    rows += conn.execute(f"SELECT COUNT(*) FROM delta.{quoted}").fetchone()[0]
+
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        return {'ids': ids, 'changed_since': changed_since}, rows
+
+    def materialize(self, generation_path: str, output_path: str, upto: Optional[int] = None) -> str:
+        """Rebuild a database file from a generation's full snapshot and its incrementals
+
+        upto limits how many incrementals are applied (all by default).
+        """
+        with open(os.path.join(generation_path, self.MANIFEST_NAME), 'r', encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+
+        temp_path = f"{output_path}.partial"
+        full_path = os.path.join(generation_path, manifest['full']['file'])
+        try:
+            if full_path.endswith(".gz"):
+                with gzip.open(full_path, 'rb') as gz_file, open(temp_path, 'wb') as raw_file:
+                    shutil.copyfileobj(gz_file, raw_file, 1024 * 1024)
+            else:
+                shutil.copyfile(full_path, temp_path)
+
+            for entry in manifest['incrementals'][:upto]:
+                self.apply_delta(temp_path, os.path.join(generation_path, entry['file']))
+
+            self.engine.verify_database(temp_path)
+            os.replace(temp_path, output_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return output_path
+
+    @staticmethod
+    def apply_delta(target_path: str, delta_path: str):
+        """Apply one incremental file to a database in a single transaction"""
+        conn = sqlite3.connect(target_path, isolation_level=None)
+        try:
+            conn.execute("ATTACH DATABASE ? AS delta", (delta_path,))
+            conn.execute("BEGIN")
+            existing = {row[0] for row in conn.execute("SELECT name FROM main.sqlite_master WHERE type = 'table'")}
+            trigger_fed = {table: conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM main.{table}").fetchone()[0]
+                           for table in BackupScheduler.TRIGGER_FED_TABLES if table in existing}
+
+            tables = conn.execute("SELECT name, sql, mode FROM delta.backup_schema").fetchall()
+            # Trigger-fed tables go last, after dropping the rows the triggers just added
+            tables.sort(key=lambda table: table[0] in BackupScheduler.TRIGGER_FED_TABLES)
+            trimmed = False
+            for table, sql, mode in tables:
+                if not trimmed and table in BackupScheduler.TRIGGER_FED_TABLES:
+                    BackupScheduler.trim_trigger_rows(conn, trigger_fed)
+                    trimmed = True
+                quoted = f'"{table}"'
+                delta_columns = conn.execute(f"PRAGMA delta.table_info({quoted})").fetchall()
+                if table not in existing:
+                    conn.execute(sql)
+                else:
+                    # Columns added by a schema upgrade since the base generation was taken
+                    present = {row[1] for row in conn.execute(f"PRAGMA main.table_info({quoted})")}
+                    for row in delta_columns:
+                        if row[1] not in present:
+                            conn.execute(f'ALTER TABLE main.{quoted} ADD COLUMN "{row[1]}" {row[2]}')
+                columns = ", ".join(f'"{row[1]}"' for row in delta_columns)
+                if mode == 'snapshot':
+                    conn.execute(f"DELETE FROM main.{quoted}")
+                conn.execute(f"INSERT OR REPLACE INTO main.{quoted} ({columns}) "
+                             f"SELECT {columns} FROM delta.{quoted}")
+            if not trimmed:
+                BackupScheduler.trim_trigger_rows(conn, trigger_fed)
+
+            for table in trigger_fed:
+                conn.execute("UPDATE main.sqlite_sequence SET seq = (SELECT COALESCE(MAX(id), 0) FROM main.{0}) "
+                             "WHERE name = '{0}'".format(table))
+
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def trim_trigger_rows(conn, high_water: Dict[str, int]):
+        """Drop rows that triggers added to trigger-fed tables while a delta was applied"""
+        for table, max_id in high_water.items():
+            conn.execute(f"DELETE FROM main.{table} WHERE id > ?", (max_id,))
+
+    def prune(self, directory: str, retention: int):
+        """Delete the oldest generations beyond the retention count, and failed ones"""
+        generations = self.list_generations(directory)
+        complete = {generation['name'] for generation in generations}
+        newest = generations[-1]['name'] if generations else None
+
+        for name in os.listdir(directory):
+            # A directory without a manifest is a generation whose full snapshot failed
+            if name.startswith("gen-") and name not in complete and (newest is None or name < newest):
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+        for generation in generations[:-retention]:
+            shutil.rmtree(generation['path'], ignore_errors=True)
+
+    # Helpers
+
+    def write_manifest(self, generation_path: str, manifest: Dict):
+        """Write a generation manifest atomically"""
+        manifest_path = os.path.join(generation_path, self.MANIFEST_NAME)
+        with open(f"{manifest_path}.partial", 'w', encoding='utf-8') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+            manifest_file.flush()
+            os.fsync(manifest_file.fileno())
+        os.replace(f"{manifest_path}.partial", manifest_path)
+
+    def current_timestamp(self) -> str:
+        """Get the database's CURRENT_TIMESTAMP (UTC, the format change columns use)"""
+        conn = sqlite3.connect(self.db_manager.db_path)
+        try:
+            return conn.execute("SELECT CURRENT_TIMESTAMP").fetchone()[0]
+        finally:
+            conn.close()
+
+    def max_ids(self, path: str) -> Dict[str, int]:
+        """Get the highest id of each append-only table in a database file"""
+        conn = sqlite3.connect(path)
+        try:
+            existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            return {table: conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM "{table}"').fetchone()[0]
+                    for table in self.APPEND_ONLY_TABLES if table in existing}
+        finally:
+            conn.close()
+
+class RestoreManager:
+    """Restores the live database from a backup without restarting the application.
+
+    The backup is first copied (or rebuilt, for a scheduled generation) into
+    a staging file next to the database and checked: SQLite integrity, the
+    tables the application needs and a schema version no newer than this
+    build understands. Only then is the connection pool drained and the
+    staging file renamed over the database, so the swap is atomic and the
+    live file is never half-copied. The previous database is kept as a hard
+    link named ``<db>.pre-restore`` where the filesystem supports it.
+    """
+
+    REQUIRED_TABLES = ('users', 'categories', 'products', 'sales', 'sale_items', 'settings')
+
+    def __init__(self, db_manager, drain_timeout: float = 10.0):
+        self.db_manager = db_manager
+        self.drain_timeout = drain_timeout
+
+    def stage(self, source: str) -> str:
+        """Copy, decompress or rebuild a backup into the staging file"""
+        staging_path = f"{self.db_manager.db_path}.restore"
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
+
+        if os.path.isdir(source) or os.path.basename(source) == BackupScheduler.MANIFEST_NAME:
+            generation_path = source if os.path.isdir(source) else os.path.dirname(source)
+            self.db_manager.backup_scheduler.materialize(generation_path, staging_path)
+        elif source.endswith(".gz"):
+            with gzip.open(source, 'rb') as gz_file, open(staging_path, 'wb') as raw_file:
+                shutil.copyfileobj(gz_file, raw_file, 1024 * 1024)
+        else:
+            shutil.copyfile(source, staging_path)
+        return staging_path
+
+    def validate(self, path: str, quick: bool = False) -> Dict:
+        """Check that a database file can be restored, raising RestoreError if not"""
+        from src.database.database_manager import SCHEMA_VERSION
+
+        try:
+            BackupEngine.verify_database(path, quick=quick)
+        except BackupError as e:
+            raise RestoreError(str(e)) from e
+
+        conn = sqlite3.connect(path)
+        try:
+            schema_version = conn.execute("PRAGMA user_version").fetchone()[0]
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            missing = [table for table in self.REQUIRED_TABLES if table not in tables]
+            if missing:
+                raise RestoreError(f"Not a POS database backup (missing tables: {', '.join(missing)})")
+            if schema_version > SCHEMA_VERSION:
+                raise RestoreError(f"Backup uses schema version {schema_version}, "
+                                   f"but this version of the application supports up to {SCHEMA_VERSION}")
+            return {
+                'schema_version': schema_version,
+                'products': conn.execute("SELECT COUNT(*) FROM products").fetchone()[0],
+                'sales': conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0],
+            }
+        finally:
+            conn.close()
+
+    def restore(self, source: str, quick: bool = False, keep_previous: bool = True) -> Dict:
+        """Validate a backup and swap it in for the live database
+
+        source may be a .db file, a .db.gz file or a scheduled backup
+        generation (its directory or manifest). Returns a summary dict.
+        """
+        started = time.monotonic()
+        staging_path = self.stage(source)
+        try:
+            info = self.validate(staging_path, quick=quick)
+
+            # Keep scheduled backups out of the way, then wait for every connection to close
+            with self.db_manager.backup_scheduler.run_lock:
+                self.db_manager.pool.drain(self.drain_timeout)
+                try:
+                    previous_path = self.swap(staging_path, keep_previous)
+                finally:
+                    self.db_manager.pool.resume()
+        except Exception:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+            raise
+
+        # Bring an older schema up to date and drop state derived from the old database
+        self.db_manager.create_tables()
+        self.db_manager.report_cache.clear()
+        self.db_manager.quick_products.reset()
+        self.db_manager.backup_scheduler.request_full()
+
+        return dict(info, source=source, previous_path=previous_path,
+                    duration=time.monotonic() - started)
+
+    def swap(self, staging_path: str, keep_previous: bool) -> Optional[str]:
+        """Atomically replace the database with the staging file (pool must be drained)"""
+        db_path = self.db_manager.db_path
+        previous_path = None
+
+        if keep_previous and os.path.exists(db_path):
+            previous_path = f"{db_path}.pre-restore"
+            if os.path.exists(previous_path):
+                os.remove(previous_path)
+            try:
+                os.link(db_path, previous_path)
+            except OSError:
+                previous_path = None
+
+        # A leftover journal belongs to the old file and must not be replayed into the new one
+        for suffix in ("-journal", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+        os.replace(staging_path, db_path)
+        return previous_path
+
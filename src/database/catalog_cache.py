@@ -0,0 +1,131 @@
+"""
+Catalog Cache - Till-side copy of the catalog kept current from the change feed
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+class CatalogCache:
+    """In-memory products, categories and settings for a till.
+
+    The first use loads a snapshot; after that ``refresh`` applies only the
+    rows changed since the last cursor, which costs one indexed range read
+    when nothing changed. Lookups refresh first if the copy is older than
+    ``max_age`` seconds, so a price edited in inventory reaches the till on
+    the next scan without re-reading the catalog.
+    """
+
+    def __init__(self, db_manager, max_age: float = 2.0):
+        self.db_manager = db_manager
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.cursor: Optional[int] = None
+        self.refreshed_at = 0.0
+        self.products: Dict[int, Dict] = {}
+        self.barcodes: Dict[str, int] = {}
+        self.categories: Dict[int, Dict] = {}
+        self.settings: Dict[str, Optional[str]] = {}
+
+    def load(self):
+        """Replace the cache with a fresh snapshot"""
+        snapshot = self.db_manager.change_feed.snapshot()
+        with self.lock:
+            self.products.clear()
+            self.barcodes.clear()
+            for product in snapshot['products']:
+                self.put_product(product)
+            self.categories = {category['id']: category for category in snapshot['categories']}
+            self.settings = dict(snapshot['settings'])
+            self.cursor = snapshot['cursor']
+            self.refreshed_at = time.monotonic()
+
+    def refresh(self) -> int:
+        """Apply changes since the last refresh; returns the number of rows updated"""
+        if self.cursor is None:
+            self.load()
+            return len(self.products)
+
+        applied = 0
+        while True:
+            changes = self.db_manager.change_feed.changes_since(self.cursor)
+            if changes['reset']:
+                self.load()
+                return len(self.products)
+
+            registry = self.db_manager.category_registry
+            with self.lock:
+                for category in changes['categories']:
+                    self.categories[category['id']] = category
+                    registry.put(category)
+                for category_id in changes['deleted_categories']:
+                    self.categories.pop(category_id, None)
+                    registry.drop(category_id)
+                for product in changes['products']:
+                    self.put_product(product)
+                for product_id in changes['deleted_products']:
+                    self.drop_product(product_id)
+
+                # Products show their category's name, which may have just changed
+                renamed = {category['id'] for category in changes['categories']}
+                renamed.update(changes['deleted_categories'])
+                if renamed:
+                    for product in self.products.values():
+                        if product['category_id'] in renamed:
+                            product['category_name'] = registry.name(product['category_id'])
+
+                self.settings.update(changes['settings'])
+                self.cursor = changes['cursor']
+                self.refreshed_at = time.monotonic()
+
+            applied += (len(changes['products']) + len(changes['deleted_products']) + len(changes['categories'])
+                        + len(changes['deleted_categories']) + len(changes['settings']))
+            if not changes['more']:
+                return applied
+
+    def refresh_if_stale(self):
+        """Refresh if the cache is older than max_age"""
+        if self.cursor is None or time.monotonic() - self.refreshed_at >= self.max_age:
+            self.refresh()
+
+    def put_product(self, product: Dict):
+        """Store a product row, dropping it if it was deactivated (call with the lock held)"""
+        self.drop_product(product['id'])
+        if product['is_active']:
+            # Share the registry's copy of the name rather than keep one per product
+            product['category_name'] = self.db_manager.category_registry.name(product['category_id'])
+            self.products[product['id']] = product
+            if product['barcode']:
+                self.barcodes[product['barcode']] = product['id']
+
+    def drop_product(self, product_id: int):
+        """Forget a product (call with the lock held)"""
+        product = self.products.pop(product_id, None)
+        if product and product['barcode'] and self.barcodes.get(product['barcode']) == product_id:
+            del self.barcodes[product['barcode']]
+
+    def get_product_by_barcode(self, barcode: str) -> Optional[Dict]:
+        """Get an active product by barcode"""
+        self.refresh_if_stale()
+        with self.lock:
+            product_id = self.barcodes.get(barcode)
+            return dict(self.products[product_id]) if product_id is not None else None
+
+    def get_product_by_id(self, product_id: int) -> Optional[Dict]:
+        """Get an active product by ID"""
+        self.refresh_if_stale()
+        with self.lock:
+            product = self.products.get(product_id)
+            return dict(product) if product else None
+
+    def get_categories(self) -> List[Dict]:
+        """Get all categories ordered by name"""
+        self.refresh_if_stale()
+        with self.lock:
+            return sorted((dict(category) for category in self.categories.values()), key=lambda c: c['name'])
+
+    def get_setting(self, key: str) -> Optional[str]:
+        """Get a setting value"""
+        self.refresh_if_stale()
+        with self.lock:
+            return self.settings.get(key)
@@ -0,0 +1,157 @@
+"""
+Category Registry - Shared id -> category lookup for combo boxes, reports and product rows
+"""
+
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+class CategoryRegistry:
+    """Categories loaded once per process and kept current by the writes that change them.
+
+    Names are interned, so the name a product row carries is the registry's
+    own string object rather than a fresh copy per row. Saves through the
+    category repository (directly or via ``create``/``update``) update the
+    registry of the process that runs them; a remote till's ``create``/
+    ``update`` also update its own, and changes made on other tills arrive
+    through the catalog cache's change feed (``put``).
+    An ID the registry does not know yet triggers a reload, at most once
+    per ``max_age`` seconds.
+    """
+
+    def __init__(self, db_manager, max_age: float = 2.0):
+        self.db_manager = db_manager
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.by_id: Optional[Dict[int, Dict]] = None
+        self.ordered: List[Dict] = []
+        self.loaded_at = 0.0
+
+    def load(self):
+        """(Re)read all categories"""
+        categories = self.db_manager.categories.list()
+        with self.lock:
+            self.by_id = {}
+            for category in categories:
+                self.store(category)
+            self.reorder()
+            self.loaded_at = time.monotonic()
+
+    def ensure_loaded(self):
+        if self.by_id is None:
+            self.load()
+
+    def store(self, category: Dict):
+        """Keep one category with its name interned (call with the lock held)"""
+        self.by_id[category['id']] = {
+            'id': category['id'],
+            'name': sys.intern(category['name']),
+            'description': category.get('description'),
+            'parent_id': category.get('parent_id'),
+        }
+
+    def reorder(self):
+        """Rebuild the name-ordered list (call with the lock held)"""
+        self.ordered = sorted(self.by_id.values(), key=lambda category: category['name'])
+
+    def list(self) -> List[Dict]:
+        """All categories ordered by name"""
+        self.ensure_loaded()
+        with self.lock:
+            return [dict(category) for category in self.ordered]
+
+    def tree(self) -> List[Dict]:
+        """All categories depth-first, siblings by name, each with its 'depth' and an indented 'label'"""
+        self.ensure_loaded()
+        with self.lock:
+            children: Dict[Optional[int], List[Dict]] = {}
+            for category in self.ordered:
+                # A parent the registry has not seen yet leaves the category at the top level
+                parent_id = category['parent_id'] if category['parent_id'] in self.by_id else None
+                children.setdefault(parent_id, []).append(category)
+
+        rows = []
+        stack = [(category, 0) for category in reversed(children.get(None, []))]
+        while stack:
+            category, depth = stack.pop()
+            rows.append(dict(category, depth=depth, label="    " * depth + category['name']))
+            stack.extend((child, depth + 1) for child in reversed(children.get(category['id'], [])))
+        return rows
+
+    def subtree(self, category_id: int) -> Set[int]:
+        """IDs of a category and everything below it"""
+        return {category['id'] for category in self.tree_below(category_id)}
+
+    def tree_below(self, category_id: int) -> List[Dict]:
+        """The part of tree() rooted at a category"""
+        rows = self.tree()
+        for index, category in enumerate(rows):
+            if category['id'] == category_id:
+                end = index + 1
+                while end < len(rows) and rows[end]['depth'] > category['depth']:
+                    end += 1
+                return rows[index:end]
+        return []
+
+    def name(self, category_id) -> Optional[str]:
+        """Interned name of a category, or None"""
+        # ColumnBatch stores a nullable integer column as floats, with NaN for NULL
+        if category_id is None or category_id != category_id:
+            return None
+        category_id = int(category_id)
+        self.ensure_loaded()
+        category = self.by_id.get(category_id)
+        if category is None and time.monotonic() - self.loaded_at >= self.max_age:
+            # Added elsewhere since the registry was loaded
+            self.load()
+            category = self.by_id.get(category_id)
+        return category['name'] if category else None
+
+    def names(self) -> Dict[int, str]:
+        """The id -> name mapping"""
+        self.ensure_loaded()
+        with self.lock:
+            return {category_id: category['name'] for category_id, category in self.by_id.items()}
+
+    def create(self, name: str, description: str = "", parent_id: Optional[int] = None) -> int:
+        """Add a category and register it; returns its ID"""
+        category_id = self.db_manager.categories.create(name, description, parent_id)
+        if self.db_manager.is_remote:
+            # A local write is registered by the category repository itself
+            self.put({'id': category_id, 'name': name, 'description': description, 'parent_id': parent_id})
+        return category_id
+
+    def update(self, category_id: int, name: str, description: str = "", parent_id: Optional[int] = None):
+        """Change or move a category and the registered copy"""
+        self.db_manager.categories.update(category_id, name, description, parent_id)
+        if self.db_manager.is_remote:
+            self.put({'id': category_id, 'name': name, 'description': description, 'parent_id': parent_id})
+
+    def put(self, category: Dict):
+        """Register a category added or changed elsewhere"""
+        if self.by_id is None:
+            return
+        with self.lock:
+            self.store(category)
+            self.reorder()
+
+    def drop(self, category_id: int):
+        """Forget a deleted category"""
+        if self.by_id is None:
+            return
+        with self.lock:
+            if self.by_id.pop(category_id, None) is not None:
+                self.reorder()
+
+    def attach_names(self, rows, row_format: str = "dict"):
+        """Fill category_name on product rows from their category_id; returns the rows"""
+        if row_format == "dict":
+            for row in rows:
+                row['category_name'] = self.name(row['category_id'])
+        elif row_format == "object":
+            for row in rows:
+                row.category_name = self.name(row.category_id)
+        else:
+            rows.columns['category_name'] = [self.name(category_id) for category_id in rows['category_id']]
+        return rows
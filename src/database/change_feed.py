@@ -0,0 +1,153 @@
+"""
+Change Feed - Trigger-populated log of catalog changes for incremental sync
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+# Tables whose changes are logged, with the column identifying a row to readers
+FEED_TABLES = {'products': 'id', 'categories': 'id', 'settings': 'key'}
+
+class ChangeFeed:
+    """Serves catalog changes since a cursor.
+
+    Triggers on products, categories and settings append a row to
+    ``change_log`` for every insert, update and delete; its id is the
+    sequence number tills use as their cursor. ``changes_since`` returns the
+    current state of every row changed after a cursor, so a till applies a
+    delta instead of re-reading the catalog. When the cursor is older than
+    the pruned log (or newer than it, after a restore) the answer says
+    ``reset`` and the till reloads from ``snapshot``.
+    """
+
+    SETTING_DEFAULTS = {
+        'change_log_retention_days': '7',
+    }
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    @staticmethod
+    def create_triggers(cursor):
+        """Create the triggers that feed change_log (called by create_tables)"""
+        for table, key_column in FEED_TABLES.items():
+            for event, row in (('insert', 'NEW'), ('update', 'NEW'), ('delete', 'OLD')):
+                row_key = f"{row}.{key_column}" if key_column != 'id' else "NULL"
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_{table}_change_{event}
+                    AFTER {event.upper()} ON {table}
+                    BEGIN
+                        INSERT INTO change_log (table_name, row_id, row_key, operation)
+                        VALUES ('{table}', {row}.id, {row_key}, '{event}');
+                    END
+                ''')
+
+    def current_sequence(self) -> int:
+        """Get the newest sequence number handed out (0 if none)"""
+        conn = self.db_manager.get_connection()
+        try:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+
+    def snapshot(self) -> Dict:
+        """Read the whole catalog and the cursor it corresponds to, in one read transaction"""
+        conn = self.db_manager.get_connection()
+        try:
+            conn.execute("BEGIN")
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+            products = conn.execute("SELECT * FROM products WHERE is_active = 1").fetchall()
+            categories = conn.execute("SELECT * FROM categories").fetchall()
+            settings = conn.execute("SELECT key, value FROM settings").fetchall()
+            return {
+                'cursor': row[0] if row else 0,
+                'products': self.db_manager.category_registry.attach_names([dict(product) for product in products]),
+                'categories': [dict(category) for category in categories],
+                'settings': {setting['key']: setting['value'] for setting in settings},
+            }
+        finally:
+            conn.close()
+
+    def changes_since(self, cursor: int, limit: int = 1000) -> Dict:
+        """Get rows changed after a cursor
+
+        Returns {'cursor', 'more', 'reset', 'products', 'deleted_products',
+        'categories', 'deleted_categories', 'settings'}. Changed rows are
+        returned as they are now (a product made inactive is returned too, so
+        the till can drop it); settings map each changed key to its value, or
+        None once deleted. 'more' is set when another call is needed to catch
+        up, and 'reset' when the till must reload a snapshot instead.
+        """
+        conn = self.db_manager.get_connection()
+        try:
+            conn.execute("BEGIN")
+            newest = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+            newest = newest[0] if newest else 0
+            oldest = conn.execute("SELECT MIN(id) FROM change_log").fetchone()[0] or newest + 1
+
+            changes = {'cursor': cursor, 'more': False, 'reset': False, 'products': [], 'deleted_products': [],
+                       'categories': [], 'deleted_categories': [], 'settings': {}}
+            if cursor > newest or cursor < oldest - 1:
+                changes['reset'] = True
+                return changes
+
+            rows = conn.execute('''
+                SELECT id, table_name, row_id, row_key FROM change_log
+                WHERE id > ? ORDER BY id LIMIT ?
+            ''', (cursor, limit)).fetchall()
+            if not rows:
+                return changes
+            changes['cursor'] = rows[-1]['id']
+            changes['more'] = len(rows) == limit
+
+            product_ids = sorted({row['row_id'] for row in rows if row['table_name'] == 'products'})
+            category_ids = sorted({row['row_id'] for row in rows if row['table_name'] == 'categories'})
+            setting_keys = sorted({row['row_key'] for row in rows if row['table_name'] == 'settings'})
+
+            changes['products'] = self.db_manager.category_registry.attach_names(
+                self.fetch_by_ids(conn, "SELECT * FROM products WHERE id IN ({placeholders})", product_ids))
+            found = {product['id'] for product in changes['products']}
+            changes['deleted_products'] = [product_id for product_id in product_ids if product_id not in found]
+
+            changes['categories'] = self.fetch_by_ids(conn, "SELECT * FROM categories WHERE id IN ({placeholders})",
+                                                      category_ids)
+            found = {category['id'] for category in changes['categories']}
+            changes['deleted_categories'] = [category_id for category_id in category_ids if category_id not in found]
+
+            values = {row['key']: row['value'] for row in self.fetch_by_ids(
+                conn, "SELECT key, value FROM settings WHERE key IN ({placeholders})", setting_keys)}
+            changes['settings'] = {key: values.get(key) for key in setting_keys}
+            return changes
+        finally:
+            conn.close()
+
+    @staticmethod
+    def fetch_by_ids(conn, query: str, ids: List, chunk_size: int = 500) -> List[Dict]:
+        """Run a query with an IN list in chunks that stay under SQLite's variable limit"""
+        rows = []
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            rows.extend(dict(row) for row in conn.execute(
+                query.format(placeholders=", ".join("?" for _ in chunk)), chunk))
+        return rows
+
+    def prune(self, retention_days: int = None) -> int:
+        """Delete change_log rows older than the retention period; returns the number deleted
+
+        Tills whose cursor falls before the remaining log reload a snapshot.
+        """
+        if retention_days is None:
+            value = self.db_manager.get_setting('change_log_retention_days')
+            retention_days = int(value or self.SETTING_DEFAULTS['change_log_retention_days'])
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).strftime("%Y-%m-%d %H:%M:%S")
+
+        conn = self.db_manager.get_connection()
+        try:
+            deleted = conn.execute("DELETE FROM change_log WHERE changed_at < ?", (cutoff,)).rowcount
+            if deleted:
+                self.db_manager.backup_scheduler.mark_full_required(conn)
+            conn.commit()
+            return deleted
+        finally:
+            conn.close()
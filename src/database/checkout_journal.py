@@ -0,0 +1,244 @@
+"""
+Checkout Journal - Append-only log of the cart and pending sales for crash recovery
+"""
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from src.database.payments import PaymentError
+
+logger = logging.getLogger(__name__)
+
+# Errors a retry cannot fix; anything else (a locked database, an unreachable server) is retried
+PERMANENT_ERRORS = (PaymentError, ValueError, sqlite3.IntegrityError)
+
+class CheckoutJournal:
+    """Journals the till's cart and in-flight sales to a local file.
+
+    Every cart change is appended as one JSON line and flushed to the
+    operating system, which is enough to survive the application dying;
+    fsync calls for cart changes are batched on a background thread. A
+    sale is journaled and fsynced before it is written to the database,
+    since by then the customer has paid.
+
+    At startup ``recover`` replays the file: sales that never reached the
+    database are recorded, and the cart that was being built is handed to
+    the next POS screen. The journal is truncated whenever the cart is
+    empty and no sale is pending, so it stays a few lines long.
+
+    The file belongs to one till: it lives in the machine's local
+    application data, never next to a database that several tills may
+    open from a shared folder.
+    """
+
+    FSYNC_INTERVAL = 1.0
+
+    def __init__(self, db_manager, path: Optional[str] = None):
+        self.db_manager = db_manager
+        self.path = path or self.default_path(db_manager.db_path)
+        self.lock = threading.Lock()
+        self.file = None
+        self.dirty = False
+        self.pending = set()
+        self.recovered_cart: List[Dict] = []
+        self.sync_event = threading.Event()
+        self.sync_thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def default_path(database: str) -> str:
+        """This machine's journal for a database path or server URL
+
+        Named after the host and the database, so one machine running tills
+        against two databases keeps their carts apart.
+        """
+        base = (os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_STATE_HOME')
+                or os.path.join(os.path.expanduser("~"), ".local", "state"))
+        directory = os.path.join(base, "lks_pos")
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(database):
+            database = os.path.abspath(database)
+        digest = hashlib.sha1(database.encode("utf-8")).hexdigest()[:10]
+        return os.path.join(directory, f"checkout_{socket.gethostname()}_{digest}.journal")
+
+    # Writing
+
+    def append(self, record: Dict, sync: bool = False):
+        """Append a record; sync forces it to disk before returning"""
+        line = json.dumps(record, separators=(',', ':'), default=str) + "\n"
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, "a", encoding="utf-8")
+            self.file.write(line)
+            self.file.flush()
+            if sync:
+                os.fsync(self.file.fileno())
+                self.dirty = False
+            else:
+                self.dirty = True
+        if not sync:
+            self.schedule_sync()
+
+    def schedule_sync(self):
+        """Start the thread that fsyncs batched writes, if it is not running"""
+        if self.sync_thread is None or not self.sync_thread.is_alive():
+            self.sync_event.clear()
+            self.sync_thread = threading.Thread(target=self.sync_loop, name="CheckoutJournalSync", daemon=True)
+            self.sync_thread.start()
+
+    def sync_loop(self):
+        """Fsync pending writes every FSYNC_INTERVAL seconds until there are none"""
+        while not self.sync_event.wait(self.FSYNC_INTERVAL):
+            with self.lock:
+                if not self.dirty or self.file is None:
+                    return
+                os.fsync(self.file.fileno())
+                self.dirty = False
+
+    def reset(self):
+        """Empty the journal (nothing in the cart and no sale pending)"""
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, "a", encoding="utf-8")
+            self.file.truncate(0)
+            os.fsync(self.file.fileno())
+            self.dirty = False
+
+    def close(self):
+        """Flush outstanding writes to disk and close the file"""
+        self.sync_event.set()
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+                self.dirty = False
+
+    # Cart changes, mirroring POSModule.cart_items
+
+    def add_item(self, item: Dict):
+        self.append({'op': 'add', 'item': item})
+
+    def update_item(self, index: int, quantity: int, total: float):
+        self.append({'op': 'set', 'index': index, 'quantity': quantity, 'total': total})
+
+    def remove_item(self, index: int):
+        self.append({'op': 'remove', 'index': index})
+
+    def clear_cart(self):
+        if self.pending:
+            self.append({'op': 'clear'})
+        else:
+            self.reset()
+
+    # Sales
+
+    def begin_sale(self, sale_data: Dict, sale_items: List[Dict]):
+        """Journal a paid sale before it is written to the database"""
+        self.pending.add(sale_data['sale_number'])
+        self.append({'op': 'sale', 'sale_data': sale_data, 'sale_items': sale_items}, sync=True)
+
+    def end_sale(self, sale_number: str, committed: bool = True):
+        """Mark a journaled sale as recorded (or abandoned)"""
+        self.pending.discard(sale_number)
+        self.append({'op': 'committed' if committed else 'aborted', 'sale_number': sale_number})
+
+    # Recovery
+
+    def replay(self) -> Tuple[List[Dict], List[Dict]]:
+        """Read the journal back into (cart_items, pending_sales)"""
+        cart: List[Dict] = []
+        sales: Dict[str, Dict] = {}
+        if not os.path.exists(self.path):
+            return cart, []
+
+        with open(self.path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line torn by the crash; everything before it is intact
+                    break
+
+                op = record['op']
+                if op == 'add':
+                    cart.append(record['item'])
+                elif op == 'set' and record['index'] < len(cart):
+                    cart[record['index']].update(quantity=record['quantity'], total=record['total'])
+                elif op == 'remove' and record['index'] < len(cart):
+                    cart.pop(record['index'])
+                elif op == 'clear':
+                    cart.clear()
+                elif op == 'sale':
+                    sales[record['sale_data']['sale_number']] = record
+                elif op in ('committed', 'aborted'):
+                    sales.pop(record['sale_number'], None)
+        return cart, list(sales.values())
+
+    def recover(self) -> Dict:
+        """Finish sales interrupted by a crash and keep the unfinished cart
+
+        Returns a summary dict listing the sale numbers that were recorded
+        now, those already in the database, those that can never be
+        recorded ('failed', dropped from the journal) and those that hit a
+        temporary error such as a locked database or an unreachable server
+        ('deferred', kept pending for the next start), plus the number of
+        cart items recovered.
+        """
+        cart, pending = self.replay()
+        summary = {'recorded': [], 'already_recorded': [], 'failed': [], 'deferred': [],
+                   'cart_items': len(cart)}
+        deferred = []
+
+        for record in pending:
+            sale_data, sale_items = record['sale_data'], record['sale_items']
+            sale_number = sale_data['sale_number']
+
+            try:
+                if self.db_manager.get_sale_id(sale_number) is not None:
+                    summary['already_recorded'].append(sale_number)
+                    continue
+                self.db_manager.create_sale(sale_data, sale_items)
+            except PERMANENT_ERRORS as e:
+                # Paid for but not recordable (e.g. a deleted product): leave a trail for a refund
+                summary['failed'].append(sale_number)
+                logger.error("Error recovering sale %s: %s", sale_number, e)
+                self.log_activity(sale_data['user_id'], "sale_recovery_failed",
+                                  f"Sale {sale_number} for {sale_data['total_amount']:.2f} DZD "
+                                  f"could not be recorded: {e}")
+            except Exception as e:
+                # Worth retrying: the sale stays in the journal
+                summary['deferred'].append(sale_number)
+                deferred.append(record)
+                logger.warning("Sale %s not recovered yet, will retry: %s", sale_number, e)
+            else:
+                summary['recorded'].append(sale_number)
+                self.log_activity(sale_data['user_id'], "sale_recovered",
+                                  f"Sale {sale_number} recorded from the checkout journal")
+
+        # Start over from the sales still pending and the recovered cart
+        self.recovered_cart = cart
+        self.reset()
+        for record in deferred:
+            self.begin_sale(record['sale_data'], record['sale_items'])
+        for item in cart:
+            self.add_item(item)
+        return summary
+
+    def log_activity(self, user_id: int, action: str, details: str):
+        """Record a recovery in the activity log when the database allows it"""
+        try:
+            self.db_manager.log_activity(user_id, action, details)
+        except Exception as e:
+            logger.error("Error logging activity: %s", e)
+
+    def take_recovered_cart(self) -> List[Dict]:
+        """Hand the recovered cart to the POS screen (only once)"""
+        cart, self.recovered_cart = self.recovered_cart, []
+        return cart
@@ -0,0 +1,138 @@
+"""
+Connection Pool - Reusable SQLite connections that can be drained for maintenance
+"""
+
+import sqlite3
+import threading
+import time
+import weakref
+from typing import List, Optional
+
+from src.database.query_profiler import ProfilingCursor, QueryProfiler
+
+class PoolDrainTimeout(Exception):
+    """Raised when connections are still in use after the drain timeout"""
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection whose close() hands it back to its pool.
+
+    Any transaction the caller left open is rolled back first, so returning
+    a connection behaves exactly like closing it as far as data goes.
+    """
+
+    pool: Optional["ConnectionPool"] = None
+
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+
+    # sqlite3's shortcuts make their cursor internally; route them through cursor() so they are profiled
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self.pool is None or not self.pool.release(self):
+            super().close()
+
+    def discard(self):
+        """Really close the connection"""
+        super().close()
+
+class ConnectionPool:
+    """Leases connections to a database file and keeps a few idle ones for reuse.
+
+    Opening a SQLite connection re-reads the schema, so reusing them saves
+    that work on every small query. The pool can also be drained: new leases
+    wait, and the pool blocks until every leased connection has come back,
+    which lets a restore swap the database file with nothing open on it.
+    Connections that are never closed are noticed once they are garbage
+    collected, so a forgotten close() cannot hold a drain forever.
+    """
+
+    def __init__(self, db_path: str, max_idle: int = 8, timeout: float = 5.0):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.idle: List[PooledConnection] = []
+        self.leased: "weakref.WeakSet[PooledConnection]" = weakref.WeakSet()
+        self.draining = False
+        self.condition = threading.Condition()
+        # Set by DatabaseManager; statements on leased connections are timed by it
+        self.profiler: Optional[QueryProfiler] = None
+
+    def connect(self) -> PooledConnection:
+        """Open a new pooled connection"""
+        # Leases are handed between threads, but only ever used by one at a time
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, factory=PooledConnection,
+                               check_same_thread=False)
+        conn.pool = self
+        return conn
+
+    def acquire(self) -> PooledConnection:
+        """Lease a connection, waiting while the pool is drained"""
+        with self.condition:
+            while self.draining:
+                self.condition.wait()
+            conn = self.idle.pop() if self.idle else self.connect()
+            self.leased.add(conn)
+
+        # Undo per-lease tweaks made by the previous borrower
+        conn.row_factory = sqlite3.Row
+        conn.isolation_level = ""
+        return conn
+
+    def release(self, conn: PooledConnection) -> bool:
+        """Take a connection back; returns False if it should be closed instead"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            return False
+
+        with self.condition:
+            if conn in self.idle:
+                # Closed twice; it is already back in the pool
+                return True
+            self.leased.discard(conn)
+            keep = not self.draining and len(self.idle) < self.max_idle
+            if keep:
+                self.idle.append(conn)
+            self.condition.notify_all()
+        return keep
+
+    def drain(self, timeout: float = 10.0):
+        """Stop handing out connections and wait until all leased ones are back
+
+        Idle connections are closed. Raises PoolDrainTimeout (and resumes the
+        pool) if connections are still in use after ``timeout`` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            self.draining = True
+            while len(self.leased):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.draining = False
+                    self.condition.notify_all()
+                    raise PoolDrainTimeout(f"{len(self.leased)} database connection(s) still in use")
+                # Wake up periodically: garbage-collected leases do not notify
+                self.condition.wait(min(remaining, 0.1))
+
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.discard()
+
+    def resume(self):
+        """Hand out connections again after a drain"""
+        with self.condition:
+            self.draining = False
+            self.condition.notify_all()
+
+    def close_all(self):
+        """Close the idle connections"""
+        with self.condition:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.discard()
@@ -0,0 +1,399 @@
+"""
+Demand Forecasting - Nightly per-product demand forecasts for purchasing
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.database.returns import ReturnsManager
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Average days between sales above which a product's demand counts as intermittent
+# (the Syntetos-Boylan cut-off); those are forecast with Croston's method
+INTERMITTENT_INTERVAL = 1.32
+
+METHODS = ('ses', 'croston')
+
+def forecast_block(rows: int, days: int, row_index: np.ndarray, day_index: np.ndarray,
+                   units: np.ndarray, alpha: float) -> Dict[str, np.ndarray]:
+    """Forecast the daily demand of a block of products at once
+
+    The sales come in as (row, day, units) triplets and are spread into a
+    rows x days matrix here, so only the sparse form crosses the process
+    boundary. Each product's series starts on the day of its first sale.
+    Both methods run over the whole block, one day at a time:
+
+    * simple exponential smoothing of daily units, starting from the
+      series mean;
+    * Croston's method, which smooths the size of non-zero sales and the
+      interval between them separately, with the Syntetos-Boylan bias
+      correction.
+
+    The method used for a product follows its average interval between
+    sales. error_std is the standard deviation of that method's one-day-
+    ahead errors.
+    """
+    series = np.bincount(row_index.astype(np.int64) * days + day_index, weights=units,
+                         minlength=rows * days).reshape(rows, days)
+
+    sold = series > 0
+    sales_days = sold.sum(axis=1)
+    first_day = np.argmax(sold, axis=1)
+    span = days - first_day
+    demand_interval = span / np.maximum(sales_days, 1)
+
+    level = series.sum(axis=1) / span
+    size = series[np.arange(rows), first_day]
+    interval = demand_interval.copy()
+    since_sale = np.ones(rows)
+
+    errors_ses = np.zeros(rows)
+    errors_croston = np.zeros(rows)
+    for day in range(days):
+        demand = series[:, day]
+        started = first_day < day
+        croston = (1 - alpha / 2) * size / interval
+        errors_ses += np.where(started, (demand - level) ** 2, 0.0)
+        errors_croston += np.where(started, (demand - croston) ** 2, 0.0)
+
+        level = np.where(started, level + alpha * (demand - level), level)
+        update = started & (demand > 0)
+        size = np.where(update, size + alpha * (demand - size), size)
+        interval = np.where(update, interval + alpha * (since_sale - interval), interval)
+        since_sale = np.where(update, 1.0, np.where(started, since_sale + 1, since_sale))
+
+    intermittent = demand_interval > INTERMITTENT_INTERVAL
+    errors = np.where(intermittent, errors_croston, errors_ses) / np.maximum(span - 1, 1)
+    return {
+        'method': intermittent.astype(np.int8),
+        'daily_rate': np.where(intermittent, (1 - alpha / 2) * size / interval, level),
+        'error_std': np.sqrt(errors),
+        'demand_interval': demand_interval,
+        'sales_days': sales_days,
+    }
+
+class DemandForecaster:
+    """Forecasts daily demand for every product that sold in the history window.
+
+    Sales history (including the archives) is read as one aggregate of
+    units per product per day, split into blocks of products and
+    forecast by ``forecast_block`` in a process pool, several blocks at a
+    time. Results replace the rows of ``demand_forecasts``, which the
+    inventory screen shows.
+
+    ``start`` runs this nightly, once the local time passes
+    ``forecast_hour``, in a background thread; when several processes
+    share the database, the one that claims the night runs it. The
+    settings are re-read on every run.
+    """
+
+    SETTING_DEFAULTS = {
+        'forecast_schedule_enabled': '1',
+        'forecast_hour': '2',
+        'forecast_history_days': '365',
+        'forecast_horizon_days': '28',
+        'forecast_alpha': '0.1',
+        # 0 uses one worker process per CPU
+        'forecast_workers': '0',
+        'forecast_block_products': '5000',
+    }
+
+    # Local date of the last run, claimed by the process that runs it
+    LAST_RUN_SETTING = 'forecast_last_run'
+    CLAIM_RUN = "UPDATE settings SET value = ?, updated_at = CURRENT_TIMESTAMP WHERE key = ? AND value IS NOT ?"
+    POLL_SECONDS = 300
+
+    FETCH_SIZE = 50000
+
+    UPSERT = '''
+        INSERT OR REPLACE INTO demand_forecasts
+            (product_id, method, daily_rate, forecast_units, error_std, demand_interval,
+             sales_days, history_days, horizon_days, generated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    # Products that no longer sold in the window keep a row, forecast at zero, so
+    # every row carries the latest generated_at (what incremental backups copy)
+    ZERO_ALL = '''
+        UPDATE demand_forecasts
+        SET method = 'none', daily_rate = 0, forecast_units = 0, error_std = 0, demand_interval = NULL,
+            sales_days = 0, history_days = ?, horizon_days = ?, generated_at = ?
+    '''
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self.run_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.last_result: Optional[Dict] = None
+        self.last_error: Optional[str] = None
+
+    def load_config(self) -> Dict:
+        """Read the forecasting configuration from settings, falling back to defaults"""
+        values = {}
+        for key, default in self.SETTING_DEFAULTS.items():
+            value = self.db_manager.get_setting(key)
+            values[key] = default if value in (None, "") else value
+        return {
+            'enabled': values['forecast_schedule_enabled'] == '1',
+            'hour': min(max(int(values['forecast_hour']), 0), 23),
+            'history_days': max(7, int(values['forecast_history_days'])),
+            'horizon_days': max(1, int(values['forecast_horizon_days'])),
+            'alpha': min(max(float(values['forecast_alpha']), 0.01), 1.0),
+            'workers': max(0, int(values['forecast_workers'])) or os.cpu_count() or 1,
+            'block_products': max(100, int(values['forecast_block_products'])),
+        }
+
+    # Scheduling
+
+    def start(self):
+        """Start the nightly scheduling thread"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run_loop, name="demand-forecaster", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the scheduling thread"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def run_loop(self):
+        """Wake up periodically and run the forecast once a night"""
+        while not self.stop_event.is_set():
+            try:
+                config = self.load_config()
+                if config['enabled'] and self.is_due(config):
+                    self.run_claimed(config)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error("Scheduled demand forecast failed: %s", e)
+            self.stop_event.wait(self.POLL_SECONDS)
+
+    def is_due(self, config: Dict) -> bool:
+        """Whether tonight's run is still to do"""
+        now = datetime.now()
+        return (now.hour >= config['hour']
+                and self.db_manager.get_setting(self.LAST_RUN_SETTING) != now.date().isoformat())
+
+    def claim_run(self, day: str) -> Optional[str]:
+        """Mark a day's run as taken unless another process already took it
+
+        Every process opening the database runs the schedule, so the run
+        is claimed with one conditional UPDATE and only its winner forecasts.
+        Returns the previously recorded date (to put back if the run fails),
+        or None if the day was already claimed.
+        """
+        conn = self.db_manager.get_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES (?, '')", (self.LAST_RUN_SETTING,))
+            previous = conn.execute("SELECT value FROM settings WHERE key = ?", (self.LAST_RUN_SETTING,)).fetchone()[0]
+            claimed = conn.execute(self.CLAIM_RUN, (day, self.LAST_RUN_SETTING, day)).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        return previous if claimed else None
+
+    def run_claimed(self, config: Dict) -> Optional[Dict]:
+        """Run tonight's forecast if this process wins the claim; None if another one did"""
+        previous = self.claim_run(date.today().isoformat())
+        if previous is None:
+            return None
+        try:
+            return self.run_once(config)
+        except Exception:
+            # Let the next poll (in any process) try again
+            self.db_manager.update_setting(self.LAST_RUN_SETTING, previous)
+            raise
+
+    # Running
+
+    def run_once(self, config: Optional[Dict] = None) -> Dict:
+        """Forecast every product from the history up to yesterday and store the results
+
+        Returns a summary dict with the product count and timings.
+        """
+        config = config or self.load_config()
+        with self.run_lock:
+            started = time.monotonic()
+            end = date.today()
+            start = end - timedelta(days=config['history_days'])
+
+            product_ids, row_index, day_index, units = self.load_sales(start, end)
+            loaded = time.monotonic()
+            results = self.forecast(product_ids, row_index, day_index, units, config)
+            computed = time.monotonic()
+            self.store(product_ids, results, config)
+
+            self.db_manager.update_setting(self.LAST_RUN_SETTING, end.isoformat())
+            result = {
+                'products': len(product_ids),
+                'history_start': start.isoformat(),
+                'history_end': (end - timedelta(days=1)).isoformat(),
+                'load_seconds': loaded - started,
+                'forecast_seconds': computed - loaded,
+                'duration': time.monotonic() - started,
+            }
+            metrics.timer('demand_forecast_seconds', "Duration of demand forecast runs").observe(result['duration'])
+            logger.info("Forecast demand for %s product(s) in %.1f s (load %.1f s, forecast %.1f s)",
+                        result['products'], result['duration'], result['load_seconds'], result['forecast_seconds'])
+            self.last_result = result
+            self.last_error = None
+            return result
+
+    def load_sales(self, start: date, end: date) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Units sold per product per local day from ``start`` up to (not including) ``end``
+
+        Returns the distinct product IDs and, per (product, day) with sales,
+        the product's position in that array, the day's offset from start
+        and the units.
+        """
+        products, days, units = [], [], []
+        for conn, schemas in self.db_manager.archive.reporting_batches(start.isoformat(), end.isoformat()):
+            cursor = conn.cursor()
+            for schema in schemas:
+                # Demand is what customers kept: returned units come off the day they were sold
+                returned = ReturnsManager.returned_units_sql(conn, schema)
+                # Bounds are local midnights converted to UTC, so the created_at index applies
+                cursor.execute(f'''
+                    SELECT si.product_id,
+                           CAST(julianday(s.created_at, 'localtime', 'start of day') - julianday(?) AS INTEGER) AS day,
+                           SUM(si.quantity - {returned}) AS units
+                    FROM {schema}.sales s
+                    JOIN {schema}.sale_items si ON si.sale_id = s.id
+                    WHERE s.created_at >= datetime(?, 'utc') AND s.created_at < datetime(?, 'utc')
+                    GROUP BY si.product_id, day
+                ''', (start.isoformat(), start.isoformat(), end.isoformat()))
+                while True:
+                    batch = cursor.fetchmany(self.FETCH_SIZE)
+                    if not batch:
+                        break
+                    block = np.array(batch, dtype=np.float64).reshape(-1, 3)
+                    products.append(block[:, 0].astype(np.int64))
+                    days.append(block[:, 1].astype(np.int32))
+                    units.append(block[:, 2])
+
+        if not products:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty.astype(np.int32), empty.astype(np.int32), np.zeros(0)
+
+        product_ids, row_index = np.unique(np.concatenate(products), return_inverse=True)
+        return product_ids, row_index.astype(np.int32), np.concatenate(days), np.concatenate(units)
+
+    def iter_blocks(self, product_count: int, row_index: np.ndarray, block_products: int
+                    ) -> Iterator[Tuple[int, int, np.ndarray]]:
+        """Yield (first row, row count, triplet positions) for each block of products"""
+        order = np.argsort(row_index, kind='stable')
+        sorted_rows = row_index[order]
+        for first in range(0, product_count, block_products):
+            count = min(block_products, product_count - first)
+            low, high = np.searchsorted(sorted_rows, [first, first + count])
+            yield first, count, order[low:high]
+
+    def forecast(self, product_ids: np.ndarray, row_index: np.ndarray, day_index: np.ndarray,
+                 units: np.ndarray, config: Dict) -> Dict[str, np.ndarray]:
+        """Forecast all products block by block, in worker processes when there is more than one block"""
+        product_count = len(product_ids)
+        days, alpha = config['history_days'], config['alpha']
+        results = {name: [] for name in ('method', 'daily_rate', 'error_std', 'demand_interval', 'sales_days')}
+        if not product_count:
+            return {name: np.zeros(0) for name in results}
+
+        blocks = [(count, days, row_index[positions] - first, day_index[positions], units[positions], alpha)
+                  for first, count, positions in self.iter_blocks(product_count, row_index, config['block_products'])]
+        workers = min(config['workers'], len(blocks))
+        if workers > 1:
+            # Spawned rather than forked: the UI and server processes run threads that hold locks
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                outputs = list(pool.map(forecast_block, *zip(*blocks)))
+        else:
+            outputs = [forecast_block(*block) for block in blocks]
+
+        for output in outputs:
+            for name in results:
+                results[name].append(output[name])
+        return {name: np.concatenate(parts) for name, parts in results.items()}
+
+    def store(self, product_ids: np.ndarray, results: Dict[str, np.ndarray], config: Dict):
+        """Replace the stored forecasts with a run's results in one transaction"""
+        horizon, history = config['horizon_days'], config['history_days']
+        conn = self.db_manager.get_connection()
+        try:
+            generated_at = conn.execute("SELECT CURRENT_TIMESTAMP").fetchone()[0]
+            conn.execute(self.ZERO_ALL, (history, horizon, generated_at))
+            conn.executemany(self.UPSERT, (
+                (int(product_id), METHODS[method], float(rate), float(rate * horizon), float(error_std),
+                 float(interval), int(sales_days), history, horizon, generated_at)
+                for product_id, method, rate, error_std, interval, sales_days in zip(
+                    product_ids, results['method'], results['daily_rate'], results['error_std'],
+                    results['demand_interval'], results['sales_days'])
+            ))
+            conn.commit()
+        finally:
+            conn.close()
+
+    # Reading
+
+    def get_forecasts(self, limit: Optional[int] = None) -> List[Dict]:
+        """Stored forecasts of active products with their stock, highest forecast demand first
+
+        days_of_cover is how long the current stock lasts at the forecast rate (None without demand).
+        """
+        query = '''
+            SELECT f.product_id, p.name, p.barcode, p.quantity, p.min_quantity,
+                   f.method, f.daily_rate, f.forecast_units, f.error_std, f.demand_interval,
+                   f.sales_days, f.history_days, f.horizon_days, f.generated_at
+            FROM demand_forecasts f
+            JOIN products p ON p.id = f.product_id
+            WHERE p.is_active = 1
+            ORDER BY f.forecast_units DESC, p.name
+        '''
+        params: List = []
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        conn = self.db_manager.get_connection()
+        try:
+            rows = [dict(row) for row in conn.execute(query, params).fetchall()]
+        finally:
+            conn.close()
+        for row in rows:
+            row['days_of_cover'] = max(row['quantity'], 0) / row['daily_rate'] if row['daily_rate'] > 0 else None
+        return rows
+
+def main(argv=None):
+    """Command line entry point: python -m src.database.forecasting [--db PATH]"""
+    from src.database.database_manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="LKS POS demand forecasting")
+    parser.add_argument("--db", default="pos_system.db", help="Database path")
+    parser.add_argument("--top", type=int, default=20, help="Print this many forecasts after the run")
+    args = parser.parse_args(argv)
+
+    db_manager = DatabaseManager(args.db)
+    db_manager.create_tables()
+    forecaster = db_manager.forecasts
+    result = forecaster.run_once()
+    print(f"Forecast {result['products']} product(s) from {result['history_start']} to {result['history_end']} "
+          f"in {result['duration']:.1f} s")
+    for row in forecaster.get_forecasts(args.top):
+        print(f"  {row['name']:<32} {row['method']:<8} {row['daily_rate']:>8.2f}/day "
+              f"{row['forecast_units']:>10.1f} over {row['horizon_days']} days")
+
+if __name__ == "__main__":
+    main()
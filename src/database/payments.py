@@ -0,0 +1,88 @@
+"""
+Payments - Tenders taken for a sale
+"""
+
+from typing import Dict, List, Tuple
+
+TENDER_TYPES = ('cash', 'card')
+
+class PaymentError(Exception):
+    """Raised when the tenders do not settle a sale"""
+
+class PaymentsManager:
+    """Settles sales against one or more tenders and records them.
+
+    Tenders are written by ``record`` inside the sale's own transaction, so
+    a split payment costs a few extra inserts but no extra commit. Change is
+    only ever given from cash: card tenders are applied in full and may not
+    overpay the sale.
+    """
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    @staticmethod
+    def settle(total_amount: float, tenders: List[Dict]) -> Tuple[str, List[Dict], float]:
+        """Work out how tenders pay a sale
+
+        tenders is a list of {'method', 'amount', 'reference'} with the amount
+        handed over. Returns (payment_method, payments, change) where each
+        payment carries the amount applied to the sale, the amount tendered
+        and the change given from it. Raises PaymentError if the tenders fall
+        short or would need change from a card.
+        """
+        if not tenders:
+            raise PaymentError("No payment was taken")
+
+        for tender in tenders:
+            if tender['method'] not in TENDER_TYPES:
+                raise PaymentError(f"Unknown tender '{tender['method']}', expected one of {TENDER_TYPES}")
+            if tender['amount'] <= 0:
+                raise PaymentError("Tender amounts must be positive")
+
+        paid = round(sum(tender['amount'] for tender in tenders), 2)
+        total_amount = round(total_amount, 2)
+        if paid < total_amount:
+            raise PaymentError(f"Payment of {paid:.2f} does not cover the total of {total_amount:.2f}")
+
+        change = round(paid - total_amount, 2)
+        cash = round(sum(tender['amount'] for tender in tenders if tender['method'] == 'cash'), 2)
+        if change > cash:
+            raise PaymentError("Card payments cannot exceed the amount due")
+
+        payments = []
+        remaining_change = change
+        # Give change from the last cash tenders first
+        for tender in reversed(tenders):
+            given = min(remaining_change, tender['amount']) if tender['method'] == 'cash' else 0
+            remaining_change = round(remaining_change - given, 2)
+            payments.append({
+                'method': tender['method'],
+                'amount': round(tender['amount'] - given, 2),
+                'tendered': round(tender['amount'], 2),
+                'change_amount': round(given, 2),
+                'reference': tender.get('reference'),
+            })
+        payments.reverse()
+
+        methods = {payment['method'] for payment in payments}
+        payment_method = methods.pop() if len(methods) == 1 else 'mixed'
+        return payment_method, payments, change
+
+    @staticmethod
+    def record(cursor, sale_id: int, payments: List[Dict]):
+        """Insert settled payments inside the caller's transaction"""
+        cursor.executemany('''
+            INSERT INTO payments (sale_id, tender_type, amount, tendered, change_amount, reference)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(sale_id, payment['method'], payment['amount'], payment['tendered'],
+               payment['change_amount'], payment['reference']) for payment in payments])
+
+    def get_payments_for_sale(self, sale_id: int) -> List[Dict]:
+        """Get the tenders taken for a sale"""
+        conn = self.db_manager.get_connection()
+        try:
+            cursor = conn.execute("SELECT * FROM payments WHERE sale_id = ? ORDER BY id", (sale_id,))
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
@@ -0,0 +1,334 @@
+"""
+POS Server - Serves one database to several tills over a local HTTP/JSON API
+"""
+
+import argparse
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import secrets
+import threading
+from collections import OrderedDict
+from dataclasses import fields, is_dataclass
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from src.database.rows import ColumnBatch, Product, Sale, SaleItem
+from src.utils.log_manager import LogManager
+from src.utils.metrics import metrics
+
+try:
+    import numpy as np
+except ImportError:  # Only needed to send analytics arrays
+    np = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+
+# Everything a till may call; maintenance (restore, archiving) stays on the server
+REMOTE_METHODS = frozenset({
+    'authenticate_user', 'log_activity', 'get_setting', 'update_setting',
+    'get_products', 'get_products_page', 'get_product_by_barcode', 'get_product_by_id',
+    'get_products_by_ids', 'update_product_quantity',
+    'create_sale', 'get_sale_id', 'get_sales_report', 'get_profit_summary', 'get_sale_items',
+    'quick_products.get_quick_products',
+    'analytics.compute',
+    'stock.adjust', 'stock.stock_at', 'stock.stock_levels_at', 'stock.get_movements', 'stock.reconcile',
+    'stock.low_stock', 'stock.daily_sales',
+    'returns.find_sale', 'returns.create_return', 'returns.get_returns_for_sale',
+    'payments.get_payments_for_sale',
+    'purchasing.create_purchase_order', 'purchasing.get_purchase_orders', 'purchasing.get_purchase_order',
+    'purchasing.cancel_purchase_order', 'purchasing.receive', 'purchasing.receive_order', 'purchasing.get_receipts',
+    'backup_scheduler.load_config', 'backup_scheduler.list_generations', 'backup_scheduler.run_once',
+    'forecasts.load_config', 'forecasts.run_once', 'forecasts.get_forecasts',
+    'archive.get_archive_summary', 'archive.retention_months',
+    'change_feed.current_sequence', 'change_feed.snapshot', 'change_feed.changes_since',
+    'profiler.stats', 'profiler.get_recent_slow', 'profiler.get_config', 'profiler.configure', 'profiler.reset',
+    'products.create', 'products.update', 'products.deactivate',
+    'categories.list', 'categories.create', 'categories.update',
+    'suppliers.list', 'suppliers.create', 'suppliers.update',
+    'users.create', 'users.update', 'users.set_username', 'users.set_full_name', 'users.set_password',
+    'activity.log', 'activity.recent',
+})
+
+# Changes to accounts, settings and the server itself: only an admin's session may make them
+ADMIN_METHODS = frozenset({
+    'update_setting', 'users.create', 'users.update',
+    'profiler.configure', 'profiler.reset', 'backup_scheduler.run_once',
+})
+# A user may change their own account (the user ID is the first argument); an admin any account
+OWN_ACCOUNT_METHODS = frozenset({'users.set_username', 'users.set_full_name', 'users.set_password'})
+
+# Logins remembered by the server; the oldest are forgotten first
+MAX_SESSIONS = 1024
+
+ROW_CLASSES = {row_class.__name__: row_class for row_class in (Product, Sale, SaleItem)}
+
+# Request bodies larger than this are refused rather than read into memory
+MAX_REQUEST_BYTES = 8 * 1024 * 1024
+
+def encode_value(value: Any):
+    """json.dumps default= hook for the row types the database methods return"""
+    if is_dataclass(value) and type(value).__name__ in ROW_CLASSES:
+        return {'__row__': type(value).__name__,
+                'values': {field.name: getattr(value, field.name) for field in fields(value)}}
+    if isinstance(value, ColumnBatch):
+        return {'__columns__': {name: list(column) for name, column in value.columns.items()}}
+    if np is not None and isinstance(value, np.ndarray):
+        return {'__array__': value.tolist(), 'dtype': str(value.dtype)}
+    if np is not None and isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} cannot be sent to a till")
+
+def decode_value(obj: Dict):
+    """json.loads object_hook= that rebuilds the row types encode_value wrote
+
+    Raises ValueError for a row or column batch that cannot be rebuilt.
+    """
+    try:
+        if '__row__' in obj:
+            return ROW_CLASSES[obj['__row__']](**obj['values'])
+        if '__columns__' in obj:
+            return ColumnBatch({name: ColumnBatch.pack_column(values) for name, values in obj['__columns__'].items()})
+        if '__array__' in obj:
+            if np is None:
+                raise ValueError("NumPy is needed to decode arrays")
+            return np.array(obj['__array__'], dtype=obj['dtype'])
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Malformed encoded value: {e!r}") from e
+    return obj
+
+def dumps(value: Any) -> bytes:
+    return json.dumps(value, default=encode_value, separators=(',', ':')).encode('utf-8')
+
+def loads(data: bytes):
+    return json.loads(data, object_hook=decode_value)
+
+def call_error(call) -> Optional[str]:
+    """Why a decoded call is malformed, or None if it can be dispatched"""
+    if not isinstance(call, dict):
+        return "A call must be a JSON object"
+    if not isinstance(call.get('method'), str):
+        return "A call needs a method name"
+    if not isinstance(call.get('args', []), list) or not isinstance(call.get('kwargs', {}), dict):
+        return "args must be a list and kwargs an object"
+    return None
+
+def is_loopback(host: str) -> bool:
+    """Whether an address to listen on is reachable from this machine only"""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+class POSRequestHandler(BaseHTTPRequestHandler):
+    """Handles POST /rpc (one call), POST /batch (a list of calls), GET /health and GET /metrics.
+
+    HTTP/1.1 with a Content-Length on every response, so tills keep one
+    connection open instead of reconnecting per call.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without this each reply waits on a delayed ACK
+    disable_nagle_algorithm = True
+    server: "POSServer"
+
+    def request_token(self) -> Optional[str]:
+        """The server token sent as X-POS-Token, or as a bearer token by a metrics scraper"""
+        authorization = self.headers.get('Authorization') or ""
+        if authorization.startswith("Bearer "):
+            return authorization[len("Bearer "):]
+        return self.headers.get('X-POS-Token')
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            # Sales and checkout counts are business data
+            if not self.server.authorized(self.request_token()):
+                self.send_json(401, {'error': {'type': 'Unauthorized', 'message': "Invalid server token"}})
+                return
+            self.send_body(200, metrics.render().encode('utf-8'), 'text/plain; version=0.0.4')
+            return
+        if self.path != "/health":
+            self.send_json(404, {'error': {'type': 'NotFound', 'message': self.path}})
+            return
+        from src.database.database_manager import SCHEMA_VERSION
+        self.send_json(200, {'status': 'ok', 'schema_version': SCHEMA_VERSION})
+
+    def do_POST(self):
+        if not self.server.authorized(self.headers.get('X-POS-Token')):
+            self.send_json(401, {'error': {'type': 'Unauthorized', 'message': "Invalid server token"}})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.send_json(400, {'error': {'type': 'BadRequest', 'message': "Invalid Content-Length"}})
+            self.close_connection = True
+            return
+        if length > MAX_REQUEST_BYTES:
+            self.send_json(413, {'error': {'type': 'RequestTooLarge', 'message': f"{length} bytes"}})
+            self.close_connection = True
+            return
+
+        try:
+            request = loads(self.rfile.read(length))
+        except ValueError as e:
+            self.send_json(400, {'error': {'type': 'BadRequest', 'message': str(e)}})
+            return
+
+        if self.path not in ("/rpc", "/batch"):
+            self.send_json(404, {'error': {'type': 'NotFound', 'message': self.path}})
+            return
+
+        calls = [request] if self.path == "/rpc" else request
+        error = "A batch must be a JSON list" if not isinstance(calls, list) else next(
+            filter(None, map(call_error, calls)), None)
+        if error:
+            self.send_json(400, {'error': {'type': 'BadRequest', 'message': error}})
+            return
+
+        session = self.headers.get('X-POS-Session')
+        results = [self.server.dispatch(call, session) for call in calls]
+        self.send_json(200, results[0] if self.path == "/rpc" else results)
+
+    def send_json(self, status: int, payload):
+        self.send_body(status, dumps(payload), 'application/json')
+
+    def send_body(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # One line per call would swamp the console; errors are logged by dispatch
+        pass
+
+class POSServer(ThreadingHTTPServer):
+    """Owns the database and runs each till's calls against it on a worker thread
+
+    Without a token every call is accepted, so that is only allowed on a
+    loopback address; listening on the network requires one.
+
+    The token only says a request comes from a till. A successful
+    authenticate_user call also opens a session for the user, which the
+    till sends back as X-POS-Session; ADMIN_METHODS need an admin's
+    session, and OWN_ACCOUNT_METHODS the account owner's or an admin's.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, db_manager, token: Optional[str] = None):
+        if not token and not is_loopback(address[0]):
+            raise ValueError(f"Listening on {address[0]} requires a token (--token or $LKS_POS_TOKEN)")
+        super().__init__(address, POSRequestHandler)
+        self.db_manager = db_manager
+        self.token = token
+        self.sessions: "OrderedDict[str, int]" = OrderedDict()
+        self.sessions_lock = threading.Lock()
+
+    def authorized(self, token: Optional[str]) -> bool:
+        return not self.token or hmac.compare_digest(token or "", self.token)
+
+    def open_session(self, user_id: int) -> str:
+        """Remember a login; returns the session ID the till sends back"""
+        session = secrets.token_urlsafe(24)
+        with self.sessions_lock:
+            self.sessions[session] = user_id
+            while len(self.sessions) > MAX_SESSIONS:
+                self.sessions.popitem(last=False)
+        return session
+
+    def permission_error(self, method: str, call: Dict, session: Optional[str]) -> Optional[str]:
+        """Why the session may not make a call, or None if it may"""
+        if method not in ADMIN_METHODS and method not in OWN_ACCOUNT_METHODS:
+            return None
+        with self.sessions_lock:
+            user_id = self.sessions.get(session) if session else None
+        if user_id is None:
+            return f"Log in to call '{method}'"
+        # The role is read on every call, so a demoted or deactivated admin loses access at once
+        if self.db_manager.users.role(user_id) == 'admin':
+            return None
+        args, kwargs = call.get('args', []), call.get('kwargs', {})
+        target = args[0] if args else kwargs.get('user_id')
+        if method in OWN_ACCOUNT_METHODS and target == user_id:
+            return None
+        return f"Only an administrator may call '{method}'"
+
+    def dispatch(self, call: Dict, session: Optional[str] = None) -> Dict:
+        """Run one {'method', 'args', 'kwargs'} call; returns {'result'} or {'error'}
+
+        A successful authenticate_user also returns the new 'session'.
+        """
+        method = call.get('method')
+        if method not in REMOTE_METHODS:
+            return {'error': {'type': 'RemoteError', 'message': f"Method '{method}' is not available remotely"}}
+        denied = self.permission_error(method, call, session)
+        if denied:
+            logger.warning("Refused remote call %s: %s", method, denied)
+            return {'error': {'type': 'PermissionError', 'message': denied}}
+
+        metrics.counter('remote_calls_total', "Calls served to tills").inc()
+        try:
+            target = self.db_manager
+            for name in method.split('.'):
+                target = getattr(target, name)
+            # Whitelisted properties are read, everything else is called
+            result = target(*call.get('args', []), **call.get('kwargs', {})) if callable(target) else target
+        except Exception as e:
+            logger.error("Error in remote call %s: %s", method, e)
+            return {'error': {'type': type(e).__name__, 'message': str(e)}}
+
+        if method == 'authenticate_user' and result:
+            return {'result': result, 'session': self.open_session(result['id'])}
+        return {'result': result}
+
+def main(argv=None):
+    """Command line entry point: python -m src.database.pos_server [--port N]"""
+    from src.database.database_manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="LKS POS database server")
+    parser.add_argument("--db", default="pos_system.db", help="Database path")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (0.0.0.0 for the whole network)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default {DEFAULT_PORT})")
+    parser.add_argument("--token", default=os.environ.get("LKS_POS_TOKEN"),
+                        help="Shared secret tills must send (default: $LKS_POS_TOKEN)")
+    args = parser.parse_args(argv)
+    if not args.token and not is_loopback(args.host):
+        parser.error(f"--host {args.host} exposes the database to the network; set --token or $LKS_POS_TOKEN")
+
+    LogManager.setup()
+
+    db_manager = DatabaseManager(args.db)
+    db_manager.create_tables()
+    db_manager.create_default_admin()
+    db_manager.stock.compact()
+    db_manager.change_feed.prune()
+    db_manager.backup_scheduler.start()
+    db_manager.forecasts.start()
+
+    server = POSServer((args.host, args.port), db_manager, args.token)
+    logger.info("Serving %s on http://%s:%s", os.path.abspath(args.db), args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        db_manager.backup_scheduler.stop()
+        db_manager.forecasts.stop()
+
+if __name__ == "__main__":
+    main()
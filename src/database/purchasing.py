@@ -0,0 +1,351 @@
+"""
+Purchasing - Purchase orders and goods receipts that bring stock in
+"""
+
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+class PurchasingError(Exception):
+    """Raised when a purchase order or goods receipt is not valid"""
+
+class PurchasingManager:
+    """Purchase orders to suppliers and the goods receipts that put stock on the shelf.
+
+    A receipt is posted in one transaction however many lines it has: the
+    receipt header, its lines (one executemany), the stock movements and
+    on-hand updates (StockLedger.record_many), the new cost prices and the
+    received quantities of the purchase order lines it fills. Receiving a
+    delivery of hundreds of lines is therefore a handful of statements
+    rather than one product edit per line.
+
+    A product's cost_price is its weighted-average cost: each receipt
+    blends the received units' cost with the stock already on hand, and
+    every sale snapshots that average into its line items.
+    """
+
+    OPEN_STATUSES = ('open', 'partially_received')
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    @staticmethod
+    def new_number(prefix: str) -> str:
+        return f"{prefix}-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
+
+    # Purchase orders
+
+    def create_purchase_order(self, supplier_id: int, items: List[Dict], user_id: int,
+                              notes: str = "") -> Dict:
+        """Order products from a supplier
+
+        items is a list of {'product_id', 'quantity', 'unit_cost'}; lines for
+        the same product at the same cost are merged. Returns a summary dict.
+        """
+        lines: Dict[tuple, int] = {}
+        for item in items:
+            if item['quantity'] > 0:
+                key = (item['product_id'], round(float(item.get('unit_cost') or 0), 4))
+                lines[key] = lines.get(key, 0) + item['quantity']
+        if not lines:
+            raise PurchasingError("Add at least one product to the order")
+
+        po_number = self.new_number("PO")
+        total_cost = round(sum(quantity * unit_cost for (_, unit_cost), quantity in lines.items()), 2)
+
+        conn = self.db_manager.get_connection()
+        try:
+            cursor = conn.cursor()
+            if cursor.execute("SELECT 1 FROM suppliers WHERE id = ?", (supplier_id,)).fetchone() is None:
+                raise PurchasingError(f"Supplier {supplier_id} does not exist")
+
+            cursor.execute('''
+                INSERT INTO purchase_orders (po_number, supplier_id, user_id, notes, total_cost)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (po_number, supplier_id, user_id, notes, total_cost))
+            purchase_order_id = cursor.lastrowid
+            cursor.executemany('''
+                INSERT INTO purchase_order_items (purchase_order_id, product_id, quantity_ordered, unit_cost)
+                VALUES (?, ?, ?, ?)
+            ''', [(purchase_order_id, product_id, quantity, unit_cost)
+                  for (product_id, unit_cost), quantity in lines.items()])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        return {'purchase_order_id': purchase_order_id, 'po_number': po_number,
+                'lines': len(lines), 'total_cost': total_cost}
+
+    def get_purchase_orders(self, status: Optional[str] = None, limit: int = 200) -> List[Dict]:
+        """Get purchase orders, newest first, with supplier name and ordered/received unit totals"""
+        condition, params = ("WHERE po.status = ?", [status]) if status else ("", [])
+        conn = self.db_manager.get_connection()
+        try:
+            cursor = conn.execute(f'''
+                SELECT po.*, s.name AS supplier_name, u.full_name AS user_name,
+                       COUNT(poi.id) AS lines,
+                       COALESCE(SUM(poi.quantity_ordered), 0) AS units_ordered,
+                       COALESCE(SUM(poi.quantity_received), 0) AS units_received
+                FROM purchase_orders po
+                LEFT JOIN suppliers s ON po.supplier_id = s.id
+                LEFT JOIN users u ON po.user_id = u.id
+                LEFT JOIN purchase_order_items poi ON poi.purchase_order_id = po.id
+                {condition}
+                GROUP BY po.id
+                ORDER BY po.id DESC
+                LIMIT ?
+            ''', (*params, limit))
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def get_purchase_order(self, purchase_order_id: int) -> Optional[Dict]:
+        """Get a purchase order with its lines and what remains to be received of each"""
+        conn = self.db_manager.get_connection()
+        try:
+            order = conn.execute('''
+                SELECT po.*, s.name AS supplier_name
+                FROM purchase_orders po
+                LEFT JOIN suppliers s ON po.supplier_id = s.id
+                WHERE po.id = ?
+            ''', (purchase_order_id,)).fetchone()
+            if order is None:
+                return None
+
+            items = [dict(row) for row in conn.execute('''
+                SELECT poi.*, p.name AS product_name, p.barcode
+                FROM purchase_order_items poi
+                LEFT JOIN products p ON poi.product_id = p.id
+                WHERE poi.purchase_order_id = ?
+                ORDER BY poi.id
+            ''', (purchase_order_id,)).fetchall()]
+        finally:
+            conn.close()
+
+        for item in items:
+            item['remaining_quantity'] = max(item['quantity_ordered'] - item['quantity_received'], 0)
+        return {'order': dict(order), 'items': items}
+
+    def cancel_purchase_order(self, purchase_order_id: int):
+        """Cancel what is still outstanding on an order; stock already received stays"""
+        conn = self.db_manager.get_connection()
+        try:
+            cursor = conn.execute(f'''
+                UPDATE purchase_orders SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status IN ({", ".join("?" * len(self.OPEN_STATUSES))})
+            ''', (purchase_order_id, *self.OPEN_STATUSES))
+            conn.commit()
+        finally:
+            conn.close()
+        if cursor.rowcount == 0:
+            raise PurchasingError("Only open purchase orders can be cancelled")
+
+    # Goods receipts
+
+    def receive(self, items: List[Dict], user_id: int, purchase_order_id: Optional[int] = None,
+                supplier_id: Optional[int] = None, note: str = "", update_cost: bool = True) -> Dict:
+        """Post a delivery: stock movements, cost prices and order progress in one transaction
+
+        items is a list of {'product_id', 'quantity'} with optional
+        'unit_cost' and 'purchase_order_item_id'. Against a purchase order,
+        a line without purchase_order_item_id fills that product's order
+        line; products that were not ordered are received as extra lines.
+        The unit cost defaults to the order line's, then to the product's
+        current cost price. With update_cost, each product's average cost
+        is re-weighted by the units received. Raises PurchasingError if an
+        order line would be over-received or the order is not open.
+        Returns a summary dict.
+        """
+        items = [item for item in items if item['quantity'] > 0]
+        if not items:
+            raise PurchasingError("Add at least one received item")
+
+        receipt_number = self.new_number("GRN")
+        conn = self.db_manager.get_connection()
+        try:
+            cursor = conn.cursor()
+            # Take the write lock before reading, so two receipts cannot fill the same order line twice
+            cursor.execute("BEGIN IMMEDIATE")
+
+            order_lines: Dict[int, Dict] = {}
+            if purchase_order_id is not None:
+                order = cursor.execute("SELECT * FROM purchase_orders WHERE id = ?",
+                                       (purchase_order_id,)).fetchone()
+                if order is None:
+                    raise PurchasingError(f"Purchase order {purchase_order_id} does not exist")
+                if order['status'] not in self.OPEN_STATUSES:
+                    raise PurchasingError(f"Purchase order {order['po_number']} is {order['status']}")
+                supplier_id = supplier_id or order['supplier_id']
+                order_lines = {row['id']: dict(row) for row in cursor.execute(
+                    "SELECT * FROM purchase_order_items WHERE purchase_order_id = ? ORDER BY id",
+                    (purchase_order_id,)).fetchall()}
+
+            product_ids = list(dict.fromkeys(item['product_id'] for item in items))
+            # Read before record_many, so averages weigh the stock on hand before this delivery
+            on_hand = {row['id']: dict(row) for row in cursor.execute(
+                f"SELECT id, quantity, cost_price FROM products WHERE id IN ({', '.join('?' * len(product_ids))})",
+                product_ids).fetchall()}
+            missing = [product_id for product_id in product_ids if product_id not in on_hand]
+            if missing:
+                raise PurchasingError(f"Product {missing[0]} does not exist")
+
+            lines = self.match_order_lines(items, order_lines)
+            for line in lines:
+                order_line = order_lines.get(line['purchase_order_item_id'])
+                if line.get('unit_cost') is None:
+                    line['unit_cost'] = (order_line['unit_cost'] if order_line
+                                         else on_hand[line['product_id']]['cost_price'] or 0)
+            filled: Dict[int, int] = {}
+            for line in lines:
+                if line['purchase_order_item_id'] is not None:
+                    filled[line['purchase_order_item_id']] = (filled.get(line['purchase_order_item_id'], 0)
+                                                              + line['quantity'])
+            for order_item_id, quantity in filled.items():
+                order_line = order_lines[order_item_id]
+                remaining = order_line['quantity_ordered'] - order_line['quantity_received']
+                if quantity > remaining:
+                    raise PurchasingError(f"Only {remaining} unit(s) of product {order_line['product_id']} "
+                                          f"remain on order")
+
+            total_cost = round(sum(line['quantity'] * line['unit_cost'] for line in lines), 2)
+            cursor.execute('''
+                INSERT INTO goods_receipts (receipt_number, purchase_order_id, supplier_id, user_id, note, total_cost)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (receipt_number, purchase_order_id, supplier_id, user_id, note, total_cost))
+            receipt_id = cursor.lastrowid
+
+            cursor.executemany('''
+                INSERT INTO goods_receipt_items (receipt_id, purchase_order_item_id, product_id, quantity, unit_cost)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(receipt_id, line['purchase_order_item_id'], line['product_id'], line['quantity'],
+                   line['unit_cost']) for line in lines])
+            self.db_manager.stock.record_many(cursor, [(line['product_id'], line['quantity']) for line in lines],
+                                              'receipt', 'goods_receipt', receipt_id, user_id)
+
+            if update_cost:
+                cursor.executemany("UPDATE products SET cost_price = ? WHERE id = ?",
+                                   [(cost, product_id) for product_id, cost in self.average_costs(on_hand, lines).items()])
+
+            status = None
+            if purchase_order_id is not None:
+                cursor.executemany('''
+                    UPDATE purchase_order_items
+                    SET quantity_received = quantity_received + ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', [(quantity, order_item_id) for order_item_id, quantity in filled.items()])
+                outstanding = cursor.execute('''
+                    SELECT COUNT(*) FROM purchase_order_items
+                    WHERE purchase_order_id = ? AND quantity_received < quantity_ordered
+                ''', (purchase_order_id,)).fetchone()[0]
+                status = 'partially_received' if outstanding else 'received'
+                cursor.execute('''
+                    UPDATE purchase_orders SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
+                ''', (status, purchase_order_id))
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        # Received products may no longer be low on stock
+        self.db_manager.stock_alerts.check(product_ids)
+
+        return {
+            'receipt_id': receipt_id,
+            'receipt_number': receipt_number,
+            'purchase_order_id': purchase_order_id,
+            'status': status,
+            'lines': len(lines),
+            'units': sum(line['quantity'] for line in lines),
+            'total_cost': total_cost,
+        }
+
+    @staticmethod
+    def average_costs(on_hand: Dict[int, Dict], lines: List[Dict]) -> Dict[int, float]:
+        """Weighted-average cost of each product after receiving the lines
+
+        on_hand maps product IDs to their quantity and cost_price before the
+        receipt. Stock at or below zero, or without a cost, carries no
+        weight, so the received cost is taken as is.
+        """
+        received: Dict[int, List[float]] = {}
+        for line in lines:
+            units_value = received.setdefault(line['product_id'], [0, 0.0])
+            units_value[0] += line['quantity']
+            units_value[1] += line['quantity'] * line['unit_cost']
+
+        costs = {}
+        for product_id, (units, value) in received.items():
+            product = on_hand[product_id]
+            stock = max(product['quantity'], 0) if product['cost_price'] is not None else 0
+            costs[product_id] = round((stock * (product['cost_price'] or 0) + value) / (stock + units), 4)
+        return costs
+
+    @staticmethod
+    def match_order_lines(items: List[Dict], order_lines: Dict[int, Dict]) -> List[Dict]:
+        """Attach each received item to its purchase order line, if it has one
+
+        An item naming its order line keeps it; otherwise it goes to the
+        first line for the same product with units still outstanding, then
+        to that product's last line (so over-receipt is reported against
+        it). Raises PurchasingError for an order line of another order.
+        """
+        outstanding: Dict[int, int] = {order_item_id: line['quantity_ordered'] - line['quantity_received']
+                                       for order_item_id, line in order_lines.items()}
+        by_product: Dict[int, List[int]] = {}
+        for order_item_id, line in order_lines.items():
+            by_product.setdefault(line['product_id'], []).append(order_item_id)
+
+        lines = []
+        for item in items:
+            order_item_id = item.get('purchase_order_item_id')
+            if order_item_id is not None:
+                if order_item_id not in order_lines or order_lines[order_item_id]['product_id'] != item['product_id']:
+                    raise PurchasingError(f"Order line {order_item_id} is not part of this purchase order")
+            elif item['product_id'] in by_product:
+                candidates = by_product[item['product_id']]
+                order_item_id = next((candidate for candidate in candidates if outstanding[candidate] > 0),
+                                     candidates[-1])
+            if order_item_id is not None:
+                outstanding[order_item_id] -= item['quantity']
+            lines.append({'product_id': item['product_id'], 'quantity': item['quantity'],
+                          'unit_cost': item.get('unit_cost'), 'purchase_order_item_id': order_item_id})
+        return lines
+
+    def receive_order(self, purchase_order_id: int, user_id: int, note: str = "") -> Dict:
+        """Receive everything still outstanding on a purchase order at the ordered costs"""
+        purchase_order = self.get_purchase_order(purchase_order_id)
+        if purchase_order is None:
+            raise PurchasingError(f"Purchase order {purchase_order_id} does not exist")
+        items = [{'product_id': item['product_id'], 'quantity': item['remaining_quantity'],
+                  'purchase_order_item_id': item['id']}
+                 for item in purchase_order['items'] if item['remaining_quantity'] > 0]
+        return self.receive(items, user_id, purchase_order_id, note=note)
+
+    def get_receipts(self, purchase_order_id: Optional[int] = None, limit: int = 200) -> List[Dict]:
+        """Get goods receipts, newest first, with line and unit counts, optionally only those against one order"""
+        condition, params = ("WHERE gr.purchase_order_id = ?", [purchase_order_id]) \
+            if purchase_order_id is not None else ("", [])
+        conn = self.db_manager.get_connection()
+        try:
+            cursor = conn.execute(f'''
+                SELECT gr.*, s.name AS supplier_name, po.po_number, u.full_name AS user_name,
+                       (SELECT COUNT(*) FROM goods_receipt_items gri WHERE gri.receipt_id = gr.id) AS lines,
+                       (SELECT COALESCE(SUM(gri.quantity), 0) FROM goods_receipt_items gri
+                        WHERE gri.receipt_id = gr.id) AS units
+                FROM goods_receipts gr
+                LEFT JOIN suppliers s ON gr.supplier_id = s.id
+                LEFT JOIN purchase_orders po ON gr.purchase_order_id = po.id
+                LEFT JOIN users u ON gr.user_id = u.id
+                {condition}
+                ORDER BY gr.id DESC
+                LIMIT ?
+            ''', (*params, limit))
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
@@ -0,0 +1,264 @@
+"""
+Query Profiler - Per-statement latency histograms and a slow-query log
+"""
+
+import bisect
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List, Optional
+
+# Upper bounds (milliseconds) of the latency histogram buckets; the last bucket is open
+HISTOGRAM_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+
+WHITESPACE = re.compile(r"\s+")
+# "IN (?, ?, ?)" lists of any length count as one statement
+PLACEHOLDER_LIST = re.compile(r"\?(\s*,\s*\?)+")
+
+class StatementStats:
+    """Counters for one normalized statement"""
+
+    __slots__ = ('sql', 'calls', 'total_ms', 'max_ms', 'rows', 'buckets')
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of calls"""
+        target = fraction * self.calls
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target and count:
+                return HISTOGRAM_BUCKETS_MS[index] if index < len(HISTOGRAM_BUCKETS_MS) else self.max_ms
+        return 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'sql': self.sql,
+            'calls': self.calls,
+            'total_ms': round(self.total_ms, 3),
+            'avg_ms': round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'p95_ms': self.percentile(0.95),
+            'rows': self.rows,
+            'histogram': list(self.buckets),
+        }
+
+class QueryProfiler:
+    """Collects timings for every statement run on a pooled connection.
+
+    Statements are grouped by their SQL text with whitespace and placeholder
+    lists collapsed. A statement is timed from execute() until its rows have
+    been fetched, so SELECTs count the time spent stepping through results.
+    Statements slower than ``slow_threshold_ms`` are written with their
+    ``EXPLAIN QUERY PLAN`` to a rotating JSON-lines log and kept in memory
+    for the diagnostics screen.
+    """
+
+    def __init__(self, log_path: Optional[str] = None, slow_threshold_ms: float = 100.0,
+                 max_bytes: int = 1024 * 1024, backup_count: int = 3, recent_size: int = 100):
+        self.enabled = True
+        self.slow_threshold_ms = slow_threshold_ms
+        self.lock = threading.Lock()
+        self.statements: Dict[str, StatementStats] = {}
+        self.recent_slow = deque(maxlen=recent_size)
+        self.normalized: Dict[str, str] = {}
+        self.log_path = log_path
+
+        self.logger = logging.getLogger(f"lks_pos.slow_queries.{id(self)}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        if log_path:
+            handler = RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count,
+                                          encoding="utf-8", delay=True)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger.addHandler(handler)
+
+    def normalize(self, sql: str) -> str:
+        """Collapse a statement to the form its stats are grouped under"""
+        normalized = self.normalized.get(sql)
+        if normalized is None:
+            normalized = PLACEHOLDER_LIST.sub("?, ...", WHITESPACE.sub(" ", sql).strip())
+            # Statements are built from a fixed set of strings, so this stays small
+            if len(self.normalized) < 10000:
+                self.normalized[sql] = normalized
+        return normalized
+
+    def record(self, conn, sql: str, params, elapsed_ms: float, rows: int):
+        """Account one finished statement"""
+        key = self.normalize(sql)
+        with self.lock:
+            stats = self.statements.get(key)
+            if stats is None:
+                stats = self.statements[key] = StatementStats(key)
+            stats.calls += 1
+            stats.total_ms += elapsed_ms
+            stats.rows += rows
+            if elapsed_ms > stats.max_ms:
+                stats.max_ms = elapsed_ms
+            stats.buckets[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, elapsed_ms)] += 1
+
+        if elapsed_ms >= self.slow_threshold_ms:
+            self.record_slow(conn, key, sql, params, elapsed_ms, rows)
+
+    def record_slow(self, conn, key: str, sql: str, params, elapsed_ms: float, rows: int):
+        """Log a slow statement with its query plan"""
+        entry = {
+            'at': datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+            'sql': key,
+            'elapsed_ms': round(elapsed_ms, 3),
+            'rows': rows,
+            'plan': self.explain(conn, sql, params),
+        }
+        with self.lock:
+            self.recent_slow.append(entry)
+        self.logger.info(json.dumps(entry))
+
+    @staticmethod
+    def explain(conn, sql: str, params) -> List[str]:
+        """Get a statement's EXPLAIN QUERY PLAN lines (empty if it cannot be explained)"""
+        if not sql.lstrip().upper().startswith(("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")):
+            return []
+        try:
+            # A plain cursor, so the plan is not profiled itself
+            rows = conn.cursor(sqlite3.Cursor).execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+            return [row[3] for row in rows]
+        except sqlite3.Error:
+            return []
+
+    def stats(self) -> List[Dict]:
+        """Per-statement stats, most total time first"""
+        with self.lock:
+            rows = [stats.to_dict() for stats in self.statements.values()]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+    def get_recent_slow(self) -> List[Dict]:
+        """The latest slow statements, newest first"""
+        with self.lock:
+            return list(reversed(self.recent_slow))
+
+    def get_config(self) -> Dict:
+        """Current switch, threshold and log file"""
+        return {'enabled': self.enabled, 'slow_threshold_ms': self.slow_threshold_ms, 'log_path': self.log_path}
+
+    def configure(self, enabled: Optional[bool] = None, slow_threshold_ms: Optional[float] = None):
+        """Turn profiling on or off and change the slow-query threshold"""
+        if enabled is not None:
+            self.enabled = enabled
+        if slow_threshold_ms is not None:
+            self.slow_threshold_ms = slow_threshold_ms
+
+    def reset(self):
+        """Forget all collected stats"""
+        with self.lock:
+            self.statements.clear()
+            self.recent_slow.clear()
+
+class ProfilingCursor(sqlite3.Cursor):
+    """Cursor that reports each statement to its connection's profiler.
+
+    The clock runs from execute() until the rows are exhausted, the next
+    statement starts or the cursor is closed or collected, so the time spent
+    fetching is included.
+    """
+
+    pending = None
+
+    def profiler(self) -> Optional[QueryProfiler]:
+        pool = getattr(self.connection, 'pool', None)
+        profiler = getattr(pool, 'profiler', None)
+        return profiler if profiler is not None and profiler.enabled else None
+
+    def finish(self):
+        """Record the statement in progress, if any"""
+        pending, self.pending = self.pending, None
+        if pending is not None:
+            profiler, sql, params, started, elapsed, rows = pending
+            profiler.record(self.connection, sql, params, elapsed, rows)
+
+    def execute(self, sql, parameters=()):
+        self.finish()
+        profiler = self.profiler()
+        if profiler is None:
+            return super().execute(sql, parameters)
+
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        elapsed = (time.perf_counter() - started) * 1000
+        if self.description is None:
+            # Not a query: nothing left to fetch
+            profiler.record(self.connection, sql, parameters, elapsed, max(self.rowcount, 0))
+        else:
+            self.pending = [profiler, sql, parameters, started, elapsed, 0]
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self.finish()
+        profiler = self.profiler()
+        if profiler is None:
+            return super().executemany(sql, seq_of_parameters)
+
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        profiler.record(self.connection, sql, None, (time.perf_counter() - started) * 1000,
+                        max(self.rowcount, 0))
+        return self
+
+    def fetched(self, rows: int, started: float, exhausted: bool):
+        """Add fetch time and rows to the statement in progress"""
+        if self.pending is not None:
+            self.pending[4] += (time.perf_counter() - started) * 1000
+            self.pending[5] += rows
+            if exhausted:
+                self.finish()
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self.fetched(row is not None, started, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self.fetched(len(rows), started, not rows)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self.fetched(len(rows), started, True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self.fetched(0, started, True)
+            raise
+        self.fetched(1, started, False)
+        return row
+
+    def close(self):
+        self.finish()
+        super().close()
+
+    def __del__(self):
+        # Most single-row lookups never exhaust their cursor; account them when it goes away
+        try:
+            self.finish()
+        except Exception:
+            pass
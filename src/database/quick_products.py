@@ -0,0 +1,136 @@
+"""
+Quick Products Service - Ranks best sellers by time of day for the POS quick-access panel
+"""
+
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class QuickProductsService:
+    """Keeps a decaying top-N ranking of best sellers per time-of-day bucket.
+
+    Scores use forward decay: selling ``q`` units at time ``t`` adds
+    ``q * 2 ** ((t - epoch) / half_life)``. Because every score is scaled
+    against the same epoch, the ranking never has to be re-decayed as time
+    passes, so each sale is an O(1) update instead of a rescan of sale_items.
+    """
+
+    def __init__(self, db_manager, bucket_hours: int = 4, half_life_days: float = 14.0,
+                 history_days: int = 90):
+        self.db_manager = db_manager
+        self.bucket_hours = bucket_hours
+        self.bucket_count = (24 + bucket_hours - 1) // bucket_hours
+        self.half_life = timedelta(days=half_life_days).total_seconds()
+        self.history_days = history_days
+        self.epoch = datetime.now()
+        self.scores: Optional[List[Dict[int, float]]] = None
+        self.lock = threading.Lock()
+
+        db_manager.add_sale_listener(self.record_sale)
+
+    def bucket_for(self, when: datetime) -> int:
+        """Get the time-of-day bucket for a timestamp"""
+        return when.hour // self.bucket_hours
+
+    def weight_for(self, when: datetime) -> float:
+        """Get the forward-decay weight of a sale made at the given time"""
+        return 2.0 ** ((when - self.epoch).total_seconds() / self.half_life)
+
+    def ensure_loaded(self):
+        """Seed the ranking from recent sale history on first use"""
+        if self.scores is not None:
+            return
+
+        scores = [{} for _ in range(self.bucket_count)]
+
+        try:
+            conn = self.db_manager.get_connection()
+            cursor = conn.cursor()
+
+            # One row per product, bucket and day keeps the seed query small
+            cursor.execute('''
+                SELECT si.product_id,
+                       CAST(strftime('%H', s.created_at, 'localtime') AS INTEGER) / ? AS bucket,
+                       DATE(s.created_at, 'localtime') AS sale_day,
+                       SUM(si.quantity) AS quantity
+                FROM sale_items si
+                JOIN sales s ON si.sale_id = s.id
+                WHERE s.created_at >= datetime('now', ?)
+                GROUP BY si.product_id, bucket, sale_day
+            ''', (self.bucket_hours, f"-{self.history_days} days"))
+
+            for row in cursor.fetchall():
+                sale_day = datetime.strptime(row['sale_day'], "%Y-%m-%d") + timedelta(hours=12)
+                bucket_scores = scores[row['bucket']]
+                bucket_scores[row['product_id']] = (bucket_scores.get(row['product_id'], 0.0)
+                                                    + row['quantity'] * self.weight_for(sale_day))
+
+            conn.close()
+        except Exception as e:
+            logger.error("Error loading quick products history: %s", e)
+
+        with self.lock:
+            if self.scores is None:
+                self.scores = scores
+
+    def reset(self):
+        """Forget the ranking so it is re-seeded from the database on next use"""
+        with self.lock:
+            self.scores = None
+
+    def record_sale(self, sale_id: int, sale_data: Dict, sale_items: List[Dict]):
+        """Fold a committed sale into the ranking (sale listener)"""
+        if self.scores is None:
+            # Not seeded yet; the seed query will pick this sale up
+            return
+
+        now = datetime.now()
+        weight = self.weight_for(now)
+
+        with self.lock:
+            bucket_scores = self.scores[self.bucket_for(now)]
+            for item in sale_items:
+                product_id = item['product_id']
+                bucket_scores[product_id] = bucket_scores.get(product_id, 0.0) + item['quantity'] * weight
+
+    def top_product_ids(self, limit: int = 8, when: Optional[datetime] = None) -> List[int]:
+        """Get the IDs of the best sellers for the time of day, best first"""
+        self.ensure_loaded()
+        bucket = self.bucket_for(when or datetime.now())
+
+        with self.lock:
+            ranked = heapq.nlargest(limit, self.scores[bucket].items(), key=lambda item: item[1])
+            product_ids = [product_id for product_id, _ in ranked]
+
+            # Fall back to the all-day ranking when this time of day has little history
+            if len(product_ids) < limit:
+                overall = {}
+                for bucket_scores in self.scores:
+                    for product_id, score in bucket_scores.items():
+                        overall[product_id] = overall.get(product_id, 0.0) + score
+                for product_id, _ in heapq.nlargest(limit * 2, overall.items(), key=lambda item: item[1]):
+                    if len(product_ids) >= limit:
+                        break
+                    if product_id not in product_ids:
+                        product_ids.append(product_id)
+
+        return product_ids
+
+    def get_quick_products(self, limit: int = 8) -> List[Dict]:
+        """Get up to ``limit`` product rows for the quick-access panel"""
+        products = self.db_manager.get_products_by_ids(self.top_product_ids(limit))
+
+        # Top up with catalog products while there is not enough sales history
+        if len(products) < limit:
+            known_ids = {product['id'] for product in products}
+            for product in self.db_manager.get_products_page(limit=limit + len(known_ids)):
+                if len(products) >= limit:
+                    break
+                if product['id'] not in known_ids:
+                    products.append(product)
+
+        return products[:limit]
@@ -0,0 +1,266 @@
+"""
+Remote Database Manager - DatabaseManager interface backed by a POS server
+"""
+
+import http.client
+import os
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from src.database.catalog_cache import CatalogCache
+from src.database.category_registry import CategoryRegistry
+from src.database.checkout_journal import CheckoutJournal
+from src.database.database_manager import DatabaseManager
+from src.database.payments import PaymentError, PaymentsManager
+from src.database.purchasing import PurchasingError
+from src.database.pos_server import DEFAULT_PORT, REMOTE_METHODS, dumps, loads
+from src.database.returns import ReturnError, ReturnsManager
+from src.database.stock_alerts import StockAlerts
+from src.utils.metrics import metrics
+
+class RemoteError(Exception):
+    """Raised when the server cannot be reached or a call fails there"""
+
+class OutcomeUnknown(RemoteError):
+    """Raised when a request reached the server but its reply was lost
+
+    The call may still have run (or be running) there, so the caller must
+    neither assume it failed nor repeat it blindly.
+    """
+
+# Server-side exceptions re-raised as themselves, so callers' except clauses still match
+ERROR_TYPES = {
+    'IntegrityError': sqlite3.IntegrityError,
+    'PaymentError': PaymentError,
+    'PermissionError': PermissionError,
+    'PurchasingError': PurchasingError,
+    'ReturnError': ReturnError,
+    'ValueError': ValueError,
+}
+
+# Pure computations the UI calls often; run locally instead of costing a round trip
+LOCAL_FUNCTIONS = {
+    'returns.refund_for': ReturnsManager.refund_for,
+    'payments.settle': PaymentsManager.settle,
+}
+
+# Attributes that the server reads as properties rather than calling
+REMOTE_PROPERTIES = frozenset({'archive.retention_months'})
+
+class RemoteService:
+    """Stands in for one of DatabaseManager's services (stock, returns, ...)"""
+
+    def __init__(self, manager: "RemoteDatabaseManager", name: str):
+        self._manager = manager
+        self._name = name
+
+    def __getattr__(self, attribute: str):
+        method = f"{self._name}.{attribute}"
+        if method in LOCAL_FUNCTIONS:
+            return LOCAL_FUNCTIONS[method]
+        if method in REMOTE_PROPERTIES:
+            return self._manager.call(method)
+        if method in REMOTE_METHODS:
+            return lambda *args, **kwargs: self._manager.call(method, *args, **kwargs)
+        raise AttributeError(f"'{method}' is not available when connected to a POS server")
+
+class RemoteScheduledJob(RemoteService):
+    """The server runs scheduled jobs (backups, forecasts); a till only reads their status"""
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+class RemoteDatabaseManager:
+    """Talks to a POS server with the same methods as DatabaseManager.
+
+    Each thread keeps one HTTP/1.1 connection open to the server, and
+    ``call_batch`` sends several calls in one request. Sale listeners and
+    the checkout journal stay local to the till. Raw SQL through
+    get_connection() is not available remotely; the UI reaches tables
+    through the repositories instead.
+    """
+
+    is_remote = True
+
+    def __init__(self, url: str, token: Optional[str] = None, timeout: float = 30.0,
+                 journal_path: Optional[str] = None):
+        parts = urlsplit(url if "://" in url else f"http://{url}")
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or DEFAULT_PORT
+        self.db_path = url
+        self.token = token if token is not None else os.environ.get("LKS_POS_TOKEN")
+        self.timeout = timeout
+        # Opened by the server when a user logs in; admin calls are checked against it
+        self.session: Optional[str] = None
+        self.local = threading.local()
+        self.sale_listeners: List[Callable[[int, Dict, List[Dict]], None]] = []
+
+        self.quick_products = RemoteService(self, 'quick_products')
+        self.stock = RemoteService(self, 'stock')
+        # Alerts are raised by this till's own sales, so the engine runs here
+        self.stock_alerts = StockAlerts(self)
+        self.forecasts = RemoteScheduledJob(self, 'forecasts')
+        self.returns = RemoteService(self, 'returns')
+        self.payments = RemoteService(self, 'payments')
+        self.purchasing = RemoteService(self, 'purchasing')
+        self.archive = RemoteService(self, 'archive')
+        # Reports are computed where the sales are
+        self.analytics = RemoteService(self, 'analytics')
+        self.backup_scheduler = RemoteScheduledJob(self, 'backup_scheduler')
+        self.change_feed = RemoteService(self, 'change_feed')
+        # Diagnostics show the server's statements, where the queries actually run
+        self.profiler = RemoteService(self, 'profiler')
+        self.products = RemoteService(self, 'products')
+        self.categories = RemoteService(self, 'categories')
+        self.suppliers = RemoteService(self, 'suppliers')
+        self.category_registry = CategoryRegistry(self)
+        self.users = RemoteService(self, 'users')
+        self.activity = RemoteService(self, 'activity')
+        self.catalog = CatalogCache(self)
+        # The journal protects this till's cart, so it lives on this machine
+        self.checkout_journal = CheckoutJournal(self, journal_path)
+
+    # Transport
+
+    def connection(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """Get this thread's connection and whether it is newly opened"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            return conn, False
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        self.local.conn = conn
+        return conn, True
+
+    def request(self, path: str, payload) -> Any:
+        """POST a JSON payload and return the decoded response"""
+        body = dumps(payload)
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['X-POS-Token'] = self.token
+        if self.session:
+            headers['X-POS-Session'] = self.session
+
+        timer = metrics.timer('remote_call_seconds', "Round-trip time of calls to the POS server")
+        while True:
+            conn, fresh = self.connection()
+            sent = False
+            try:
+                with timer.time():
+                    conn.request("POST", path, body, headers)
+                    sent = True
+                    response = conn.getresponse()
+                    data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                # The server dropped an idle keep-alive connection; retry once on a new one
+                conn.close()
+                self.local.conn = None
+                if fresh:
+                    if sent:
+                        raise OutcomeUnknown(f"Connection to POS server lost before it replied: {e}") from e
+                    raise RemoteError(f"Connection to POS server lost: {e}") from e
+            except OSError as e:
+                conn.close()
+                self.local.conn = None
+                if sent:
+                    raise OutcomeUnknown(f"No reply from POS server at {self.host}:{self.port}: {e}") from e
+                raise RemoteError(f"Cannot reach POS server at {self.host}:{self.port}: {e}") from e
+
+        if response.status != 200:
+            try:
+                error = loads(data)['error']
+                message = f"{error['type']}: {error['message']}"
+            except (ValueError, KeyError, TypeError):
+                message = data.decode('utf-8', 'replace')
+            raise RemoteError(f"POS server returned {response.status}: {message}")
+        return loads(data)
+
+    def unwrap(self, response: Dict):
+        """Return a call's result or raise its error"""
+        if 'session' in response:
+            self.session = response['session']
+        if 'error' in response:
+            error = response['error']
+            raise ERROR_TYPES.get(error['type'], RemoteError)(error['message'])
+        return response['result']
+
+    def call(self, method: str, *args, **kwargs):
+        """Call one server method"""
+        return self.unwrap(self.request("/rpc", {'method': method, 'args': args, 'kwargs': kwargs}))
+
+    def call_batch(self, calls: List[Tuple[str, tuple, Dict]]) -> List:
+        """Run (method, args, kwargs) calls in one round trip; raises the first error after all ran"""
+        responses = self.request("/batch", [{'method': method, 'args': args, 'kwargs': kwargs}
+                                            for method, args, kwargs in calls])
+        return [self.unwrap(response) for response in responses]
+
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+    def __getattr__(self, name: str):
+        if name in REMOTE_METHODS:
+            return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+        raise AttributeError(f"'{name}' is not available when connected to a POS server")
+
+    # Methods that run (partly) on the till
+
+    hash_password = DatabaseManager.hash_password
+    verify_password = DatabaseManager.verify_password
+    iter_products = DatabaseManager.iter_products
+    add_sale_listener = DatabaseManager.add_sale_listener
+    remove_sale_listener = DatabaseManager.remove_sale_listener
+    notify_sale_listeners = DatabaseManager.notify_sale_listeners
+
+    def authenticate_user(self, username: str, password: str) -> Optional[Dict]:
+        """Log in on the server; the previous user's session ends even if this login fails"""
+        self.session = None
+        return self.call('authenticate_user', username, password)
+
+    def create_sale(self, sale_data: Dict, sale_items: List[Dict]) -> int:
+        """Record a sale on the server, then notify this till's listeners
+
+        Raises OutcomeUnknown when the reply was lost and the sale cannot be
+        found yet; it may still be recorded, so the caller keeps it pending.
+        """
+        try:
+            sale_id = self.call('create_sale', sale_data, sale_items)
+        except OutcomeUnknown:
+            # The reply was lost: the server may have committed the sale, or still be committing it
+            try:
+                sale_id = self.call('get_sale_id', sale_data['sale_number'])
+            except RemoteError:
+                sale_id = None
+            if sale_id is None:
+                raise
+        except sqlite3.IntegrityError:
+            # A retry on a fresh connection can find the sale the first attempt already recorded
+            sale_id = self.call('get_sale_id', sale_data['sale_number'])
+            if sale_id is None:
+                raise
+        self.notify_sale_listeners(sale_id, sale_data, sale_items)
+        return sale_id
+
+    def get_connection(self):
+        raise RemoteError("Direct database access is not available when connected to a POS server")
+
+    def create_tables(self):
+        """The server creates and migrates the schema"""
+
+    def create_default_admin(self):
+        """The server creates the default admin"""
+
+def create_database_manager(server_url: Optional[str] = None):
+    """Open the local database, or a POS server if a URL is given (or $LKS_POS_SERVER is set)"""
+    server_url = server_url or os.environ.get("LKS_POS_SERVER")
+    if server_url:
+        return RemoteDatabaseManager(server_url)
+    return DatabaseManager()
@@ -0,0 +1,90 @@
+"""
+Report Cache - LRU/TTL cache for date-range reports, invalidated per day by writes
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+class ReportCache:
+    """Caches report results keyed by (report type, date range, filters).
+
+    Every write that changes reportable data bumps a global sequence number
+    and records it against the day it touched. A cached entry remembers the
+    sequence number it was computed at and is only served while no day in
+    its range has been touched since, so historical ranges stay cached
+    indefinitely (up to the TTL) while ranges covering today stay exact.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl_seconds: float = 600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[Tuple, Tuple[Any, int, float]]" = OrderedDict()
+        self.day_versions: Dict[str, int] = {}
+        self.sequence = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(report_type: Hashable, start_date: str, end_date: str,
+                 filters: Optional[Dict] = None) -> Tuple:
+        """Build a cache key; filters are normalized so argument order does not matter"""
+        return (report_type, start_date, end_date, tuple(sorted((filters or {}).items())))
+
+    def bump(self, day: str):
+        """Record a write affecting the given day (YYYY-MM-DD)"""
+        with self.lock:
+            self.sequence += 1
+            self.day_versions[day] = self.sequence
+
+    def is_current(self, start_date: str, end_date: str, computed_at: int) -> bool:
+        """Check that no day in the range changed after the entry was computed"""
+        return not any(start_date <= day <= end_date and version > computed_at
+                       for day, version in self.day_versions.items())
+
+    def get(self, key: Tuple) -> Tuple[bool, Any]:
+        """Look up a key, returning (found, value)"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, computed_at, expires_at = entry
+                _, start_date, end_date, _ = key
+                if time.monotonic() < expires_at and self.is_current(start_date, end_date, computed_at):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self.entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key: Tuple, value: Any, computed_at: int):
+        """Store a value computed when the sequence was at ``computed_at``"""
+        with self.lock:
+            self.entries[key] = (value, computed_at, time.monotonic() + self.ttl_seconds)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get_or_compute(self, report_type: Hashable, start_date: str, end_date: str,
+                       compute: Callable[[], Any], filters: Optional[Dict] = None) -> Any:
+        """Return a cached report or compute and cache it
+
+        Exceptions from ``compute`` propagate and nothing is cached.
+        """
+        key = self.make_key(report_type, start_date, end_date, filters)
+        found, value = self.get(key)
+        if found:
+            return value
+
+        # Read the sequence before computing so a concurrent write invalidates the result
+        computed_at = self.sequence
+        value = compute()
+        self.put(key, value, computed_at)
+        return value
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,305 @@
+"""
+Repositories - Statements for products, categories, suppliers, users and the activity log
+"""
+
+from typing import Dict, List, Optional
+
+class Repository:
+    """Base for the repositories DatabaseManager exposes.
+
+    Each statement is a class constant, so every call sends the same SQL
+    text and sqlite3 reuses the statement it prepared on that pooled
+    connection instead of compiling it again. Going through
+    DatabaseManager.get_connection() also means the pool, the query
+    profiler and the metrics see these statements like any other.
+    """
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    def run(self, sql: str, params=()) -> int:
+        """Run one write statement in its own transaction; returns the new row's ID"""
+        conn = self.db_manager.get_connection()
+        try:
+            cursor = conn.execute(sql, params)
+            conn.commit()
+            return cursor.lastrowid
+        finally:
+            conn.close()
+
+    def fetch_all(self, sql: str, params=()) -> List[Dict]:
+        conn = self.db_manager.get_connection()
+        try:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+        finally:
+            conn.close()
+
+class CategoryRepo(Repository):
+    """Product categories, nested through parent_id.
+
+    category_closure holds one row per (ancestor, descendant) pair,
+    including each category paired with itself at depth 0, and triggers
+    keep it in step with parent_id. "Everything under Food & Beverages" is
+    then one indexed lookup (see IN_SUBTREE) rather than a walk of the tree.
+    """
+
+    LIST = "SELECT id, name, description, parent_id FROM categories ORDER BY name"
+    INSERT = "INSERT INTO categories (name, description, parent_id) VALUES (?, ?, ?)"
+    UPDATE = "UPDATE categories SET name = ?, description = ?, parent_id = ? WHERE id = ?"
+
+    # Condition on a category_id column, with the branch's root ID as parameter
+    IN_SUBTREE = "IN (SELECT descendant_id FROM main.category_closure WHERE ancestor_id = ?)"
+
+    @staticmethod
+    def create_hierarchy(cursor):
+        """Create the closure table, the triggers that maintain it and rows for existing categories"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS category_closure (
+                ancestor_id INTEGER NOT NULL,
+                descendant_id INTEGER NOT NULL,
+                depth INTEGER NOT NULL,
+                PRIMARY KEY (ancestor_id, descendant_id)
+            ) WITHOUT ROWID
+        ''')
+        # The primary key serves subtree lookups; this index serves ancestor lookups and roll-ups
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_category_closure_descendant
+            ON category_closure (descendant_id, ancestor_id, depth)
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_category_id ON products (category_id)")
+
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS category_closure_insert AFTER INSERT ON categories
+            BEGIN
+                INSERT INTO category_closure (ancestor_id, descendant_id, depth) VALUES (NEW.id, NEW.id, 0);
+                INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+                SELECT ancestor_id, NEW.id, depth + 1 FROM category_closure WHERE descendant_id = NEW.parent_id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS category_closure_no_cycle BEFORE UPDATE OF parent_id ON categories
+            WHEN NEW.parent_id IS NOT NULL
+            BEGIN
+                SELECT RAISE(ABORT, 'A category cannot be moved under itself or one of its subcategories')
+                WHERE EXISTS (SELECT 1 FROM category_closure
+                              WHERE ancestor_id = NEW.id AND descendant_id = NEW.parent_id);
+            END
+        ''')
+        # Moving a category detaches its whole branch from the old ancestors and links it under the new ones
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS category_closure_move AFTER UPDATE OF parent_id ON categories
+            WHEN OLD.parent_id IS NOT NEW.parent_id
+            BEGIN
+                DELETE FROM category_closure
+                WHERE descendant_id IN (SELECT descendant_id FROM category_closure WHERE ancestor_id = NEW.id)
+                  AND ancestor_id IN (SELECT ancestor_id FROM category_closure
+                                      WHERE descendant_id = NEW.id AND ancestor_id != NEW.id);
+                INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+                SELECT above.ancestor_id, below.descendant_id, above.depth + below.depth + 1
+                FROM category_closure above, category_closure below
+                WHERE above.descendant_id = NEW.parent_id AND below.ancestor_id = NEW.id;
+            END
+        ''')
+        # Subcategories of a deleted category move up to its parent
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS category_closure_delete AFTER DELETE ON categories
+            BEGIN
+                UPDATE categories SET parent_id = OLD.parent_id WHERE parent_id = OLD.id;
+                DELETE FROM category_closure WHERE ancestor_id = OLD.id OR descendant_id = OLD.id;
+            END
+        ''')
+
+        # Pairs for categories that predate the closure table
+        cursor.execute('''
+            INSERT OR IGNORE INTO category_closure (ancestor_id, descendant_id, depth)
+            WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+                SELECT id, id, 0 FROM categories
+                UNION ALL
+                SELECT tree.ancestor_id, c.id, tree.depth + 1
+                FROM tree JOIN categories c ON c.parent_id = tree.descendant_id
+            )
+            SELECT ancestor_id, descendant_id, depth FROM tree
+        ''')
+
+    def list(self) -> List[Dict]:
+        """Get all categories ordered by name"""
+        return self.fetch_all(self.LIST)
+
+    def create(self, name: str, description: str = "", parent_id: Optional[int] = None) -> int:
+        """Add a category, optionally under a parent; returns its ID"""
+        category_id = self.run(self.INSERT, (name, description, parent_id))
+        # Keep this process's registry current, also when the write came from a remote till
+        self.db_manager.category_registry.put({'id': category_id, 'name': name, 'description': description,
+                                               'parent_id': parent_id})
+        return category_id
+
+    def update(self, category_id: int, name: str, description: str = "", parent_id: Optional[int] = None):
+        """Rename, re-describe or move a category along with its subcategories
+
+        Moving a category under its own branch raises sqlite3.IntegrityError.
+        """
+        self.run(self.UPDATE, (name, description, parent_id, category_id))
+        self.db_manager.category_registry.put({'id': category_id, 'name': name, 'description': description,
+                                               'parent_id': parent_id})
+        # Branch totals computed before a move no longer add up
+        self.db_manager.report_cache.clear()
+
+class ProductRepo(Repository):
+    """Product records; stock changes go through the stock ledger"""
+
+    # Product fields the inventory dialog edits, in statement order
+    FIELDS = ('name', 'barcode', 'category_id', 'description', 'cost_price', 'price', 'min_quantity', 'image_path')
+
+    INSERT = '''
+        INSERT INTO products (name, barcode, category_id, description, cost_price,
+                              price, min_quantity, image_path, quantity)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)
+    '''
+    UPDATE = '''
+        UPDATE products
+        SET name = ?, barcode = ?, category_id = ?, description = ?, cost_price = COALESCE(?, cost_price),
+            price = ?, min_quantity = ?, image_path = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    '''
+    DEACTIVATE = "UPDATE products SET is_active = 0, updated_at = CURRENT_TIMESTAMP WHERE id = ?"
+
+    def values(self, product_data: Dict) -> tuple:
+        return tuple(product_data.get(field) for field in self.FIELDS)
+
+    def create(self, product_data: Dict, quantity: int = 0, user_id: Optional[int] = None) -> int:
+        """Add a product with an opening stock balance; returns its ID"""
+        conn = self.db_manager.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.INSERT, self.values(product_data))
+            product_id = cursor.lastrowid
+            if quantity:
+                self.db_manager.stock.record(cursor, product_id, quantity, 'initial',
+                                             user_id=user_id, note="Opening balance")
+            conn.commit()
+            return product_id
+        finally:
+            conn.close()
+
+    def update(self, product_id: int, product_data: Dict, quantity_change: int = 0,
+               user_id: Optional[int] = None):
+        """Update a product's details and post any stock count correction to the ledger
+
+        Goods receipts maintain cost_price as a weighted average, so it is
+        only written when product_data carries one; leave it out to keep
+        the current cost.
+        """
+        conn = self.db_manager.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.UPDATE, (*self.values(product_data), product_id))
+            if quantity_change:
+                self.db_manager.stock.record(cursor, product_id, quantity_change, 'adjustment',
+                                             user_id=user_id, note="Stock count corrected")
+            conn.commit()
+        finally:
+            conn.close()
+        # A new count or minimum can put the product on or off the low-stock list
+        self.db_manager.stock_alerts.check([product_id])
+
+    def deactivate(self, product_id: int):
+        """Hide a product; its sales and movements keep referring to it"""
+        self.run(self.DEACTIVATE, (product_id,))
+
+class SupplierRepo(Repository):
+    """Suppliers that purchase orders and goods receipts refer to"""
+
+    # Supplier fields the purchasing screen edits, in statement order
+    FIELDS = ('name', 'contact_name', 'phone', 'email', 'address', 'is_active')
+
+    LIST = "SELECT * FROM suppliers ORDER BY name"
+    LIST_ACTIVE = "SELECT * FROM suppliers WHERE is_active = 1 ORDER BY name"
+    INSERT = '''
+        INSERT INTO suppliers (name, contact_name, phone, email, address, is_active)
+        VALUES (?, ?, ?, ?, ?, ?)
+    '''
+    UPDATE = '''
+        UPDATE suppliers
+        SET name = ?, contact_name = ?, phone = ?, email = ?, address = ?, is_active = ?
+        WHERE id = ?
+    '''
+
+    def values(self, supplier_data: Dict) -> tuple:
+        return tuple(supplier_data.get(field, 1 if field == 'is_active' else "") for field in self.FIELDS)
+
+    def list(self, include_inactive: bool = False) -> List[Dict]:
+        """Get suppliers ordered by name"""
+        return self.fetch_all(self.LIST if include_inactive else self.LIST_ACTIVE)
+
+    def create(self, supplier_data: Dict) -> int:
+        """Add a supplier; returns its ID"""
+        return self.run(self.INSERT, self.values(supplier_data))
+
+    def update(self, supplier_id: int, supplier_data: Dict):
+        """Update a supplier's details"""
+        self.run(self.UPDATE, (*self.values(supplier_data), supplier_id))
+
+class UserRepo(Repository):
+    """User accounts; passwords are hashed here, never by callers"""
+
+    INSERT = '''
+        INSERT INTO users (username, full_name, email, role, password_hash, is_active)
+        VALUES (?, ?, ?, ?, ?, ?)
+    '''
+    UPDATE = "UPDATE users SET username = ?, full_name = ?, email = ?, role = ?, is_active = ? WHERE id = ?"
+    SET_USERNAME = "UPDATE users SET username = ? WHERE id = ?"
+    SET_FULL_NAME = "UPDATE users SET full_name = ? WHERE id = ?"
+    SET_PASSWORD = "UPDATE users SET password_hash = ? WHERE id = ?"
+    ROLE = "SELECT role FROM users WHERE id = ? AND is_active = 1"
+
+    def create(self, username: str, full_name: str, email: str, role: str, password: str,
+               is_active: bool = True) -> int:
+        """Add a user; returns its ID"""
+        return self.run(self.INSERT, (username, full_name, email, role,
+                                      self.db_manager.hash_password(password), is_active))
+
+    def update(self, user_id: int, username: str, full_name: str, email: str, role: str,
+               is_active: bool, password: Optional[str] = None):
+        """Update a user's details, and their password if one is given"""
+        conn = self.db_manager.get_connection()
+        try:
+            conn.execute(self.UPDATE, (username, full_name, email, role, is_active, user_id))
+            if password:
+                conn.execute(self.SET_PASSWORD, (self.db_manager.hash_password(password), user_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def set_username(self, user_id: int, username: str):
+        self.run(self.SET_USERNAME, (username, user_id))
+
+    def set_full_name(self, user_id: int, full_name: str):
+        self.run(self.SET_FULL_NAME, (full_name, user_id))
+
+    def set_password(self, user_id: int, password: str):
+        self.run(self.SET_PASSWORD, (self.db_manager.hash_password(password), user_id))
+
+    def role(self, user_id: int) -> Optional[str]:
+        """Get an active user's role, or None if there is no such active user"""
+        rows = self.fetch_all(self.ROLE, (user_id,))
+        return rows[0]['role'] if rows else None
+
+class ActivityRepo(Repository):
+    """The user activity log"""
+
+    INSERT = "INSERT INTO activity_logs (user_id, action, details, ip_address) VALUES (?, ?, ?, ?)"
+    RECENT = '''
+        SELECT al.*, u.full_name
+        FROM activity_logs al
+        JOIN users u ON al.user_id = u.id
+        ORDER BY al.created_at DESC
+        LIMIT ?
+    '''
+
+    def log(self, user_id: int, action: str, details: str = "", ip_address: str = "") -> int:
+        """Append an entry; returns its ID"""
+        return self.run(self.INSERT, (user_id, action, details, ip_address))
+
+    def recent(self, limit: int = 10) -> List[Dict]:
+        """Get the newest entries with the user's full name"""
+        return self.fetch_all(self.RECENT, (limit,))
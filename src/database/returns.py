@@ -0,0 +1,187 @@
+"""
+Returns Manager - Full and partial returns against recorded sales
+"""
+
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+class ReturnError(Exception):
+    """Raised when a return request is not valid for the sale"""
+
+class ReturnsManager:
+    """Processes returns of sale lines.
+
+    The original sale is found through the unique index on sale_number and
+    the quantity already returned per line through the index on
+    return_items.sale_item_id, so a return at the till never scans sales
+    history. A return is written in one transaction: the return header and
+    lines, the stock movements that put items back on the shelf and the
+    sale's payment status. Reports net the returned units out of the sale
+    lines they came from (see returned_units_sql).
+    """
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    @staticmethod
+    def returned_units_sql(conn, schema: str = "main", restocked_only: bool = False) -> str:
+        """SQL expression for the units returned so far of the sale line aliased ``si`` in a schema
+
+        Probes idx_return_items_sale_item_id once per line. Archives made
+        before returns were archived have no return_items table, so their
+        lines read as never returned.
+        """
+        if not conn.execute(f"PRAGMA {schema}.table_info(return_items)").fetchone():
+            return "0"
+        restocked = " AND ri.restocked = 1" if restocked_only else ""
+        return (f"COALESCE((SELECT SUM(ri.quantity) FROM {schema}.return_items ri "
+                f"WHERE ri.sale_item_id = si.id{restocked}), 0)")
+
+    def find_sale(self, sale_number: str) -> Optional[Dict]:
+        """Look up a sale by number with its lines and how much of each can still be returned"""
+        conn = self.db_manager.get_connection()
+        try:
+            sale = conn.execute('''
+                SELECT s.*, u.full_name AS cashier_name
+                FROM sales s
+                LEFT JOIN users u ON s.user_id = u.id
+                WHERE s.sale_number = ?
+            ''', (sale_number.strip(),)).fetchone()
+            if sale is None:
+                return None
+
+            items = [dict(row) for row in conn.execute('''
+                SELECT si.id, si.product_id, p.name AS product_name, si.quantity,
+                       si.unit_price, si.total_price,
+                       COALESCE((SELECT SUM(ri.quantity) FROM return_items ri
+                                 WHERE ri.sale_item_id = si.id), 0) AS returned_quantity
+                FROM sale_items si
+                LEFT JOIN products p ON si.product_id = p.id
+                WHERE si.sale_id = ?
+                ORDER BY si.id
+            ''', (sale['id'],)).fetchall()]
+        finally:
+            conn.close()
+
+        for item in items:
+            item['returnable_quantity'] = item['quantity'] - item['returned_quantity']
+        return {'sale': dict(sale), 'items': items}
+
+    @staticmethod
+    def refund_for(sale, unit_price: float, quantity: int) -> float:
+        """Refund for returned units, carrying the sale's discount and tax proportionally"""
+        amount = unit_price * quantity
+        if sale['subtotal']:
+            amount *= sale['total_amount'] / sale['subtotal']
+        return round(amount, 2)
+
+    def create_return(self, sale_id: int, items: List[Dict], user_id: int, reason: str = "",
+                      restock: bool = True) -> Dict:
+        """Return lines of a sale
+
+        items is a list of {'sale_item_id', 'quantity'}. Raises ReturnError
+        if a line does not belong to the sale or more units would be
+        returned than remain. Returns a summary dict of the return.
+        """
+        requested = {}
+        for item in items:
+            if item['quantity'] > 0:
+                requested[item['sale_item_id']] = requested.get(item['sale_item_id'], 0) + item['quantity']
+        if not requested:
+            raise ReturnError("Select at least one item to return")
+
+        return_number = f"RET-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
+
+        conn = self.db_manager.get_connection()
+        try:
+            cursor = conn.cursor()
+            # Take the write lock before reading, so two tills cannot return the same units
+            cursor.execute("BEGIN IMMEDIATE")
+
+            sale = cursor.execute("SELECT * FROM sales WHERE id = ?", (sale_id,)).fetchone()
+            if sale is None:
+                raise ReturnError(f"Sale {sale_id} does not exist")
+
+            lines = {row['id']: row for row in cursor.execute('''
+                SELECT si.id, si.product_id, si.quantity, si.unit_price,
+                       COALESCE((SELECT SUM(ri.quantity) FROM return_items ri
+                                 WHERE ri.sale_item_id = si.id), 0) AS returned_quantity
+                FROM sale_items si
+                WHERE si.sale_id = ?
+            ''', (sale_id,)).fetchall()}
+
+            for sale_item_id, quantity in requested.items():
+                line = lines.get(sale_item_id)
+                if line is None:
+                    raise ReturnError(f"Item {sale_item_id} is not part of sale {sale['sale_number']}")
+                remaining = line['quantity'] - line['returned_quantity']
+                if quantity > remaining:
+                    raise ReturnError(f"Only {remaining} unit(s) of item {sale_item_id} can still be returned")
+
+            refunds = {sale_item_id: self.refund_for(sale, lines[sale_item_id]['unit_price'], quantity)
+                       for sale_item_id, quantity in requested.items()}
+            total_amount = round(sum(refunds.values()), 2)
+
+            cursor.execute('''
+                INSERT INTO returns (return_number, sale_id, user_id, reason, total_amount)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (return_number, sale_id, user_id, reason, total_amount))
+            return_id = cursor.lastrowid
+
+            for sale_item_id, quantity in requested.items():
+                line = lines[sale_item_id]
+                cursor.execute('''
+                    INSERT INTO return_items (return_id, sale_item_id, product_id, quantity,
+                                              unit_price, total_price, restocked)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (return_id, sale_item_id, line['product_id'], quantity, line['unit_price'],
+                      refunds[sale_item_id], 1 if restock else 0))
+
+                if restock:
+                    self.db_manager.stock.record(cursor, line['product_id'], quantity, 'return',
+                                                 'return', return_id, user_id)
+
+            # Roll the sale's status up from what has now been returned in total
+            sold = sum(line['quantity'] for line in lines.values())
+            returned = sum(line['returned_quantity'] for line in lines.values()) + sum(requested.values())
+            payment_status = 'refunded' if returned >= sold else 'partially_refunded'
+            cursor.execute("UPDATE sales SET payment_status = ? WHERE id = ?", (payment_status, sale_id))
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        # The return lands today; the sale's own day changes status
+        self.db_manager.bump_data_version()
+        self.db_manager.bump_data_version(sale['created_at'][:10])
+        self.db_manager.stock_alerts.check([line['product_id'] for line in lines.values()])
+
+        return {
+            'return_id': return_id,
+            'return_number': return_number,
+            'sale_number': sale['sale_number'],
+            'total_amount': total_amount,
+            'payment_status': payment_status,
+            'items': [{'sale_item_id': sale_item_id, 'product_id': lines[sale_item_id]['product_id'],
+                       'quantity': quantity, 'refund': refunds[sale_item_id]}
+                      for sale_item_id, quantity in requested.items()],
+        }
+
+    def get_returns_for_sale(self, sale_id: int) -> List[Dict]:
+        """Get the returns made against a sale, oldest first"""
+        conn = self.db_manager.get_connection()
+        try:
+            cursor = conn.execute('''
+                SELECT r.*, u.full_name AS cashier_name
+                FROM returns r
+                LEFT JOIN users u ON r.user_id = u.id
+                WHERE r.sale_id = ?
+                ORDER BY r.id
+            ''', (sale_id,))
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
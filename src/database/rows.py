@@ -0,0 +1,146 @@
+"""
+Row Types - Compact row representations for bulk database reads
+"""
+
+from array import array
+from dataclasses import MISSING, dataclass, fields
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for ColumnBatch.to_numpy()
+    np = None
+
+ROW_FORMATS = ('dict', 'object', 'columns')
+
+@dataclass(slots=True)
+class Product:
+    """Product row"""
+    id: int
+    name: str
+    barcode: Optional[str] = None
+    category_id: Optional[int] = None
+    price: float = 0.0
+    cost_price: Optional[float] = None
+    quantity: int = 0
+    min_quantity: int = 5
+    description: Optional[str] = None
+    image_path: Optional[str] = None
+    is_active: int = 1
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    category_name: Optional[str] = None
+
+@dataclass(slots=True)
+class Sale:
+    """Sale header row"""
+    id: int
+    sale_number: str
+    user_id: int
+    customer_name: Optional[str] = None
+    subtotal: float = 0.0
+    tax_amount: float = 0.0
+    discount_amount: float = 0.0
+    total_amount: float = 0.0
+    payment_method: Optional[str] = None
+    payment_status: Optional[str] = None
+    created_at: Optional[str] = None
+    cashier_name: Optional[str] = None
+    refunded_amount: float = 0.0
+
+@dataclass(slots=True)
+class SaleItem:
+    """Sale line item row"""
+    id: int
+    sale_id: int
+    product_id: int
+    quantity: int = 0
+    unit_price: float = 0.0
+    total_price: float = 0.0
+    unit_cost: Optional[float] = None
+
+def rows_to_objects(row_class, cursor) -> List:
+    """Build slotted row objects from a cursor, ignoring columns the class does not define"""
+    positions = {column[0]: index for index, column in enumerate(cursor.description)}
+
+    # Resolve each dataclass field to a result column (or its default) once, not per row
+    spec = [(positions.get(field.name), None if field.default is MISSING else field.default)
+            for field in fields(row_class)]
+
+    if all(index == position for position, (index, _) in enumerate(spec)):
+        return [row_class(*row[:len(spec)]) for row in cursor.fetchall()]
+
+    return [row_class(*[default if index is None else row[index] for index, default in spec])
+            for row in cursor.fetchall()]
+
+class ColumnBatch:
+    """Column-oriented batch of rows for analytic reads.
+
+    Integer columns are stored in ``array('q')``, other numeric columns in
+    ``array('d')`` (NULL becomes NaN) and text columns in plain lists, so a
+    batch costs a few machine words per value instead of a dict per row.
+    """
+
+    def __init__(self, columns: Dict[str, Union[array, list]]):
+        self.columns = columns
+
+    @classmethod
+    def from_cursor(cls, cursor, fetch_size: int = 10000) -> "ColumnBatch":
+        """Read all remaining rows of a cursor into typed columns"""
+        names = [column[0] for column in cursor.description]
+        values = [[] for _ in names]
+
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            for index, column_values in enumerate(values):
+                column_values.extend(row[index] for row in rows)
+
+        return cls({name: cls.pack_column(column_values) for name, column_values in zip(names, values)})
+
+    @staticmethod
+    def pack_column(values: list) -> Union[array, list]:
+        """Pack a column into the most compact array type that holds its values"""
+        present = [value for value in values if value is not None]
+        if present and all(isinstance(value, int) for value in present) and len(present) == len(values):
+            return array('q', values)
+        if present and all(isinstance(value, (int, float)) for value in present):
+            return array('d', (float('nan') if value is None else value for value in values))
+        return values
+
+    @classmethod
+    def concat(cls, batches: List["ColumnBatch"]) -> "ColumnBatch":
+        """Join batches with the same columns into one"""
+        names = batches[0].names
+        return cls({name: cls.pack_column([value for batch in batches for value in batch[name]])
+                    for name in names})
+
+    def __len__(self) -> int:
+        if not self.columns:
+            return 0
+        return len(next(iter(self.columns.values())))
+
+    def __getitem__(self, name: str) -> Union[array, list]:
+        return self.columns[name]
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.columns)
+
+    def rows(self) -> Iterator[Tuple]:
+        """Iterate over the batch as row tuples"""
+        return zip(*self.columns.values())
+
+    def to_numpy(self) -> Dict[str, "np.ndarray"]:
+        """Get the columns as NumPy arrays (numeric arrays are zero-copy)"""
+        if np is None:
+            raise RuntimeError("NumPy is required for ColumnBatch.to_numpy()")
+
+        result = {}
+        for name, column in self.columns.items():
+            if isinstance(column, array):
+                result[name] = np.frombuffer(column, dtype=np.int64 if column.typecode == 'q' else np.float64)
+            else:
+                result[name] = np.array(column, dtype=object)
+        return result
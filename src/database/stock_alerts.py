@@ -0,0 +1,183 @@
+"""
+Stock Alerts - Low-stock set kept current after each sale, and reorder suggestions
+"""
+
+import logging
+import math
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class StockAlerts:
+    """Tracks the products at or below their minimum stock and raises an alert
+    the moment a sale takes one there.
+
+    The set is read once from the partial index of low products; after that
+    each committed sale re-checks only the products it sold (one indexed
+    read), so alerts cost nothing proportional to the catalog. ``refresh``
+    re-reads the index to pick up changes made elsewhere (receipts, counts,
+    other tills). Alert listeners are called with the products that just
+    went low.
+
+    Reorder suggestions come from sales velocity over the last
+    ``reorder_history_days``: the mean and standard deviation of daily units
+    give a reorder point (demand over the lead time plus safety stock) and
+    an order-up-to level covering the lead time and the review period.
+    """
+
+    SETTING_DEFAULTS = {
+        'reorder_history_days': '28',
+        'reorder_lead_time_days': '7',
+        'reorder_review_days': '7',
+        # Safety factor in standard deviations; 1.65 covers about 95% of lead-time demand
+        'reorder_service_z': '1.65',
+    }
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self.lock = threading.Lock()
+        self.low: Optional[Dict[int, Dict]] = None
+        self.listeners: List[Callable[[List[Dict]], None]] = []
+
+        metrics.gauge('low_stock_products', "Active products at or below their minimum stock",
+                      lambda: len(self.low or {}))
+        db_manager.add_sale_listener(self.record_sale)
+
+    def load_config(self) -> Dict:
+        """Read the reorder parameters from settings, falling back to defaults"""
+        values = {}
+        for key, default in self.SETTING_DEFAULTS.items():
+            value = self.db_manager.get_setting(key)
+            values[key] = default if value in (None, "") else value
+        return {
+            'history_days': max(1, int(values['reorder_history_days'])),
+            'lead_time_days': max(0.0, float(values['reorder_lead_time_days'])),
+            'review_days': max(0.0, float(values['reorder_review_days'])),
+            'service_z': max(0.0, float(values['reorder_service_z'])),
+        }
+
+    # Low-stock set
+
+    def refresh(self):
+        """Re-read the low-stock set from the partial index"""
+        low = {product['id']: product for product in self.db_manager.stock.low_stock()}
+        with self.lock:
+            self.low = low
+
+    def ensure_loaded(self):
+        if self.low is None:
+            self.refresh()
+
+    def get_low_stock(self) -> List[Dict]:
+        """Products at or below their minimum, lowest stock first"""
+        self.ensure_loaded()
+        with self.lock:
+            return sorted((dict(product) for product in self.low.values()), key=lambda product: product['quantity'])
+
+    def check(self, product_ids: List[int]) -> List[Dict]:
+        """Re-check some products after their stock changed; returns (and announces) those that just went low"""
+        if self.low is None:
+            # Not loaded yet; the first load will see the current stock
+            return []
+
+        product_ids = list(dict.fromkeys(product_ids))
+        now_low = {product['id']: product for product in self.db_manager.stock.low_stock(product_ids)}
+        alerts = []
+        with self.lock:
+            for product_id in product_ids:
+                product = now_low.get(product_id)
+                if product is None:
+                    self.low.pop(product_id, None)
+                    continue
+                if product_id not in self.low:
+                    alerts.append(product)
+                self.low[product_id] = product
+
+        if alerts:
+            metrics.counter('low_stock_alerts_total', "Products that went to or below their minimum stock").inc(len(alerts))
+            logger.info("Low stock: %s", ", ".join(f"{product['name']} ({product['quantity']})" for product in alerts))
+            self.notify(alerts)
+        return alerts
+
+    def record_sale(self, sale_id: int, sale_data: Dict, sale_items: List[Dict]):
+        """Re-check the products a committed sale sold (sale listener)"""
+        self.check([item['product_id'] for item in sale_items])
+
+    def add_listener(self, listener: Callable[[List[Dict]], None]):
+        """Register a callback invoked with the products that just went low; loads the set if needed"""
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+        self.ensure_loaded()
+
+    def remove_listener(self, listener: Callable[[List[Dict]], None]):
+        """Unregister an alert callback"""
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def notify(self, alerts: List[Dict]):
+        """Call the alert listeners; listener errors never fail the sale"""
+        for listener in list(self.listeners):
+            try:
+                listener(alerts)
+            except Exception as e:
+                logger.error("Error in stock alert listener: %s", e)
+
+    # Reorder suggestions
+
+    def suggestions(self) -> List[Dict]:
+        """Products to reorder now with suggested quantities, fewest days of stock left first
+
+        A product is due when its stock is at or below the larger of its
+        minimum and its reorder point. Products without recent sales fall
+        back to topping up to twice their minimum.
+        """
+        config = self.load_config()
+        sales = self.db_manager.stock.daily_sales(config['history_days'])
+        sold = {row['product_id']: row for row in sales}
+
+        products = {product['id']: product for product in self.db_manager.get_products_by_ids(list(sold))}
+        for product in self.db_manager.stock.low_stock():
+            products.setdefault(product['id'], product)
+        products = [product for product in products.values() if product.get('is_active', 1)]
+        if not products:
+            return []
+
+        quantity = np.array([product['quantity'] for product in products], dtype=np.float64)
+        minimum = np.array([product['min_quantity'] or 0 for product in products], dtype=np.float64)
+        units = np.array([sold[product['id']]['units'] if product['id'] in sold else 0
+                          for product in products], dtype=np.float64)
+        units_squared = np.array([sold[product['id']]['units_squared'] if product['id'] in sold else 0
+                                  for product in products], dtype=np.float64)
+
+        # Days without sales count as zero-unit days
+        days = config['history_days']
+        mean = units / days
+        std = np.sqrt(np.maximum(units_squared / days - mean ** 2, 0.0))
+
+        lead, cover, z = config['lead_time_days'], config['lead_time_days'] + config['review_days'], config['service_z']
+        reorder_point = np.maximum(mean * lead + z * std * math.sqrt(lead), minimum)
+        order_up_to = np.where(units > 0, mean * cover + z * std * math.sqrt(cover), 2 * minimum)
+        order_up_to = np.maximum(order_up_to, reorder_point + 1)
+        suggested = np.ceil(np.maximum(order_up_to - quantity, 0))
+        days_left = np.divide(np.maximum(quantity, 0), mean, out=np.full_like(mean, np.inf), where=mean > 0)
+
+        due = np.flatnonzero((quantity <= reorder_point) & (suggested > 0))
+        rows = []
+        for index in due[np.lexsort((quantity[due], days_left[due]))]:
+            product = products[index]
+            rows.append({
+                'product_id': product['id'],
+                'name': product['name'],
+                'quantity': int(quantity[index]),
+                'min_quantity': int(minimum[index]),
+                'daily_units': float(mean[index]),
+                'days_left': float(days_left[index]) if np.isfinite(days_left[index]) else None,
+                'reorder_point': int(math.ceil(reorder_point[index])),
+                'suggested_quantity': int(suggested[index]),
+            })
+        return rows
@@ -0,0 +1,277 @@
+"""
+Stock Ledger - Append-only stock movements with a maintained on-hand snapshot
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from src.database.returns import ReturnsManager
+
+MOVEMENT_TYPES = ('initial', 'sale', 'return', 'receipt', 'adjustment')
+
+# Products at or below their minimum stock; also the WHERE clause of the partial index idx_products_low_stock
+LOW_STOCK = "is_active = 1 AND quantity <= min_quantity"
+
+class StockLedger:
+    """Records every stock change as a movement and keeps products.quantity in step.
+
+    Each movement is inserted in the same transaction as a relative update
+    (``quantity = quantity + ?``) of the product's on-hand snapshot, so
+    reading stock stays O(1) and concurrent tills never overwrite each
+    other's changes. Monthly checkpoints hold each product's balance at the
+    start of a month (only for products that moved), so the stock on any
+    past date is one checkpoint plus at most a month of movements.
+    """
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    @staticmethod
+    def record(cursor, product_id: int, quantity_change: int, movement_type: str,
+               reference_type: Optional[str] = None, reference_id: Optional[int] = None,
+               user_id: Optional[int] = None, note: Optional[str] = None) -> int:
+        """Record a movement inside the caller's transaction and update the snapshot
+
+        Returns the movement ID.
+        """
+        if movement_type not in MOVEMENT_TYPES:
+            raise ValueError(f"Unknown movement type '{movement_type}', expected one of {MOVEMENT_TYPES}")
+
+        cursor.execute('''
+            UPDATE products SET quantity = quantity + ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (quantity_change, product_id))
+        if cursor.rowcount == 0:
+            raise ValueError(f"Product {product_id} does not exist")
+
+        cursor.execute('''
+            INSERT INTO stock_movements (product_id, quantity_change, movement_type,
+                                         reference_type, reference_id, user_id, note)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (product_id, quantity_change, movement_type, reference_type, reference_id, user_id, note))
+        return cursor.lastrowid
+
+    @staticmethod
+    def record_many(cursor, changes: List[Tuple[int, int]], movement_type: str,
+                    reference_type: Optional[str] = None, reference_id: Optional[int] = None,
+                    user_id: Optional[int] = None, note: Optional[str] = None):
+        """Record one movement per (product_id, quantity_change) inside the caller's transaction
+
+        The snapshot updates and the movement rows each go to SQLite as one
+        batch, so a delivery of hundreds of lines costs two statements.
+        """
+        if movement_type not in MOVEMENT_TYPES:
+            raise ValueError(f"Unknown movement type '{movement_type}', expected one of {MOVEMENT_TYPES}")
+
+        totals: Dict[int, int] = {}
+        for product_id, quantity_change in changes:
+            totals[product_id] = totals.get(product_id, 0) + quantity_change
+        cursor.executemany('''
+            UPDATE products SET quantity = quantity + ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', [(quantity_change, product_id) for product_id, quantity_change in totals.items()])
+        if cursor.rowcount != len(totals):
+            missing = [product_id for product_id in totals
+                       if cursor.execute("SELECT 1 FROM products WHERE id = ?", (product_id,)).fetchone() is None]
+            raise ValueError(f"Product {missing[0]} does not exist")
+
+        cursor.executemany('''
+            INSERT INTO stock_movements (product_id, quantity_change, movement_type,
+                                         reference_type, reference_id, user_id, note)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(product_id, quantity_change, movement_type, reference_type, reference_id, user_id, note)
+              for product_id, quantity_change in changes])
+
+    def adjust(self, product_id: int, quantity_change: int, movement_type: str = 'adjustment',
+               reference_type: Optional[str] = None, reference_id: Optional[int] = None,
+               user_id: Optional[int] = None, note: Optional[str] = None) -> int:
+        """Record a single movement in its own transaction"""
+        conn = self.db_manager.get_connection()
+        try:
+            movement_id = self.record(conn.cursor(), product_id, quantity_change, movement_type,
+                                      reference_type, reference_id, user_id, note)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        self.db_manager.stock_alerts.check([product_id])
+        return movement_id
+
+    def stock_at(self, product_id: int, when: str) -> int:
+        """Get a product's stock level at a UTC timestamp ('YYYY-MM-DD[ HH:MM:SS]')"""
+        conn = self.db_manager.get_connection()
+        try:
+            checkpoint = conn.execute('''
+                SELECT checkpoint_at, quantity FROM stock_checkpoints
+                WHERE product_id = ? AND checkpoint_at <= ?
+                ORDER BY checkpoint_at DESC LIMIT 1
+            ''', (product_id, when)).fetchone()
+            start, quantity = (checkpoint['checkpoint_at'], checkpoint['quantity']) if checkpoint else ('', 0)
+
+            moved = conn.execute('''
+                SELECT COALESCE(SUM(quantity_change), 0) FROM stock_movements
+                WHERE product_id = ? AND created_at >= ? AND created_at < ?
+            ''', (product_id, start, when)).fetchone()[0]
+            return quantity + moved
+        finally:
+            conn.close()
+
+    def stock_levels_at(self, when: str) -> Dict[int, int]:
+        """Get every product's stock level at a UTC timestamp
+
+        Rolls the current snapshot back through the movements made since,
+        which is cheap for the recent dates stock valuations usually ask for.
+        """
+        conn = self.db_manager.get_connection()
+        try:
+            levels = {row[0]: row[1] for row in conn.execute("SELECT id, quantity FROM products")}
+            for product_id, moved in conn.execute('''
+                SELECT product_id, SUM(quantity_change) FROM stock_movements
+                WHERE created_at >= ? GROUP BY product_id
+            ''', (when,)):
+                levels[product_id] = levels.get(product_id, 0) - moved
+            return levels
+        finally:
+            conn.close()
+
+    def get_movements(self, product_id: int, limit: int = 100) -> List[Dict]:
+        """Get a product's most recent movements, newest first"""
+        conn = self.db_manager.get_connection()
+        try:
+            cursor = conn.execute('''
+                SELECT m.*, u.full_name AS user_name
+                FROM stock_movements m
+                LEFT JOIN users u ON m.user_id = u.id
+                WHERE m.product_id = ?
+                ORDER BY m.id DESC
+                LIMIT ?
+            ''', (product_id, limit))
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def low_stock(self, product_ids: Optional[List[int]] = None) -> List[Dict]:
+        """Get the active products at or below their minimum, lowest stock first
+
+        Reads only the partial index of low products, which SQLite keeps up to
+        date with every stock change. product_ids limits the check to those
+        products.
+        """
+        # Without ANALYZE statistics the planner would rather walk the is_active index
+        query = (f"SELECT id, name, barcode, category_id, quantity, min_quantity "
+                 f"FROM products INDEXED BY idx_products_low_stock WHERE {LOW_STOCK}")
+        params: List = []
+        if product_ids is not None:
+            if not product_ids:
+                return []
+            query += f" AND id IN ({', '.join('?' * len(product_ids))})"
+            params.extend(product_ids)
+        query += " ORDER BY quantity"
+
+        conn = self.db_manager.get_connection()
+        try:
+            return [dict(row) for row in conn.execute(query, params).fetchall()]
+        finally:
+            conn.close()
+
+    def daily_sales(self, days: int = 28) -> List[Dict]:
+        """Per-product sales over the last ``days`` days, net of returns, as the units sold
+        and the sum of squared daily units (from which the caller derives mean and variance)"""
+        conn = self.db_manager.get_connection()
+        try:
+            returned = ReturnsManager.returned_units_sql(conn)
+            cursor = conn.execute(f'''
+                SELECT product_id, SUM(units) AS units, SUM(units * units) AS units_squared
+                FROM (
+                    SELECT si.product_id, DATE(s.created_at) AS sale_day, SUM(si.quantity - {returned}) AS units
+                    FROM sales s
+                    JOIN sale_items si ON si.sale_id = s.id
+                    WHERE s.created_at >= datetime('now', ?)
+                    GROUP BY si.product_id, sale_day
+                )
+                GROUP BY product_id
+            ''', (f"-{int(days)} days",))
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    @staticmethod
+    def month_start(timestamp: str) -> str:
+        """Get the first day of the month a timestamp falls in"""
+        return f"{timestamp[:7]}-01"
+
+    @staticmethod
+    def next_month(month_start: str) -> str:
+        """Get the first day of the following month"""
+        year, month = int(month_start[:4]), int(month_start[5:7])
+        return f"{year + month // 12:04d}-{month % 12 + 1:02d}-01"
+
+    def compact(self) -> int:
+        """Write checkpoints for every month that has closed since the last compaction
+
+        Returns the number of months checkpointed. Each month is derived from
+        the previous one, so a run only reads the movements it adds.
+        """
+        current_month = self.month_start(datetime.now(timezone.utc).strftime("%Y-%m-%d"))
+
+        conn = self.db_manager.get_connection()
+        try:
+            # Tracked separately because months without movements leave no checkpoint rows
+            compacted_until = self.db_manager.get_setting('stock_compacted_until')
+            if compacted_until:
+                period_start = compacted_until
+            else:
+                first_movement = conn.execute("SELECT MIN(created_at) FROM stock_movements").fetchone()[0]
+                if first_movement is None:
+                    return 0
+                period_start = self.month_start(first_movement)
+
+            months = 0
+            while self.next_month(period_start) <= current_month:
+                checkpoint_at = self.next_month(period_start)
+                conn.execute('''
+                    INSERT OR REPLACE INTO stock_checkpoints (product_id, checkpoint_at, quantity)
+                    SELECT m.product_id, ?,
+                           COALESCE((SELECT c.quantity FROM stock_checkpoints c
+                                     WHERE c.product_id = m.product_id AND c.checkpoint_at <= ?
+                                     ORDER BY c.checkpoint_at DESC LIMIT 1), 0)
+                           + SUM(m.quantity_change)
+                    FROM stock_movements m
+                    WHERE m.created_at >= ? AND m.created_at < ?
+                    GROUP BY m.product_id
+                ''', (checkpoint_at, period_start, period_start, checkpoint_at))
+                conn.execute('''
+                    INSERT OR REPLACE INTO settings (key, value, description, updated_at)
+                    VALUES ('stock_compacted_until', ?, 'Stock checkpoints written up to', CURRENT_TIMESTAMP)
+                ''', (checkpoint_at,))
+                conn.commit()
+                period_start = checkpoint_at
+                months += 1
+            return months
+        finally:
+            conn.close()
+
+    def reconcile(self) -> List[Dict]:
+        """Find products whose on-hand snapshot disagrees with their ledger"""
+        conn = self.db_manager.get_connection()
+        try:
+            cursor = conn.execute('''
+                SELECT id, name, quantity, ledger_quantity FROM (
+                    SELECT p.id, p.name, p.quantity,
+                           COALESCE(c.quantity, 0) + COALESCE((
+                               SELECT SUM(m.quantity_change) FROM stock_movements m
+                               WHERE m.product_id = p.id AND m.created_at >= COALESCE(c.checkpoint_at, '')
+                           ), 0) AS ledger_quantity
+                    FROM products p
+                    LEFT JOIN stock_checkpoints c ON c.product_id = p.id AND c.checkpoint_at = (
+                        SELECT MAX(checkpoint_at) FROM stock_checkpoints WHERE product_id = p.id
+                    )
+                )
+                WHERE quantity != ledger_quantity
+            ''')
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
@@ -8,15 +8,20 @@ from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                               QSpacerItem, QSizePolicy, QScrollArea, QApplication)
 from PySide6.QtCore import Qt, Signal, QTimer
 from PySide6.QtGui import QFont, QPixmap
+import logging
 
-from src.database.database_manager import DatabaseManager
+from src.database.remote_manager import create_database_manager
 from src.ui.modules.pos_module import POSModule
 from src.ui.modules.inventory_module import InventoryModule
+from src.ui.modules.purchasing_module import PurchasingModule
 from src.ui.modules.reports_module import ReportsModule
 from src.ui.modules.users_module import UsersModule
 from src.ui.modules.settings_module import SettingsModule
+from src.ui.modules.diagnostics_module import DiagnosticsModule
 from src.utils.theme_manager import ThemeManager
 
+logger = logging.getLogger(__name__)
+
 class LoginPage(QWidget):
     """Login page widget - UPDATED"""
     
@@ -288,12 +293,12 @@ class LoginPage(QWidget):
         
     def handle_login(self):
         """Handle login attempt"""
-        print("Login button clicked!")
+        logger.debug("Login button clicked!")
         
         username = self.username_input.text().strip()
         password = self.password_input.text()
         
-        print(f"Username: '{username}', Password: '{password}'")
+        logger.debug("Login attempt for username: '%s'", username)
         
         if not username or not password:
             self.show_error("Please enter both username and password")
@@ -310,13 +315,13 @@ class LoginPage(QWidget):
         
         try:
             # Authenticate user
-            print("Attempting authentication...")
+            logger.debug("Attempting authentication...")
             user = self.db_manager.authenticate_user(username, password)
-            print(f"Authentication result: {user}")
+            logger.debug("Authentication result: %s", user is not None)
             
             if user:
                 self.show_success("Login successful!")
-                print("Emitting login_successful signal...")
+                logger.debug("Emitting login_successful signal...")
                 # Emit signal with user data
                 QTimer.singleShot(500, lambda: self.login_successful.emit(user))
             else:
@@ -324,7 +329,7 @@ class LoginPage(QWidget):
                 self.reset_login_button()
                 
         except Exception as e:
-            print(f"Login error: {e}")
+            logger.error("Login error: %s", e)
             self.show_error(f"Login error: {str(e)}")
             self.reset_login_button()
             
@@ -335,7 +340,7 @@ class LoginPage(QWidget):
             
     def show_error(self, message):
         """Show error message"""
-        print(f"Showing error: {message}")
+        logger.debug("Showing error: %s", message)
         self.status_label.setText(message)
         self.status_label.setStyleSheet("""
             QLabel {
@@ -350,7 +355,7 @@ class LoginPage(QWidget):
         
     def show_success(self, message):
         """Show success message"""
-        print(f"Showing success: {message}")
+        logger.debug("Showing success: %s", message)
         self.status_label.setText(message)
         self.status_label.setStyleSheet("""
             QLabel {
@@ -398,6 +403,8 @@ class MainDashboard(QWidget):
     """Main dashboard with sidebar and content area"""
     
     logout_requested = Signal()  # NEW SIGNAL
+    # Products that just went low; emitted from whichever thread recorded the sale
+    stock_alert = Signal(list)
     
     def __init__(self, user, db_manager):
         super().__init__()
@@ -421,9 +428,17 @@ class MainDashboard(QWidget):
         # Create content area
         self.create_content_area()
         
+        # Low-stock banner above the content area
+        self.create_alert_banner()
+        content_column = QVBoxLayout()
+        content_column.setContentsMargins(0, 0, 0, 0)
+        content_column.setSpacing(0)
+        content_column.addWidget(self.alert_frame)
+        content_column.addWidget(self.content_area, 1)
+        
         # Add to main layout
         main_layout.addWidget(self.sidebar_frame)
-        main_layout.addWidget(self.content_area, 1)
+        main_layout.addLayout(content_column, 1)
         
         self.setLayout(main_layout)
         
@@ -499,6 +514,11 @@ class MainDashboard(QWidget):
             self.nav_buttons['inventory'] = SidebarButton("Inventory", "📦")
             nav_layout.addWidget(self.nav_buttons['inventory'])
         
+        # Purchasing - Available to admin and stock_manager
+        if self.user['role'] in ['admin', 'stock_manager']:
+            self.nav_buttons['purchasing'] = SidebarButton("Purchasing", "🚚")
+            nav_layout.addWidget(self.nav_buttons['purchasing'])
+        
         # Reports - Available to admin and cashier
         if self.user['role'] in ['admin', 'cashier']:
             self.nav_buttons['reports'] = SidebarButton("Reports", "📊")
@@ -508,6 +528,8 @@ class MainDashboard(QWidget):
         if self.user['role'] == 'admin':
             self.nav_buttons['users'] = SidebarButton("User Management", "👥")
             nav_layout.addWidget(self.nav_buttons['users'])
+            self.nav_buttons['diagnostics'] = SidebarButton("Diagnostics", "🩺")
+            nav_layout.addWidget(self.nav_buttons['diagnostics'])
         
         # Settings - Available to all
         self.nav_buttons['settings'] = SidebarButton("Settings", "⚙️")
@@ -583,7 +605,7 @@ class MainDashboard(QWidget):
             self.modules['pos'] = POSModule(self.user, self.db_manager)
             self.content_area.addWidget(self.modules['pos'])
         except Exception as e:
-            print(f"Error loading POS module: {e}")
+            logger.error("Error loading POS module: %s", e)
         
         # Inventory Module
         if self.user['role'] in ['admin', 'stock_manager']:
@@ -591,7 +613,15 @@ class MainDashboard(QWidget):
                 self.modules['inventory'] = InventoryModule(self.user, self.db_manager)
                 self.content_area.addWidget(self.modules['inventory'])
             except Exception as e:
-                print(f"Error loading Inventory module: {e}")
+                logger.error("Error loading Inventory module: %s", e)
+        
+        # Purchasing Module
+        if self.user['role'] in ['admin', 'stock_manager']:
+            try:
+                self.modules['purchasing'] = PurchasingModule(self.user, self.db_manager)
+                self.content_area.addWidget(self.modules['purchasing'])
+            except Exception as e:
+                logger.error("Error loading Purchasing module: %s", e)
         
         # Reports Module
         if self.user['role'] in ['admin', 'cashier']:
@@ -599,7 +629,7 @@ class MainDashboard(QWidget):
                 self.modules['reports'] = ReportsModule(self.user, self.db_manager)
                 self.content_area.addWidget(self.modules['reports'])
             except Exception as e:
-                print(f"Error loading Reports module: {e}")
+                logger.error("Error loading Reports module: %s", e)
         
         # Users Module
         if self.user['role'] == 'admin':
@@ -607,7 +637,13 @@ class MainDashboard(QWidget):
                 self.modules['users'] = UsersModule(self.user, self.db_manager)
                 self.content_area.addWidget(self.modules['users'])
             except Exception as e:
-                print(f"Error loading Users module: {e}")
+                logger.error("Error loading Users module: %s", e)
+            
+            try:
+                self.modules['diagnostics'] = DiagnosticsModule(self.user, self.db_manager)
+                self.content_area.addWidget(self.modules['diagnostics'])
+            except Exception as e:
+                logger.error("Error loading Diagnostics module: %s", e)
         
         # Settings Module
         try:
@@ -616,7 +652,37 @@ class MainDashboard(QWidget):
             self.modules['settings'].settings_changed.connect(self.apply_settings_changes)
             self.content_area.addWidget(self.modules['settings'])
         except Exception as e:
-            print(f"Error loading Settings module: {e}")
+            logger.error("Error loading Settings module: %s", e)
+        
+    def create_alert_banner(self):
+        """Create the banner that shows low-stock alerts (hidden until one arrives)"""
+        self.alert_frame = QFrame()
+        self.alert_frame.setStyleSheet("""
+            QFrame {
+                background-color: #fff3cd;
+                border-bottom: 1px solid #ffeeba;
+            }
+            QLabel {
+                color: #856404;
+                border: none;
+            }
+        """)
+        alert_layout = QHBoxLayout(self.alert_frame)
+        alert_layout.setContentsMargins(20, 8, 20, 8)
+        
+        self.alert_label = QLabel()
+        self.alert_label.setFont(QFont("Segoe UI", 11, QFont.Bold))
+        self.alert_label.setWordWrap(True)
+        
+        self.alert_view_button = QPushButton("View Reorder List")
+        self.alert_view_button.setVisible('inventory' in self.modules)
+        self.alert_dismiss_button = QPushButton("✕")
+        self.alert_dismiss_button.setFixedWidth(32)
+        
+        alert_layout.addWidget(self.alert_label, 1)
+        alert_layout.addWidget(self.alert_view_button)
+        alert_layout.addWidget(self.alert_dismiss_button)
+        self.alert_frame.hide()
         
     def setup_connections(self):
         """Setup signal connections"""
@@ -627,9 +693,38 @@ class MainDashboard(QWidget):
         # Logout button - FIXED
         self.logout_button.clicked.connect(self.handle_logout)
         
+        # Low-stock alerts arrive on the thread that recorded the sale; the signal brings them to the UI thread
+        self.stock_alert.connect(self.show_stock_alert)
+        self.alert_view_button.clicked.connect(self.show_reorder_list)
+        self.alert_dismiss_button.clicked.connect(self.alert_frame.hide)
+        try:
+            self.db_manager.stock_alerts.add_listener(self.on_stock_alert)
+        except Exception as e:
+            logger.error("Error loading stock alerts: %s", e)
+        
+    def on_stock_alert(self, products):
+        """Stock alert listener; may run off the UI thread"""
+        self.stock_alert.emit(products)
+        
+    def show_stock_alert(self, products):
+        """Show the products that just went low"""
+        details = ", ".join(f"{product['name']} ({product['quantity']} left, min {product['min_quantity']})"
+                            for product in products[:3])
+        if len(products) > 3:
+            details += f" and {len(products) - 3} more"
+        total = len(self.db_manager.stock_alerts.get_low_stock())
+        self.alert_label.setText(f"⚠️ Low stock: {details} — {total} product(s) at or below minimum")
+        self.alert_frame.show()
+        
+    def show_reorder_list(self):
+        """Open inventory with the reorder suggestions"""
+        self.alert_frame.hide()
+        self.load_module('inventory')
+        self.modules['inventory'].show_reorder_suggestions()
+        
     def load_module(self, module_name):
         """Load a specific module"""
-        print(f"Loading module: {module_name}")
+        logger.debug("Loading module: %s", module_name)
         
         if module_name in self.modules:
             # Update button states
@@ -639,33 +734,35 @@ class MainDashboard(QWidget):
             # Switch to module
             self.content_area.setCurrentWidget(self.modules[module_name])
             self.current_module = module_name
-            print(f"Switched to module: {module_name}")
+            logger.debug("Switched to module: %s", module_name)
         else:
-            print(f"Module {module_name} not found!")
+            logger.warning("Module %s not found!", module_name)
             
     def handle_logout(self):
         """Handle logout - FIXED"""
-        print("Logout button clicked!")  # Debug print
+        logger.debug("Logout button clicked!")
         
         reply = QMessageBox.question(self, "Logout", 
                                    "Are you sure you want to logout?",
                                    QMessageBox.Yes | QMessageBox.No)
         
         if reply == QMessageBox.Yes:
-            print("User confirmed logout")  # Debug print
+            logger.debug("User confirmed logout")
             # Log activity
             try:
                 self.db_manager.log_activity(self.user['id'], "logout", 
                                            f"User {self.user['username']} logged out")
             except Exception as e:
-                print(f"Error logging activity: {e}")
+                logger.error("Error logging activity: %s", e)
+            
+            self.db_manager.stock_alerts.remove_listener(self.on_stock_alert)
             
             # Emit logout signal
             self.logout_requested.emit()
             
     def apply_settings_changes(self):
         """Apply settings changes immediately"""
-        print("Applying settings changes...")
+        logger.debug("Applying settings changes...")
         
         # Apply theme changes
         theme = self.db_manager.get_setting("theme") or "light"
@@ -675,17 +772,46 @@ class MainDashboard(QWidget):
         language = self.db_manager.get_setting("language") or "en"
         # Language changes would require app restart for full effect
         
-        print(f"Applied theme: {theme}, language: {language}")
+        logger.info("Applied theme: %s, language: %s", theme, language)
 
 class MainApplication(QMainWindow):
     """Main application window - UPDATED"""
     
     def __init__(self):
         super().__init__()
-        self.db_manager = DatabaseManager()
+        # Local database, or a POS server when $LKS_POS_SERVER is set
+        self.db_manager = create_database_manager()
         self.current_user = None
+        self.recover_checkout_journal()
         self.setup_ui()
         
+        # Scheduled full/incremental backups run for as long as the application is open
+        self.db_manager.backup_scheduler.start()
+        # So does the nightly demand forecast
+        self.db_manager.forecasts.start()
+        
+    def recover_checkout_journal(self):
+        """Record sales interrupted by a crash; the unfinished cart goes back to the POS screen"""
+        try:
+            summary = self.db_manager.checkout_journal.recover()
+        except Exception as e:
+            logger.error("Error recovering checkout journal: %s", e)
+            return
+        
+        if summary['recorded'] or summary['failed'] or summary['deferred'] or summary['cart_items']:
+            logger.info("Checkout journal recovered: %s sale(s) recorded, %s failed, %s deferred, "
+                        "%s cart item(s) restored", len(summary['recorded']), len(summary['failed']),
+                        len(summary['deferred']), summary['cart_items'])
+        if summary['failed']:
+            QMessageBox.warning(None, "Interrupted Sales",
+                              "These paid sales could not be recorded after the last shutdown "
+                              "and may need a refund:\n" + "\n".join(summary['failed']))
+        if summary['deferred']:
+            QMessageBox.warning(None, "Interrupted Sales",
+                              "These paid sales could not be recorded yet and are kept in the "
+                              "checkout journal; they will be retried at the next start:\n"
+                              + "\n".join(summary['deferred']))
+        
     def setup_ui(self):
         """Setup main application interface"""
         self.setWindowTitle("LKS POS System")  # CHANGED NAME
@@ -704,17 +830,17 @@ class MainApplication(QMainWindow):
         # Show login page initially
         self.central_widget.setCurrentWidget(self.login_page)
         
-        print("Main application setup complete")
+        logger.debug("Main application setup complete")
         
     def on_login_success(self, user):
         """Handle successful login"""
-        print(f"Login successful for user: {user}")
+        logger.info("Login successful for user: %s", user['username'])
         
         self.current_user = user
         
         try:
             # Create and show main dashboard
-            print("Creating dashboard...")
+            logger.debug("Creating dashboard...")
             self.dashboard = MainDashboard(user, self.db_manager)
             # Connect logout signal - FIXED
             self.dashboard.logout_requested.connect(self.show_login)
@@ -724,15 +850,15 @@ class MainApplication(QMainWindow):
             # Update window title
             self.setWindowTitle(f"LKS POS System - {user['full_name']} ({user['role'].title()})")  # CHANGED NAME
             
-            print("Dashboard created and shown successfully!")
+            logger.debug("Dashboard created and shown successfully!")
             
         except Exception as e:
-            print(f"Error creating dashboard: {e}")
+            logger.error("Error creating dashboard: %s", e)
             QMessageBox.critical(self, "Error", f"Failed to load dashboard: {str(e)}")
         
     def show_login(self):
         """Show login page (for logout) - FIXED"""
-        print("Showing login page...")
+        logger.debug("Showing login page...")
         
         # Remove dashboard if it exists
         if hasattr(self, 'dashboard'):
@@ -752,4 +878,11 @@ class MainApplication(QMainWindow):
         self.setWindowTitle("LKS POS System")  # CHANGED NAME
         self.current_user = None
         
-        print("Login page shown successfully!")
+        logger.debug("Login page shown successfully!")
+        
+    def closeEvent(self, event):
+        """Stop background services before the window closes"""
+        self.db_manager.backup_scheduler.stop()
+        self.db_manager.forecasts.stop()
+        self.db_manager.checkout_journal.close()
+        super().closeEvent(event)
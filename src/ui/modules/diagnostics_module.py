@@ -0,0 +1,244 @@
+"""
+Diagnostics Module - Query timings, slow-query log and UI stalls (Admin only)
+"""
+
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
+                              QPushButton, QTableWidget, QTableWidgetItem,
+                              QFrame, QGroupBox, QCheckBox, QDoubleSpinBox,
+                              QHeaderView, QAbstractItemView, QMessageBox)
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QFont, QColor
+import logging
+
+from src.utils.stall_monitor import stall_monitor
+
+logger = logging.getLogger(__name__)
+
+class DiagnosticsModule(QWidget):
+    """Shows per-statement latency from the query profiler and UI stalls from the stall monitor"""
+
+    def __init__(self, user, db_manager):
+        super().__init__()
+        self.user = user
+        self.db_manager = db_manager
+        self.profiler = db_manager.profiler
+        self.setup_ui()
+        self.setup_connections()
+        self.load_config()
+        self.refresh()
+
+    def setup_ui(self):
+        """Setup diagnostics interface"""
+        layout = QVBoxLayout()
+        layout.setContentsMargins(10, 10, 10, 10)
+
+        # Header
+        header_frame = QFrame()
+        header_layout = QHBoxLayout(header_frame)
+
+        title_label = QLabel("🩺 Diagnostics")
+        title_label.setFont(QFont("Arial", 18, QFont.Bold))
+        title_label.setStyleSheet("color: #2c3e50;")
+
+        self.refresh_button = QPushButton("🔄 Refresh")
+        self.reset_button = QPushButton("🗑️ Reset Stats")
+        for button, color, hover in ((self.refresh_button, "#007bff", "#0056b3"),
+                                     (self.reset_button, "#6c757d", "#5a6268")):
+            button.setStyleSheet(f"""
+                QPushButton {{
+                    background-color: {color};
+                    color: white;
+                    border: none;
+                    padding: 10px 20px;
+                    border-radius: 5px;
+                    font-weight: bold;
+                }}
+                QPushButton:hover {{
+                    background-color: {hover};
+                }}
+            """)
+
+        header_layout.addWidget(title_label)
+        header_layout.addStretch()
+        header_layout.addWidget(self.refresh_button)
+        header_layout.addWidget(self.reset_button)
+
+        # Profiler settings
+        settings_frame = QFrame()
+        settings_frame.setStyleSheet("""
+            QFrame {
+                background-color: #f8f9fa;
+                border: 1px solid #dee2e6;
+                border-radius: 5px;
+                padding: 10px;
+            }
+        """)
+        settings_layout = QHBoxLayout(settings_frame)
+
+        self.enabled_checkbox = QCheckBox("Profile queries")
+        self.threshold_spin = QDoubleSpinBox()
+        self.threshold_spin.setRange(0, 60000)
+        self.threshold_spin.setDecimals(1)
+        self.threshold_spin.setSuffix(" ms")
+        self.log_path_label = QLabel()
+        self.log_path_label.setStyleSheet("color: #6c757d;")
+        self.log_path_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+
+        settings_layout.addWidget(self.enabled_checkbox)
+        settings_layout.addWidget(QLabel("Slow query threshold:"))
+        settings_layout.addWidget(self.threshold_spin)
+        settings_layout.addStretch()
+        settings_layout.addWidget(self.log_path_label)
+
+        table_style = """
+            QTableWidget {
+                background-color: white;
+                border: 1px solid #dee2e6;
+                border-radius: 5px;
+                gridline-color: #dee2e6;
+            }
+            QHeaderView::section {
+                background-color: #e9ecef;
+                padding: 4px;
+                border: none;
+                font-weight: bold;
+            }
+        """
+
+        # Per-statement timings
+        stats_group = QGroupBox("Statements (by total time)")
+        stats_layout = QVBoxLayout(stats_group)
+        self.stats_table = QTableWidget()
+        self.stats_table.setColumnCount(7)
+        self.stats_table.setHorizontalHeaderLabels(["Statement", "Calls", "Total ms", "Avg ms", "p95 ms", "Max ms", "Rows"])
+        self.stats_table.setStyleSheet(table_style)
+        self.stats_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.stats_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.stats_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        stats_layout.addWidget(self.stats_table)
+
+        # Slow queries with their plans
+        slow_group = QGroupBox("Recent Slow Queries")
+        slow_layout = QVBoxLayout(slow_group)
+        self.slow_table = QTableWidget()
+        self.slow_table.setColumnCount(5)
+        self.slow_table.setHorizontalHeaderLabels(["Time", "Statement", "ms", "Rows", "Query Plan"])
+        self.slow_table.setStyleSheet(table_style)
+        self.slow_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.slow_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.slow_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.slow_table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
+        slow_layout.addWidget(self.slow_table)
+
+        # Actions that blocked the event loop, from this till's stall monitor
+        stalls_group = QGroupBox("UI Stalls by Action")
+        stalls_layout = QVBoxLayout(stalls_group)
+        self.stalls_table = QTableWidget()
+        self.stalls_table.setColumnCount(5)
+        self.stalls_table.setHorizontalHeaderLabels(["Action", "Stalls", "Total ms", "Max ms", "Time Spent In"])
+        self.stalls_table.setStyleSheet(table_style)
+        self.stalls_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.stalls_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.stalls_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.stalls_table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
+        stalls_layout.addWidget(self.stalls_table)
+
+        layout.addWidget(header_frame)
+        layout.addWidget(settings_frame)
+        layout.addWidget(stats_group, 3)
+        layout.addWidget(slow_group, 2)
+        layout.addWidget(stalls_group, 2)
+
+        self.setLayout(layout)
+
+    def setup_connections(self):
+        """Setup signal connections"""
+        self.refresh_button.clicked.connect(self.refresh)
+        self.reset_button.clicked.connect(self.reset_stats)
+        self.enabled_checkbox.toggled.connect(self.apply_config)
+        self.threshold_spin.editingFinished.connect(self.apply_config)
+
+    def load_config(self):
+        """Show the profiler's current settings"""
+        try:
+            config = self.profiler.get_config()
+        except Exception as e:
+            logger.error("Error loading profiler settings: %s", e)
+            return
+
+        self.enabled_checkbox.blockSignals(True)
+        self.enabled_checkbox.setChecked(config['enabled'])
+        self.enabled_checkbox.blockSignals(False)
+        self.threshold_spin.setValue(config['slow_threshold_ms'])
+        self.log_path_label.setText(f"Log: {config['log_path']}" if config['log_path'] else "")
+
+    def apply_config(self):
+        """Send the switch and threshold to the profiler"""
+        try:
+            self.profiler.configure(enabled=self.enabled_checkbox.isChecked(),
+                                    slow_threshold_ms=self.threshold_spin.value())
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Failed to update profiler: {e}")
+
+    def refresh(self):
+        """Reload statement stats, slow queries and UI stalls"""
+        self.load_stalls()
+        try:
+            stats = self.profiler.stats()
+            slow = self.profiler.get_recent_slow()
+        except Exception as e:
+            logger.error("Error loading query stats: %s", e)
+            return
+
+        self.stats_table.setRowCount(len(stats))
+        for row, statement in enumerate(stats):
+            self.stats_table.setItem(row, 0, QTableWidgetItem(statement['sql']))
+            values = (statement['calls'], statement['total_ms'], statement['avg_ms'],
+                      statement['p95_ms'], statement['max_ms'], statement['rows'])
+            for column, value in enumerate(values, start=1):
+                item = QTableWidgetItem()
+                item.setData(Qt.DisplayRole, value)
+                self.stats_table.setItem(row, column, item)
+        self.stats_table.resizeColumnsToContents()
+        self.stats_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+
+        self.slow_table.setRowCount(len(slow))
+        for row, entry in enumerate(slow):
+            self.slow_table.setItem(row, 0, QTableWidgetItem(entry['at']))
+            self.slow_table.setItem(row, 1, QTableWidgetItem(entry['sql']))
+            self.slow_table.setItem(row, 2, QTableWidgetItem(f"{entry['elapsed_ms']:.1f}"))
+            self.slow_table.setItem(row, 3, QTableWidgetItem(str(entry['rows'])))
+            plan_item = QTableWidgetItem(" | ".join(entry['plan']))
+            # Full scans are the usual cause of a slow statement
+            if any(step.startswith("SCAN") for step in entry['plan']):
+                plan_item.setForeground(QColor("#dc3545"))
+            self.slow_table.setItem(row, 4, plan_item)
+
+    def load_stalls(self):
+        """Show stalls per action with where their time went"""
+        report = stall_monitor.report()
+        self.stalls_table.setRowCount(len(report))
+        for row, action in enumerate(report):
+            self.stalls_table.setItem(row, 0, QTableWidgetItem(action['action']))
+            for column, value in enumerate((action['stalls'], action['total_ms'], action['max_ms']), start=1):
+                item = QTableWidgetItem()
+                item.setData(Qt.DisplayRole, value)
+                self.stalls_table.setItem(row, column, item)
+            samples = sum(count for _, count in action['hot_spots']) or 1
+            self.stalls_table.setItem(row, 4, QTableWidgetItem(", ".join(
+                f"{location} {count * 100 // samples}%" for location, count in action['hot_spots'])))
+
+    def reset_stats(self):
+        """Clear collected stats"""
+        stall_monitor.reset()
+        try:
+            self.profiler.reset()
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Failed to reset stats: {e}")
+            return
+        self.refresh()
+
+    def showEvent(self, event):
+        """Refresh whenever the screen is opened"""
+        super().showEvent(event)
+        self.refresh()
@@ -8,10 +8,13 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                               QMessageBox, QDialog, QDialogButtonBox, QTextEdit,
                               QGridLayout, QGroupBox, QFileDialog, QTabWidget,
                               QHeaderView, QAbstractItemView)
-from PySide6.QtCore import Qt, Signal
+from PySide6.QtCore import Qt, Signal, QThread
 from PySide6.QtGui import QFont, QPixmap
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 class CategoryDialog(QDialog):
     """Dialog for adding/editing categories"""
     
@@ -43,12 +46,18 @@ class CategoryDialog(QDialog):
         self.name_input.setPlaceholderText("Enter category name")
         info_layout.addWidget(self.name_input, 0, 1)
         
+        # Parent
+        info_layout.addWidget(QLabel("Parent Category:"), 1, 0)
+        self.parent_combo = QComboBox()
+        self.load_parents()
+        info_layout.addWidget(self.parent_combo, 1, 1)
+        
         # Description
-        info_layout.addWidget(QLabel("Description:"), 1, 0)
+        info_layout.addWidget(QLabel("Description:"), 2, 0)
         self.description_input = QTextEdit()
         self.description_input.setMaximumHeight(80)
         self.description_input.setPlaceholderText("Enter category description")
-        info_layout.addWidget(self.description_input, 1, 1)
+        info_layout.addWidget(self.description_input, 2, 1)
         
         info_group.setLayout(info_layout)
         
@@ -64,6 +73,16 @@ class CategoryDialog(QDialog):
         
         self.setLayout(layout)
         
+    def load_parents(self):
+        """Load possible parents; a category cannot go under its own branch"""
+        registry = self.db_manager.category_registry
+        own_branch = registry.subtree(self.category['id']) if self.is_edit_mode else set()
+        
+        self.parent_combo.addItem("(None - top level)", None)
+        for category in registry.tree():
+            if category['id'] not in own_branch:
+                self.parent_combo.addItem(category['label'], category['id'])
+        
     def load_category_data(self):
         """Load existing category data for editing"""
         if not self.category:
@@ -72,6 +91,10 @@ class CategoryDialog(QDialog):
         self.name_input.setText(self.category['name'])
         self.description_input.setPlainText(self.category.get('description', ''))
         
+        index = self.parent_combo.findData(self.category.get('parent_id'))
+        if index >= 0:
+            self.parent_combo.setCurrentIndex(index)
+        
     def save_category(self):
         """Save category to database"""
         # Validate input
@@ -81,27 +104,13 @@ class CategoryDialog(QDialog):
             return
             
         description = self.description_input.toPlainText().strip()
+        parent_id = self.parent_combo.currentData()
         
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            
             if self.is_edit_mode:
-                # Update existing category
-                cursor.execute('''
-                    UPDATE categories 
-                    SET name=?, description=?
-                    WHERE id=?
-                ''', (name, description, self.category['id']))
+                self.db_manager.category_registry.update(self.category['id'], name, description, parent_id)
             else:
-                # Insert new category
-                cursor.execute('''
-                    INSERT INTO categories (name, description)
-                    VALUES (?, ?)
-                ''', (name, description))
-            
-            conn.commit()
-            conn.close()
+                self.db_manager.category_registry.create(name, description, parent_id)
             
             self.accept()
             
@@ -111,10 +120,11 @@ class CategoryDialog(QDialog):
 class ProductDialog(QDialog):
     """Dialog for adding/editing products"""
 
-    def __init__(self, db_manager, product=None, parent=None):
+    def __init__(self, db_manager, product=None, parent=None, user=None):
         super().__init__(parent)
         self.db_manager = db_manager
         self.product = product
+        self.user = user
         self.is_edit_mode = product is not None
         self.setup_ui()
         
@@ -174,6 +184,8 @@ class ProductDialog(QDialog):
         self.cost_price_input.setRange(0, 99999.99)
         self.cost_price_input.setDecimals(2)
         self.cost_price_input.setSuffix(" DZD")
+        self.cost_price_input.setToolTip("Average cost, updated by goods receipts; "
+                                         "only saved here when you change it")
         pricing_layout.addWidget(self.cost_price_input, 0, 1)
         
         # Selling price
@@ -237,15 +249,11 @@ class ProductDialog(QDialog):
         
     def load_categories(self):
         """Load categories into combo box"""
-        conn = self.db_manager.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name FROM categories ORDER BY name")
-        categories = cursor.fetchall()
-        conn.close()
+        categories = self.db_manager.category_registry.tree()
         
         self.category_combo.clear()
         for category in categories:
-            self.category_combo.addItem(category['name'], category['id'])
+            self.category_combo.addItem(category['label'], category['id'])
             
     def generate_barcode(self):
         """Generate a random barcode"""
@@ -323,33 +331,270 @@ class ProductDialog(QDialog):
         }
         
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
+            # Stock is never overwritten: the change from what the dialog showed is posted
+            # to the ledger, so sales made while the dialog was open are not lost
+            quantity = product_data.pop('quantity')
+            user_id = self.user['id'] if self.user else None
+            # Likewise the average cost that receipts maintain is only overwritten when edited here
+            if self.is_edit_mode:
+                shown_cost = round(self.product.get('cost_price') or 0, 2)
+                if round(product_data['cost_price'], 2) == shown_cost:
+                    del product_data['cost_price']
             
             if self.is_edit_mode:
-                # Update existing product
-                cursor.execute('''
-                    UPDATE products 
-                    SET name=?, barcode=?, category_id=?, description=?, cost_price=?,
-                        price=?, quantity=?, min_quantity=?, image_path=?, updated_at=CURRENT_TIMESTAMP
-                    WHERE id=?
-                ''', (*product_data.values(), self.product['id']))
+                self.db_manager.products.update(self.product['id'], product_data,
+                                                quantity - self.product['quantity'], user_id)
             else:
-                # Insert new product
-                cursor.execute('''
-                    INSERT INTO products (name, barcode, category_id, description, cost_price,
-                                        price, quantity, min_quantity, image_path)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', tuple(product_data.values()))
-            
-            conn.commit()
-            conn.close()
+                self.db_manager.products.create(product_data, quantity, user_id)
             
             self.accept()
             
         except Exception as e:
             QMessageBox.critical(self, "Database Error", f"Failed to save product: {str(e)}")
 
+class StockHistoryDialog(QDialog):
+    """Shows a product's stock movements"""
+    
+    MOVEMENT_LABELS = {
+        'initial': "Opening balance",
+        'sale': "Sale",
+        'return': "Return",
+        'receipt': "Receipt",
+        'adjustment': "Adjustment",
+    }
+    
+    def __init__(self, db_manager, product, parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.product = product
+        self.setup_ui()
+        self.load_movements()
+        
+    def setup_ui(self):
+        """Setup stock history dialog UI"""
+        self.setWindowTitle(f"Stock History - {self.product['name']}")
+        self.setModal(True)
+        self.resize(700, 450)
+        
+        layout = QVBoxLayout(self)
+        
+        self.summary_label = QLabel()
+        self.summary_label.setFont(QFont("Arial", 11, QFont.Bold))
+        
+        self.movements_table = QTableWidget()
+        self.movements_table.setColumnCount(6)
+        self.movements_table.setHorizontalHeaderLabels([
+            "Date", "Type", "Change", "Reference", "User", "Note"
+        ])
+        self.movements_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.movements_table.horizontalHeader().setSectionResizeMode(5, QHeaderView.Stretch)
+        
+        button_box = QDialogButtonBox(QDialogButtonBox.Close)
+        button_box.rejected.connect(self.reject)
+        
+        layout.addWidget(self.summary_label)
+        layout.addWidget(self.movements_table)
+        layout.addWidget(button_box)
+        
+    def load_movements(self):
+        """Load the most recent movements"""
+        movements = self.db_manager.stock.get_movements(self.product['id'])
+        product = self.db_manager.get_product_by_id(self.product['id']) or self.product
+        self.summary_label.setText(f"On hand: {product['quantity']}")
+        
+        self.movements_table.setRowCount(len(movements))
+        for row, movement in enumerate(movements):
+            change = movement['quantity_change']
+            change_item = QTableWidgetItem(f"{change:+d}")
+            change_item.setForeground(Qt.darkGreen if change > 0 else Qt.red)
+            
+            reference = ""
+            if movement['reference_type']:
+                reference = f"{movement['reference_type']} #{movement['reference_id']}"
+            
+            self.movements_table.setItem(row, 0, QTableWidgetItem(movement['created_at'][:19]))
+            self.movements_table.setItem(row, 1, QTableWidgetItem(
+                self.MOVEMENT_LABELS.get(movement['movement_type'], movement['movement_type'])))
+            self.movements_table.setItem(row, 2, change_item)
+            self.movements_table.setItem(row, 3, QTableWidgetItem(reference))
+            self.movements_table.setItem(row, 4, QTableWidgetItem(movement['user_name'] or ""))
+            self.movements_table.setItem(row, 5, QTableWidgetItem(movement['note'] or ""))
+
+class ReorderDialog(QDialog):
+    """Shows the products due for reordering with suggested quantities"""
+    
+    def __init__(self, db_manager, parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.setup_ui()
+        self.load_suggestions()
+        
+    def setup_ui(self):
+        """Setup reorder dialog UI"""
+        self.setWindowTitle("Reorder Suggestions")
+        self.setModal(True)
+        self.resize(800, 450)
+        
+        layout = QVBoxLayout(self)
+        
+        self.summary_label = QLabel()
+        self.summary_label.setFont(QFont("Arial", 11, QFont.Bold))
+        
+        self.suggestions_table = QTableWidget()
+        self.suggestions_table.setColumnCount(7)
+        self.suggestions_table.setHorizontalHeaderLabels([
+            "Product", "Stock", "Min Stock", "Sold / Day", "Days Left", "Reorder Point", "Order Qty"
+        ])
+        self.suggestions_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.suggestions_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        
+        button_box = QDialogButtonBox(QDialogButtonBox.Close)
+        button_box.rejected.connect(self.reject)
+        
+        layout.addWidget(self.summary_label)
+        layout.addWidget(self.suggestions_table)
+        layout.addWidget(button_box)
+        
+    def load_suggestions(self):
+        """Compute suggestions from recent sales velocity"""
+        try:
+            suggestions = self.db_manager.stock_alerts.suggestions()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to compute reorder suggestions: {str(e)}")
+            suggestions = []
+        
+        self.summary_label.setText(f"{len(suggestions)} product(s) due for reordering")
+        self.suggestions_table.setRowCount(len(suggestions))
+        for row, suggestion in enumerate(suggestions):
+            stock_item = QTableWidgetItem(str(suggestion['quantity']))
+            if suggestion['quantity'] <= 0:
+                stock_item.setForeground(Qt.red)
+            elif suggestion['quantity'] <= suggestion['min_quantity']:
+                stock_item.setForeground(Qt.darkYellow)
+            days_left = suggestion['days_left']
+            
+            self.suggestions_table.setItem(row, 0, QTableWidgetItem(suggestion['name']))
+            self.suggestions_table.setItem(row, 1, stock_item)
+            self.suggestions_table.setItem(row, 2, QTableWidgetItem(str(suggestion['min_quantity'])))
+            self.suggestions_table.setItem(row, 3, QTableWidgetItem(f"{suggestion['daily_units']:.1f}"))
+            self.suggestions_table.setItem(row, 4, QTableWidgetItem("-" if days_left is None else f"{days_left:.1f}"))
+            self.suggestions_table.setItem(row, 5, QTableWidgetItem(str(suggestion['reorder_point'])))
+            self.suggestions_table.setItem(row, 6, QTableWidgetItem(str(suggestion['suggested_quantity'])))
+
+class ForecastWorker(QThread):
+    """Runs the demand forecast off the UI thread"""
+    
+    completed = Signal(dict)
+    failed = Signal(str)
+    
+    def __init__(self, forecaster, parent=None):
+        super().__init__(parent)
+        self.forecaster = forecaster
+        
+    def run(self):
+        """Run the forecast and report the outcome through signals"""
+        try:
+            self.completed.emit(self.forecaster.run_once())
+        except Exception as e:
+            self.failed.emit(str(e))
+
+class ForecastDialog(QDialog):
+    """Shows the nightly demand forecasts against current stock"""
+    
+    METHOD_LABELS = {'ses': "Smoothing", 'croston': "Intermittent", 'none': "No recent sales"}
+    
+    def __init__(self, db_manager, parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.worker = None
+        self.setup_ui()
+        self.load_forecasts()
+        
+    def setup_ui(self):
+        """Setup forecast dialog UI"""
+        self.setWindowTitle("Demand Forecast")
+        self.setModal(True)
+        self.resize(900, 500)
+        
+        layout = QVBoxLayout(self)
+        
+        self.summary_label = QLabel()
+        self.summary_label.setFont(QFont("Arial", 11, QFont.Bold))
+        
+        self.forecasts_table = QTableWidget()
+        self.forecasts_table.setColumnCount(7)
+        self.forecasts_table.setHorizontalHeaderLabels([
+            "Product", "Stock", "Method", "Forecast / Day", "Forecast Period", "± / Day", "Days of Stock"
+        ])
+        self.forecasts_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.forecasts_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        
+        button_box = QDialogButtonBox(QDialogButtonBox.Close)
+        self.run_button = button_box.addButton("Run Now", QDialogButtonBox.ActionRole)
+        self.run_button.clicked.connect(self.run_forecast)
+        button_box.rejected.connect(self.reject)
+        
+        layout.addWidget(self.summary_label)
+        layout.addWidget(self.forecasts_table)
+        layout.addWidget(button_box)
+        
+    def load_forecasts(self):
+        """Load the stored forecasts"""
+        try:
+            forecasts = self.db_manager.forecasts.get_forecasts()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to load demand forecasts: {str(e)}")
+            forecasts = []
+        
+        if forecasts:
+            first = forecasts[0]
+            self.summary_label.setText(f"{len(forecasts)} product(s), forecast {first['generated_at']} UTC "
+                                       f"from {first['history_days']} days of sales")
+        else:
+            self.summary_label.setText("No forecasts yet - they are computed nightly, or use Run Now")
+        
+        self.forecasts_table.setRowCount(len(forecasts))
+        for row, forecast in enumerate(forecasts):
+            days_of_cover = forecast['days_of_cover']
+            cover_item = QTableWidgetItem("-" if days_of_cover is None else f"{days_of_cover:.1f}")
+            if days_of_cover is not None and days_of_cover < forecast['horizon_days']:
+                cover_item.setForeground(Qt.red)
+            
+            self.forecasts_table.setItem(row, 0, QTableWidgetItem(forecast['name']))
+            self.forecasts_table.setItem(row, 1, QTableWidgetItem(str(forecast['quantity'])))
+            self.forecasts_table.setItem(row, 2, QTableWidgetItem(
+                self.METHOD_LABELS.get(forecast['method'], forecast['method'])))
+            self.forecasts_table.setItem(row, 3, QTableWidgetItem(f"{forecast['daily_rate']:.2f}"))
+            self.forecasts_table.setItem(row, 4, QTableWidgetItem(
+                f"{forecast['forecast_units']:.1f} ({forecast['horizon_days']} days)"))
+            self.forecasts_table.setItem(row, 5, QTableWidgetItem(f"{forecast['error_std'] or 0:.2f}"))
+            self.forecasts_table.setItem(row, 6, cover_item)
+            
+    def run_forecast(self):
+        """Recompute the forecasts now"""
+        self.run_button.setEnabled(False)
+        self.summary_label.setText("Forecasting...")
+        self.worker = ForecastWorker(self.db_manager.forecasts, self)
+        self.worker.completed.connect(self.on_forecast_completed)
+        self.worker.failed.connect(self.on_forecast_failed)
+        self.worker.start()
+        
+    def reject(self):
+        """Stay open until a running forecast finishes"""
+        if self.worker is not None and self.worker.isRunning():
+            return
+        super().reject()
+        
+    def on_forecast_completed(self, result):
+        self.run_button.setEnabled(True)
+        logger.info("Demand forecast run from the inventory screen: %s product(s)", result['products'])
+        self.load_forecasts()
+        
+    def on_forecast_failed(self, message):
+        self.run_button.setEnabled(True)
+        self.load_forecasts()
+        QMessageBox.critical(self, "Error", f"Demand forecast failed: {message}")
+
 class InventoryModule(QWidget):
     """Inventory management module"""
 
@@ -407,6 +652,8 @@ class InventoryModule(QWidget):
         
         self.import_button = QPushButton("📥 Import")
         self.export_button = QPushButton("📤 Export")
+        self.reorder_button = QPushButton("🔔 Reorder")
+        self.forecast_button = QPushButton("📈 Forecast")
         
         header_layout.addWidget(title_label)
         header_layout.addStretch()
@@ -414,6 +661,8 @@ class InventoryModule(QWidget):
         header_layout.addWidget(self.add_product_button)
         header_layout.addWidget(self.import_button)
         header_layout.addWidget(self.export_button)
+        header_layout.addWidget(self.reorder_button)
+        header_layout.addWidget(self.forecast_button)
         
         # Search and filter section
         filter_frame = QFrame()
@@ -435,7 +684,6 @@ class InventoryModule(QWidget):
         # Category filter
         category_label = QLabel("Category:")
         self.category_filter = QComboBox()
-        self.category_filter.addItem("All Categories", None)
         self.load_category_filter()
         
         # Stock filter
@@ -525,17 +773,21 @@ class InventoryModule(QWidget):
         self.stock_filter.currentTextChanged.connect(self.filter_products)
         self.import_button.clicked.connect(self.import_products)
         self.export_button.clicked.connect(self.export_products)
+        self.reorder_button.clicked.connect(self.show_reorder_suggestions)
+        self.forecast_button.clicked.connect(self.show_demand_forecast)
         
     def load_category_filter(self):
-        """Load categories for filter"""
-        conn = self.db_manager.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name FROM categories ORDER BY name")
-        categories = cursor.fetchall()
-        conn.close()
+        """Load the category tree for the filter, keeping the current choice"""
+        categories = self.db_manager.category_registry.tree()
+        selected = self.category_filter.currentData()
         
+        self.category_filter.blockSignals(True)
+        self.category_filter.clear()
+        self.category_filter.addItem("All Categories", None)
         for category in categories:
-            self.category_filter.addItem(category['name'], category['id'])
+            self.category_filter.addItem(category['label'], category['id'])
+        self.category_filter.setCurrentIndex(max(self.category_filter.findData(selected), 0))
+        self.category_filter.blockSignals(False)
             
     def load_products(self):
         """Load products into table"""
@@ -544,7 +796,6 @@ class InventoryModule(QWidget):
         self.products_table.setRowCount(len(products))
         
         total_value = 0
-        low_stock_count = 0
         
         for row, product in enumerate(products):
             # ID
@@ -562,8 +813,10 @@ class InventoryModule(QWidget):
             # Barcode
             self.products_table.setItem(row, 2, QTableWidgetItem(product.get('barcode', '')))
             
-            # Category
-            self.products_table.setItem(row, 3, QTableWidgetItem(product.get('category_name', '')))
+            # Category (the ID is kept for the category filter)
+            category_item = QTableWidgetItem(product.get('category_name', ''))
+            category_item.setData(Qt.UserRole, product['category_id'])
+            self.products_table.setItem(row, 3, category_item)
             
             # Price
             self.products_table.setItem(row, 4, QTableWidgetItem(f"{product['price']:.2f} DZD"))
@@ -578,7 +831,6 @@ class InventoryModule(QWidget):
                 stock_item.setForeground(Qt.red)
             elif product['quantity'] <= product.get('min_quantity', 5):
                 stock_item.setForeground(Qt.darkYellow)
-                low_stock_count += 1
             self.products_table.setItem(row, 6, stock_item)
             
             # Min Stock
@@ -623,7 +875,25 @@ class InventoryModule(QWidget):
             """)
             delete_button.clicked.connect(lambda checked, p=product: self.delete_product(p))
             
+            history_button = QPushButton("📜 History")
+            history_button.setToolTip("Stock History")
+            history_button.setStyleSheet("""
+                QPushButton {
+                    background-color: #6c757d;
+                    color: white;
+                    border: none;
+                    padding: 5px 10px;
+                    border-radius: 3px;
+                    font-size: 12px;
+                }
+                QPushButton:hover {
+                    background-color: #545b62;
+                }
+            """)
+            history_button.clicked.connect(lambda checked, p=product: self.show_stock_history(p))
+            
             actions_layout.addWidget(edit_button)
+            actions_layout.addWidget(history_button)
             actions_layout.addWidget(delete_button)
             actions_layout.addStretch()
             
@@ -635,6 +905,17 @@ class InventoryModule(QWidget):
         # Update summary
         self.total_products_label.setText(f"Total Products: {len(products)}")
         self.total_value_label.setText(f"Total Value: {total_value:.2f} DZD")
+        self.update_low_stock_count()
+        
+    def update_low_stock_count(self):
+        """Show how many products are at or below their minimum, from the stock alert engine"""
+        try:
+            # The catalog was just re-read, so re-sync the engine with changes made elsewhere
+            self.db_manager.stock_alerts.refresh()
+            low_stock_count = len(self.db_manager.stock_alerts.get_low_stock())
+        except Exception as e:
+            logger.error("Error loading low stock items: %s", e)
+            return
         self.low_stock_label.setText(f"Low Stock Items: {low_stock_count}")
         
     def filter_products(self):
@@ -642,6 +923,8 @@ class InventoryModule(QWidget):
         search_term = self.search_input.text().lower()
         category_id = self.category_filter.currentData()
         stock_status = self.stock_filter.currentText()
+        # The chosen category matches along with everything under it
+        categories = self.db_manager.category_registry.subtree(category_id) if category_id else None
         
         for row in range(self.products_table.rowCount()):
             show_row = True
@@ -654,9 +937,9 @@ class InventoryModule(QWidget):
                     show_row = False
             
             # Category filter
-            if category_id and show_row:
-                # You'd need to implement category filtering logic here
-                pass
+            if categories is not None and show_row:
+                if self.products_table.item(row, 3).data(Qt.UserRole) not in categories:
+                    show_row = False
             
             # Stock filter
             if stock_status != "All Items" and show_row:
@@ -674,7 +957,7 @@ class InventoryModule(QWidget):
             
     def add_product(self):
         """Add new product"""
-        dialog = ProductDialog(self.db_manager, parent=self)
+        dialog = ProductDialog(self.db_manager, parent=self, user=self.user)
         if dialog.exec() == QDialog.Accepted:
             self.load_products()
             QMessageBox.information(self, "Success", "Product added successfully!")
@@ -686,13 +969,26 @@ class InventoryModule(QWidget):
             self.load_category_filter()
             QMessageBox.information(self, "Success", "Category added successfully!")
             
+    def show_reorder_suggestions(self):
+        """Show the products due for reordering"""
+        ReorderDialog(self.db_manager, parent=self).exec()
+        
+    def show_demand_forecast(self):
+        """Show the demand forecasts"""
+        ForecastDialog(self.db_manager, parent=self).exec()
+        
     def edit_product(self, product):
         """Edit existing product"""
-        dialog = ProductDialog(self.db_manager, product, parent=self)
+        dialog = ProductDialog(self.db_manager, product, parent=self, user=self.user)
         if dialog.exec() == QDialog.Accepted:
             self.load_products()
             QMessageBox.information(self, "Success", "Product updated successfully!")
             
+    def show_stock_history(self, product):
+        """Show a product's stock movements"""
+        dialog = StockHistoryDialog(self.db_manager, product, parent=self)
+        dialog.exec()
+            
     def delete_product(self, product):
         """Delete product"""
         reply = QMessageBox.question(self, "Delete Product",
@@ -702,11 +998,7 @@ class InventoryModule(QWidget):
         
         if reply == QMessageBox.Yes:
             try:
-                conn = self.db_manager.get_connection()
-                cursor = conn.cursor()
-                cursor.execute("UPDATE products SET is_active = 0 WHERE id = ?", (product['id'],))
-                conn.commit()
-                conn.close()
+                self.db_manager.products.deactivate(product['id'])
                 
                 self.load_products()
                 QMessageBox.information(self, "Success", "Product deleted successfully!")
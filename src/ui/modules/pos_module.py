@@ -1,29 +1,41 @@
 """
-POS Module - Point of Sale interface - UPDATED (No Tax, Cash Only)
+POS Module - Point of Sale interface - UPDATED (No Tax)
 """
 
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                               QLineEdit, QPushButton, QTableWidget, QTableWidgetItem,
                               QFrame, QSpinBox, QDoubleSpinBox, QComboBox,
                               QMessageBox, QDialog, QDialogButtonBox, QTextEdit,
-                              QGridLayout, QGroupBox, QScrollArea)
+                              QGridLayout, QGroupBox, QScrollArea, QCheckBox,
+                              QAbstractItemView)
 from PySide6.QtCore import Qt, Signal, QTimer
 from PySide6.QtGui import QFont, QPixmap
 from datetime import datetime
+import logging
 import uuid
 
+from src.database.payments import PaymentError
+from src.database.remote_manager import OutcomeUnknown
+from src.database.returns import ReturnError
+from src.utils.card_terminal import CardTerminalError, create_card_terminal
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
 class PaymentDialog(QDialog):
-    """Payment processing dialog - CASH ONLY"""
+    """Payment processing dialog - cash, card or a split of both"""
     
-    def __init__(self, total_amount, parent=None):
+    def __init__(self, total_amount, card_terminal=None, parent=None):
         super().__init__(parent)
-        self.total_amount = total_amount
+        self.total_amount = round(total_amount, 2)
+        self.card_terminal = card_terminal
+        self.tenders = []
         self.setup_ui()
         
     def setup_ui(self):
         """Setup payment dialog UI"""
         self.setWindowTitle("Process Payment")
-        self.setFixedSize(400, 250)
+        self.setFixedSize(460, 420)
         
         layout = QVBoxLayout()
         
@@ -33,64 +45,331 @@ class PaymentDialog(QDialog):
         total_label.setAlignment(Qt.AlignCenter)
         total_label.setStyleSheet("color: #2c3e50; margin: 10px;")
         
-        # Cash payment details
-        cash_frame = QFrame()
-        cash_layout = QVBoxLayout(cash_frame)
-        
-        cash_received_label = QLabel("Cash Received:")
-        self.cash_received_input = QDoubleSpinBox()
-        self.cash_received_input.setRange(0, 99999)
-        self.cash_received_input.setValue(self.total_amount)
-        self.cash_received_input.setDecimals(2)
-        self.cash_received_input.setSuffix(" DZD")
-        self.cash_received_input.valueChanged.connect(self.calculate_change)
-        
+        # Tender entry
+        tender_frame = QFrame()
+        tender_layout = QGridLayout(tender_frame)
+        
+        self.method_combo = QComboBox()
+        self.method_combo.addItem("💵 Cash", "cash")
+        self.method_combo.addItem("💳 Card", "card")
+        self.method_combo.setEnabled(self.card_terminal is not None)
+        self.method_combo.currentIndexChanged.connect(self.reset_amount)
+        
+        self.amount_input = QDoubleSpinBox()
+        self.amount_input.setRange(0, 99999)
+        self.amount_input.setDecimals(2)
+        self.amount_input.setSuffix(" DZD")
+        self.amount_input.valueChanged.connect(self.calculate_change)
+        
+        self.add_tender_button = QPushButton("➕ Add Payment")
+        self.add_tender_button.clicked.connect(self.add_current_tender)
+        
+        tender_layout.addWidget(QLabel("Method:"), 0, 0)
+        tender_layout.addWidget(self.method_combo, 0, 1)
+        tender_layout.addWidget(QLabel("Amount Received:"), 1, 0)
+        tender_layout.addWidget(self.amount_input, 1, 1)
+        tender_layout.addWidget(self.add_tender_button, 1, 2)
+        
+        # Tenders taken so far
+        self.tenders_table = QTableWidget()
+        self.tenders_table.setColumnCount(3)
+        self.tenders_table.setHorizontalHeaderLabels(["Method", "Amount", "Reference"])
+        self.tenders_table.horizontalHeader().setStretchLastSection(True)
+        self.tenders_table.setMaximumHeight(110)
+        
+        self.remove_tender_button = QPushButton("🗑️ Remove Payment")
+        self.remove_tender_button.clicked.connect(self.remove_tender)
+        
+        self.remaining_label = QLabel("")
+        self.remaining_label.setFont(QFont("Arial", 12, QFont.Bold))
         self.change_label = QLabel("Change: 0.00 DZD")
         self.change_label.setFont(QFont("Arial", 12, QFont.Bold))
         
-        cash_layout.addWidget(cash_received_label)
-        cash_layout.addWidget(self.cash_received_input)
-        cash_layout.addWidget(self.change_label)
-        
         # Buttons
         button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
-        button_box.accepted.connect(self.accept)
+        button_box.accepted.connect(self.complete_payment)
         button_box.rejected.connect(self.reject)
         
         # Layout
         layout.addWidget(total_label)
-        layout.addWidget(cash_frame)
+        layout.addWidget(tender_frame)
+        layout.addWidget(self.tenders_table)
+        layout.addWidget(self.remove_tender_button)
+        layout.addWidget(self.remaining_label)
+        layout.addWidget(self.change_label)
         layout.addStretch()
         layout.addWidget(button_box)
         
         self.setLayout(layout)
+        self.reset_amount()
+        
+    def paid_amount(self):
+        """Total of the tenders taken so far"""
+        return round(sum(tender['amount'] for tender in self.tenders), 2)
+        
+    def remaining_amount(self):
+        """Amount still to be paid"""
+        return max(0.0, round(self.total_amount - self.paid_amount(), 2))
+        
+    def reset_amount(self):
+        """Default the amount to what is still due"""
+        self.amount_input.setValue(self.remaining_amount())
         self.calculate_change()
         
     def calculate_change(self):
         """Calculate change amount"""
-        cash_received = self.cash_received_input.value()
-        change = cash_received - self.total_amount
+        remaining = self.remaining_amount()
+        self.remaining_label.setText(f"Remaining: {remaining:.2f} DZD")
+        
+        # The amount being entered counts towards the change before it is added
+        pending = self.amount_input.value() if self.method_combo.currentData() == 'cash' else 0
+        change = max(0.0, self.paid_amount() + pending - self.total_amount)
         self.change_label.setText(f"Change: {change:.2f} DZD")
+        
+    def add_current_tender(self):
+        """Take the entered amount as a tender; returns False if it was not taken"""
+        method = self.method_combo.currentData()
+        amount = round(self.amount_input.value(), 2)
+        remaining = self.remaining_amount()
+        
+        if amount <= 0 or remaining <= 0:
+            return False
+        
+        reference = None
+        if method == 'card':
+            # Cards are charged for exactly what is due, never more
+            amount = min(amount, remaining)
+            try:
+                result = self.card_terminal.charge(amount, f"POS sale {self.total_amount:.2f} DZD")
+            except CardTerminalError as e:
+                QMessageBox.warning(self, "Card Terminal", f"Card terminal error: {str(e)}")
+                return False
+            if not result['approved']:
+                QMessageBox.warning(self, "Card Declined", result['message'])
+                return False
+            reference = result['reference']
+        
+        self.tenders.append({'method': method, 'amount': amount, 'reference': reference})
+        
+        row = self.tenders_table.rowCount()
+        self.tenders_table.insertRow(row)
+        self.tenders_table.setItem(row, 0, QTableWidgetItem(method.title()))
+        self.tenders_table.setItem(row, 1, QTableWidgetItem(f"{amount:.2f}"))
+        self.tenders_table.setItem(row, 2, QTableWidgetItem(reference or ""))
+        
+        self.method_combo.setCurrentIndex(0)
+        self.reset_amount()
+        return True
+        
+    def remove_tender(self):
+        """Remove the selected tender, voiding it on the terminal if it was a card"""
+        row = self.tenders_table.currentRow()
+        if row < 0:
+            return
+        
+        tender = self.tenders.pop(row)
+        if tender['method'] == 'card':
+            self.void_card(tender)
+        self.tenders_table.removeRow(row)
+        self.reset_amount()
+        
+    def void_card(self, tender):
+        """Cancel an approved card charge"""
+        try:
+            self.card_terminal.void(tender['reference'])
+        except CardTerminalError as e:
+            QMessageBox.warning(self, "Card Terminal",
+                              f"Could not void card payment {tender['reference']}: {str(e)}")
+        
+    def void_card_tenders(self):
+        """Cancel every card charge taken in this dialog"""
+        for tender in self.tenders:
+            if tender['method'] == 'card':
+                self.void_card(tender)
+        
+    def complete_payment(self):
+        """Accept once the tenders cover the total"""
+        # A single payment can be entered without pressing Add first
+        if self.remaining_amount() > 0:
+            self.add_current_tender()
+        
+        if self.remaining_amount() > 0:
+            QMessageBox.warning(self, "Payment Incomplete",
+                              f"{self.remaining_amount():.2f} DZD is still to be paid.")
+            return
+        
+        self.accept()
+        
+    def reject(self):
+        """Cancel the payment and void any card charges"""
+        self.void_card_tenders()
+        super().reject()
             
     def get_payment_info(self):
         """Get payment information"""
+        change = round(self.paid_amount() - self.total_amount, 2)
+        methods = {tender['method'] for tender in self.tenders}
         return {
-            'method': 'cash',
-            'cash_received': self.cash_received_input.value(),
-            'change': self.cash_received_input.value() - self.total_amount
+            'method': methods.pop() if len(methods) == 1 else 'mixed',
+            'tenders': list(self.tenders),
+            'cash_received': sum(tender['amount'] for tender in self.tenders if tender['method'] == 'cash'),
+            'change': change
         }
 
+class ReturnDialog(QDialog):
+    """Dialog for returning items from a previous sale"""
+    
+    def __init__(self, db_manager, user, parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.user = user
+        self.found = None
+        self.result_info = None
+        self.setup_ui()
+        
+    def setup_ui(self):
+        """Setup return dialog UI"""
+        self.setWindowTitle("Process Return")
+        self.resize(700, 500)
+        
+        layout = QVBoxLayout(self)
+        
+        # Sale lookup
+        lookup_layout = QHBoxLayout()
+        self.sale_number_input = QLineEdit()
+        self.sale_number_input.setPlaceholderText("Scan or enter the sale number from the receipt...")
+        self.find_button = QPushButton("🔍 Find Sale")
+        lookup_layout.addWidget(self.sale_number_input, 1)
+        lookup_layout.addWidget(self.find_button)
+        
+        self.sale_info_label = QLabel("")
+        self.sale_info_label.setStyleSheet("color: #2c3e50; padding: 5px;")
+        
+        # Sale lines with the quantity to return
+        self.items_table = QTableWidget()
+        self.items_table.setColumnCount(5)
+        self.items_table.setHorizontalHeaderLabels(["Product", "Price", "Sold", "Returned", "Return Qty"])
+        self.items_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.items_table.horizontalHeader().setStretchLastSection(True)
+        
+        # Reason and options
+        options_layout = QGridLayout()
+        self.reason_input = QLineEdit()
+        self.reason_input.setPlaceholderText("Reason for return (optional)")
+        self.restock_checkbox = QCheckBox("Return items to stock")
+        self.restock_checkbox.setChecked(True)
+        options_layout.addWidget(QLabel("Reason:"), 0, 0)
+        options_layout.addWidget(self.reason_input, 0, 1)
+        options_layout.addWidget(self.restock_checkbox, 1, 1)
+        
+        self.refund_label = QLabel("Refund: 0.00 DZD")
+        self.refund_label.setFont(QFont("Arial", 14, QFont.Bold))
+        self.refund_label.setStyleSheet("color: #dc3545; padding: 5px;")
+        
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        self.process_button = button_box.button(QDialogButtonBox.Ok)
+        self.process_button.setText("↩️ Process Return")
+        self.process_button.setEnabled(False)
+        button_box.accepted.connect(self.process_return)
+        button_box.rejected.connect(self.reject)
+        
+        layout.addLayout(lookup_layout)
+        layout.addWidget(self.sale_info_label)
+        layout.addWidget(self.items_table, 1)
+        layout.addLayout(options_layout)
+        layout.addWidget(self.refund_label)
+        layout.addWidget(button_box)
+        
+        self.sale_number_input.returnPressed.connect(self.find_sale)
+        self.find_button.clicked.connect(self.find_sale)
+        
+    def find_sale(self):
+        """Look up the sale and list its returnable lines"""
+        sale_number = self.sale_number_input.text().strip()
+        if not sale_number:
+            return
+        
+        self.found = self.db_manager.returns.find_sale(sale_number)
+        self.items_table.setRowCount(0)
+        
+        if self.found is None:
+            self.sale_info_label.setText(f"Sale '{sale_number}' was not found.")
+            self.update_refund()
+            return
+        
+        sale = self.found['sale']
+        self.sale_info_label.setText(
+            f"Sale {sale['sale_number']} — {sale['created_at'][:16]} — {sale['cashier_name'] or ''} — "
+            f"Total {sale['total_amount']:.2f} DZD ({sale['payment_status']})"
+        )
+        
+        self.quantity_spins = []
+        self.items_table.setRowCount(len(self.found['items']))
+        for row, item in enumerate(self.found['items']):
+            self.items_table.setItem(row, 0, QTableWidgetItem(item['product_name'] or f"Product #{item['product_id']}"))
+            self.items_table.setItem(row, 1, QTableWidgetItem(f"{item['unit_price']:.2f}"))
+            self.items_table.setItem(row, 2, QTableWidgetItem(str(item['quantity'])))
+            self.items_table.setItem(row, 3, QTableWidgetItem(str(item['returned_quantity'])))
+            
+            quantity_spin = QSpinBox()
+            quantity_spin.setRange(0, item['returnable_quantity'])
+            quantity_spin.setEnabled(item['returnable_quantity'] > 0)
+            quantity_spin.valueChanged.connect(self.update_refund)
+            self.items_table.setCellWidget(row, 4, quantity_spin)
+            self.quantity_spins.append(quantity_spin)
+        
+        self.update_refund()
+        
+    def selected_items(self):
+        """Get the lines and quantities selected for return"""
+        if not self.found:
+            return []
+        return [{'sale_item_id': item['id'], 'quantity': spin.value(), 'unit_price': item['unit_price']}
+                for item, spin in zip(self.found['items'], self.quantity_spins) if spin.value() > 0]
+        
+    def update_refund(self):
+        """Update the refund total"""
+        items = self.selected_items()
+        refund = sum(self.db_manager.returns.refund_for(self.found['sale'], item['unit_price'], item['quantity'])
+                     for item in items)
+        self.refund_label.setText(f"Refund: {refund:.2f} DZD")
+        self.process_button.setEnabled(bool(items))
+        
+    def process_return(self):
+        """Record the return"""
+        try:
+            self.result_info = self.db_manager.returns.create_return(
+                self.found['sale']['id'], self.selected_items(), self.user['id'],
+                self.reason_input.text().strip(), self.restock_checkbox.isChecked()
+            )
+        except ReturnError as e:
+            QMessageBox.warning(self, "Return Not Possible", str(e))
+            self.find_sale()
+            return
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to process return: {str(e)}")
+            return
+        
+        self.accept()
+
 class POSModule(QWidget):
     """Point of Sale module - UPDATED"""
     
+    QUICK_PRODUCT_COUNT = 8
+    
     def __init__(self, user, db_manager):
         super().__init__()
         self.user = user
         self.db_manager = db_manager
-        self.cart_items = []
+        self.journal = db_manager.checkout_journal
+        # A cart left unfinished by a crash is picked up where it stopped
+        self.cart_items = self.journal.take_recovered_cart()
         self.setup_ui()
         self.setup_connections()
         
+        if self.cart_items:
+            self.update_cart_display()
+        
     def setup_ui(self):
         """Setup POS interface"""
         main_layout = QHBoxLayout()
@@ -334,7 +613,23 @@ class POSModule(QWidget):
             }
         """)
         
+        self.return_button = QPushButton("↩️ Return")
+        self.return_button.setStyleSheet("""
+            QPushButton {
+                background-color: #fd7e14;
+                color: white;
+                border: none;
+                padding: 10px;
+                border-radius: 5px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #e8650e;
+            }
+        """)
+        
         buttons_layout.addWidget(self.checkout_button)
+        buttons_layout.addWidget(self.return_button)
         buttons_layout.addWidget(self.clear_cart_button)
         
         layout.addWidget(header)
@@ -351,19 +646,14 @@ class POSModule(QWidget):
         self.add_to_cart_button.clicked.connect(self.add_to_cart)
         self.checkout_button.clicked.connect(self.process_checkout)
         self.clear_cart_button.clicked.connect(self.clear_cart)
+        self.return_button.clicked.connect(self.process_return)
         
     def load_quick_products(self):
-        """Load quick access products"""
-        # Clear existing buttons
-        for i in reversed(range(self.quick_products_layout.count())):
-            self.quick_products_layout.itemAt(i).widget().setParent(None)
+        """Create the quick access buttons once and fill them with best sellers"""
+        self.quick_buttons = []
         
-        # Get recent products
-        products = self.db_manager.get_products()[:8]
-        
-        row, col = 0, 0
-        for product in products:
-            button = QPushButton(f"{product['name']}\n{product['price']:.2f} DZD")
+        for index in range(self.QUICK_PRODUCT_COUNT):
+            button = QPushButton()
             button.setFixedSize(120, 80)
             button.setStyleSheet("""
                 QPushButton {
@@ -378,13 +668,36 @@ class POSModule(QWidget):
                     border-color: #007bff;
                 }
             """)
-            button.clicked.connect(lambda checked, p=product: self.quick_select_product(p))
+            button.setVisible(False)
+            button.clicked.connect(lambda checked, i=index: self.quick_button_clicked(i))
             
-            self.quick_products_layout.addWidget(button, row, col)
-            col += 1
-            if col >= 2:
-                col = 0
-                row += 1
+            self.quick_products_layout.addWidget(button, index // 2, index % 2)
+            self.quick_buttons.append(button)
+        
+        self.quick_products = []
+        self.refresh_quick_products()
+        
+        # Best sellers change with the time of day, so re-rank periodically
+        self.quick_products_timer = QTimer(self)
+        self.quick_products_timer.timeout.connect(self.refresh_quick_products)
+        self.quick_products_timer.start(15 * 60 * 1000)
+        
+    def refresh_quick_products(self):
+        """Update quick access buttons in place with the current best sellers"""
+        self.quick_products = self.db_manager.quick_products.get_quick_products(self.QUICK_PRODUCT_COUNT)
+        
+        for index, button in enumerate(self.quick_buttons):
+            if index < len(self.quick_products):
+                product = self.quick_products[index]
+                button.setText(f"{product['name']}\n{product['price']:.2f} DZD")
+                button.setVisible(True)
+            else:
+                button.setVisible(False)
+                
+    def quick_button_clicked(self, index):
+        """Select the product currently shown on a quick access button"""
+        if index < len(self.quick_products):
+            self.quick_select_product(self.quick_products[index])
                 
     def search_product(self):
         """Search for product by barcode"""
@@ -392,11 +705,14 @@ class POSModule(QWidget):
         if not barcode:
             return
             
-        product = self.db_manager.get_product_by_barcode(barcode)
-        
-        if product:
-            self.display_product(product)
-        else:
+        # Served from the till's catalog copy, refreshed from the change feed
+        with metrics.timer('scan_seconds', "Time from a scanned barcode to the product on screen").time():
+            product = self.db_manager.catalog.get_product_by_barcode(barcode)
+            if product:
+                self.display_product(product)
+        
+        if not product:
+            metrics.counter('scan_misses_total', "Scanned barcodes with no matching product").inc()
             QMessageBox.warning(self, "Product Not Found", 
                               f"No product found with barcode: {barcode}")
             self.clear_product_display()
@@ -451,6 +767,7 @@ class POSModule(QWidget):
                 if new_quantity <= product['quantity']:
                     self.cart_items[i]['quantity'] = new_quantity
                     self.cart_items[i]['total'] = new_quantity * product['price']
+                    self.journal.update_item(i, new_quantity, self.cart_items[i]['total'])
                 else:
                     QMessageBox.warning(self, "Insufficient Stock", 
                                       f"Only {product['quantity']} units available")
@@ -466,6 +783,7 @@ class POSModule(QWidget):
                 'total': quantity * product['price']
             }
             self.cart_items.append(cart_item)
+            self.journal.add_item(cart_item)
         
         self.update_cart_display()
         self.clear_product_display()
@@ -513,6 +831,7 @@ class POSModule(QWidget):
         """Remove item from cart"""
         if 0 <= row < len(self.cart_items):
             self.cart_items.pop(row)
+            self.journal.remove_item(row)
             self.update_cart_display()
             
     def update_totals(self):
@@ -533,6 +852,7 @@ class POSModule(QWidget):
             
             if reply == QMessageBox.Yes:
                 self.cart_items.clear()
+                self.journal.clear_cart()
                 self.update_cart_display()
         
     def process_checkout(self):
@@ -544,7 +864,7 @@ class POSModule(QWidget):
         total = sum(item['total'] for item in self.cart_items)
         
         # Show payment dialog
-        payment_dialog = PaymentDialog(total, self)
+        payment_dialog = PaymentDialog(total, self.get_card_terminal(), self)
         
         if payment_dialog.exec() == QDialog.Accepted:
             payment_info = payment_dialog.get_payment_info()
@@ -559,7 +879,8 @@ class POSModule(QWidget):
                 'tax_amount': 0,
                 'discount_amount': 0,
                 'total_amount': total,
-                'payment_method': 'cash'
+                'payment_method': payment_info['method'],
+                'payments': payment_info['tenders']
             }
             
             sale_items = []
@@ -571,31 +892,92 @@ class POSModule(QWidget):
                     'total_price': item['total']
                 })
             
+            # Paid from here on: journal the sale so a crash cannot lose it
+            self.journal.begin_sale(sale_data, sale_items)
+            
             try:
                 # Save sale to database
                 sale_id = self.db_manager.create_sale(sale_data, sale_items)
-                
-                # Log activity
-                self.db_manager.log_activity(self.user['id'], "sale_completed", 
-                                           f"Sale {sale_number} completed for {total:.2f} DZD")
-                
-                # Show success message
-                QMessageBox.information(self, "Sale Completed", 
-                                      f"Sale completed successfully!\n"
-                                      f"Sale Number: {sale_number}\n"
-                                      f"Total: {total:.2f} DZD\n"
-                                      f"Payment: Cash")
-                
-                # Clear cart
+            except PaymentError as e:
+                self.journal.end_sale(sale_number, committed=False)
+                payment_dialog.void_card_tenders()
+                QMessageBox.warning(self, "Payment Not Settled", str(e))
+                return
+            except OutcomeUnknown as e:
+                # The server may still record it: keep the charge and leave the sale pending in the
+                # journal, which recovery settles against the server at the next start
+                logger.error("Outcome of sale %s unknown: %s", sale_number, e)
                 self.cart_items.clear()
+                self.journal.clear_cart()
                 self.update_cart_display()
-                
-                # Print receipt (optional)
-                self.print_receipt(sale_data, sale_items, payment_info)
-                
+                QMessageBox.warning(self, "Sale Not Confirmed",
+                                    f"The POS server did not confirm sale {sale_number} "
+                                    f"({total:.2f} DZD): {e}\n\n"
+                                    "Do not charge the customer again. The sale is kept in the checkout "
+                                    "journal and will be checked against the server at the next start.")
+                return
             except Exception as e:
+                # The sale was not recorded, so the card must not stay charged
+                self.journal.end_sale(sale_number, committed=False)
+                payment_dialog.void_card_tenders()
                 QMessageBox.critical(self, "Error", f"Failed to process sale: {str(e)}")
+                return
+            
+            self.journal.end_sale(sale_number)
+            
+            # Log activity
+            self.db_manager.log_activity(self.user['id'], "sale_completed", 
+                                       f"Sale {sale_number} completed for {total:.2f} DZD")
+            
+            # Clear cart
+            self.cart_items.clear()
+            self.journal.clear_cart()
+            self.update_cart_display()
+            self.refresh_quick_products()
+            
+            # Show success message
+            QMessageBox.information(self, "Sale Completed", 
+                                  f"Sale completed successfully!\n"
+                                  f"Sale Number: {sale_number}\n"
+                                  f"Total: {total:.2f} DZD\n"
+                                  f"Payment: {payment_info['method'].title()}\n"
+                                  f"Change: {payment_info['change']:.2f} DZD")
+            
+            # Print receipt (optional)
+            self.print_receipt(sale_data, sale_items, payment_info)
                 
+    def get_card_terminal(self):
+        """Get the configured card terminal, or None if none is configured or it cannot be set up"""
+        if getattr(self, 'card_terminal', None) is None:
+            try:
+                self.card_terminal = create_card_terminal(self.db_manager.get_setting('card_terminal'))
+            except CardTerminalError as e:
+                logger.error("Error setting up card terminal: %s", e)
+                return None
+        return self.card_terminal
+        
+    def process_return(self):
+        """Return items from a previous sale"""
+        dialog = ReturnDialog(self.db_manager, self.user, self)
+        
+        if dialog.exec() == QDialog.Accepted and dialog.result_info:
+            result = dialog.result_info
+            
+            self.db_manager.log_activity(self.user['id'], "return_completed",
+                                       f"Return {result['return_number']} for sale {result['sale_number']}: "
+                                       f"{result['total_amount']:.2f} DZD refunded")
+            
+            QMessageBox.information(self, "Return Completed",
+                                  f"Return completed successfully!\n"
+                                  f"Return Number: {result['return_number']}\n"
+                                  f"Refund: {result['total_amount']:.2f} DZD")
+            
+            # Refresh the displayed product in case its stock changed
+            if getattr(self, 'current_product', None):
+                product = self.db_manager.catalog.get_product_by_id(self.current_product['id'])
+                if product:
+                    self.display_product(product)
+                    
     def print_receipt(self, sale_data, sale_items, payment_info):
         """Print or save receipt with enhanced design"""
         from datetime import datetime
@@ -686,7 +1068,7 @@ class POSModule(QWidget):
             ("Receipt #:", sale_data['sale_number']),
             ("Date:", datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
             ("Cashier:", self.user['full_name']),
-            ("Payment:", "Cash")
+            ("Payment:", payment_info['method'].title())
         ]
         
         for i, (label, value) in enumerate(sale_details):
@@ -798,8 +1180,20 @@ class POSModule(QWidget):
         payment_details_layout.addStretch()
         payment_details_layout.addWidget(change_label)
         
+        # Card and split payments list each tender
+        tender_labels = []
+        if payment_info.get('method', 'cash') != 'cash':
+            for tender in payment_info['tenders']:
+                reference = f" ({tender['reference']})" if tender['reference'] else ""
+                tender_label = QLabel(f"{tender['method'].title()}: {tender['amount']:.2f} DZD{reference}")
+                tender_label.setFont(QFont("Arial", 11))
+                tender_label.setStyleSheet("color: #2c3e50;")
+                tender_labels.append(tender_label)
+        
         totals_layout.addWidget(total_label)
         totals_layout.addLayout(payment_details_layout)
+        for tender_label in tender_labels:
+            totals_layout.addWidget(tender_label)
         
         # Footer Section
         footer_frame = QFrame()
@@ -0,0 +1,700 @@
+"""
+Purchasing Module - Suppliers, purchase orders and goods receipts
+"""
+
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
+                              QLineEdit, QPushButton, QTableWidget, QTableWidgetItem,
+                              QFrame, QComboBox, QSpinBox, QDoubleSpinBox, QCheckBox,
+                              QMessageBox, QDialog, QDialogButtonBox, QTextEdit,
+                              QFormLayout, QTabWidget, QInputDialog,
+                              QHeaderView, QAbstractItemView)
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QFont
+import logging
+
+logger = logging.getLogger(__name__)
+
+TABLE_STYLE = """
+    QTableWidget {
+        background-color: white;
+        border: 1px solid #dee2e6;
+        border-radius: 5px;
+        gridline-color: #dee2e6;
+    }
+    QHeaderView::section {
+        background-color: #e9ecef;
+        padding: 4px;
+        border: none;
+        font-weight: bold;
+    }
+"""
+
+def button_style(color: str, hover: str) -> str:
+    return f"""
+        QPushButton {{
+            background-color: {color};
+            color: white;
+            border: none;
+            padding: 10px 20px;
+            border-radius: 5px;
+            font-weight: bold;
+        }}
+        QPushButton:hover {{
+            background-color: {hover};
+        }}
+    """
+
+def find_product(db_manager, parent, text: str):
+    """Look a scanned barcode up in the catalog, falling back to a name search
+
+    Returns the product dict, or None if nothing (or nothing chosen) matched.
+    """
+    text = text.strip()
+    if not text:
+        return None
+    product = db_manager.catalog.get_product_by_barcode(text)
+    if product:
+        return product
+
+    matches = db_manager.get_products_page(filters={'search': text}, limit=20)
+    if not matches:
+        QMessageBox.warning(parent, "Not Found", f"No product matches '{text}'")
+        return None
+    if len(matches) == 1:
+        return db_manager.catalog.get_product_by_id(matches[0]['id']) or matches[0]
+
+    labels = [f"{match['name']} ({match.get('barcode') or 'no barcode'})" for match in matches]
+    choice, ok = QInputDialog.getItem(parent, "Select Product", "Several products match:", labels, 0, False)
+    if not ok:
+        return None
+    match = matches[labels.index(choice)]
+    return db_manager.catalog.get_product_by_id(match['id']) or match
+
+class SupplierDialog(QDialog):
+    """Dialog for adding/editing suppliers"""
+
+    def __init__(self, db_manager, supplier=None, parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.supplier = supplier
+        self.setup_ui()
+
+        if supplier:
+            self.name_edit.setText(supplier['name'])
+            self.contact_edit.setText(supplier.get('contact_name') or "")
+            self.phone_edit.setText(supplier.get('phone') or "")
+            self.email_edit.setText(supplier.get('email') or "")
+            self.address_edit.setPlainText(supplier.get('address') or "")
+            self.active_checkbox.setChecked(bool(supplier.get('is_active', 1)))
+
+    def setup_ui(self):
+        """Setup supplier dialog UI"""
+        self.setWindowTitle("Edit Supplier" if self.supplier else "Add New Supplier")
+        self.setModal(True)
+        self.resize(420, 320)
+
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+
+        self.name_edit = QLineEdit()
+        self.contact_edit = QLineEdit()
+        self.phone_edit = QLineEdit()
+        self.email_edit = QLineEdit()
+        self.address_edit = QTextEdit()
+        self.address_edit.setMaximumHeight(70)
+        self.active_checkbox = QCheckBox("Active")
+        self.active_checkbox.setChecked(True)
+
+        form.addRow("Name *:", self.name_edit)
+        form.addRow("Contact:", self.contact_edit)
+        form.addRow("Phone:", self.phone_edit)
+        form.addRow("Email:", self.email_edit)
+        form.addRow("Address:", self.address_edit)
+        form.addRow("", self.active_checkbox)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Cancel)
+        button_box.accepted.connect(self.save_supplier)
+        button_box.rejected.connect(self.reject)
+
+        layout.addLayout(form)
+        layout.addWidget(button_box)
+
+    def save_supplier(self):
+        """Save supplier data"""
+        name = self.name_edit.text().strip()
+        if not name:
+            QMessageBox.warning(self, "Validation Error", "Supplier name is required")
+            return
+
+        supplier_data = {
+            'name': name,
+            'contact_name': self.contact_edit.text().strip(),
+            'phone': self.phone_edit.text().strip(),
+            'email': self.email_edit.text().strip(),
+            'address': self.address_edit.toPlainText().strip(),
+            'is_active': 1 if self.active_checkbox.isChecked() else 0,
+        }
+        try:
+            if self.supplier:
+                self.db_manager.suppliers.update(self.supplier['id'], supplier_data)
+            else:
+                self.db_manager.suppliers.create(supplier_data)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to save supplier: {str(e)}")
+            return
+        self.accept()
+
+class PurchaseOrderDialog(QDialog):
+    """Builds a purchase order by scanning or searching products"""
+
+    def __init__(self, user, db_manager, parent=None):
+        super().__init__(parent)
+        self.user = user
+        self.db_manager = db_manager
+        self.lines = []
+        self.setup_ui()
+        self.load_suppliers()
+
+    def setup_ui(self):
+        """Setup purchase order dialog UI"""
+        self.setWindowTitle("New Purchase Order")
+        self.setModal(True)
+        self.resize(800, 500)
+
+        layout = QVBoxLayout(self)
+
+        top_layout = QHBoxLayout()
+        self.supplier_combo = QComboBox()
+        self.supplier_combo.setMinimumWidth(220)
+        self.product_input = QLineEdit()
+        self.product_input.setPlaceholderText("Scan barcode or type a product name and press Enter")
+        self.suggestions_button = QPushButton("🔔 Add Reorder Suggestions")
+        top_layout.addWidget(QLabel("Supplier:"))
+        top_layout.addWidget(self.supplier_combo)
+        top_layout.addWidget(self.product_input, 1)
+        top_layout.addWidget(self.suggestions_button)
+
+        self.lines_table = QTableWidget()
+        self.lines_table.setColumnCount(5)
+        self.lines_table.setHorizontalHeaderLabels(["Product", "Barcode", "Quantity", "Unit Cost", "Line Total"])
+        self.lines_table.setStyleSheet(TABLE_STYLE)
+        self.lines_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.lines_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.lines_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+
+        self.notes_edit = QLineEdit()
+        self.notes_edit.setPlaceholderText("Notes")
+
+        bottom_layout = QHBoxLayout()
+        self.remove_button = QPushButton("Remove Line")
+        self.total_label = QLabel()
+        self.total_label.setFont(QFont("Arial", 11, QFont.Bold))
+        button_box = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Cancel)
+        button_box.button(QDialogButtonBox.Save).setText("Create Order")
+        button_box.accepted.connect(self.save_order)
+        button_box.rejected.connect(self.reject)
+        bottom_layout.addWidget(self.remove_button)
+        bottom_layout.addStretch()
+        bottom_layout.addWidget(self.total_label)
+        bottom_layout.addWidget(button_box)
+
+        layout.addLayout(top_layout)
+        layout.addWidget(self.lines_table)
+        layout.addWidget(self.notes_edit)
+        layout.addLayout(bottom_layout)
+
+        self.product_input.returnPressed.connect(self.add_from_input)
+        self.suggestions_button.clicked.connect(self.add_suggestions)
+        self.remove_button.clicked.connect(self.remove_line)
+        self.update_total()
+
+    def load_suppliers(self):
+        """Load active suppliers into the combo"""
+        try:
+            suppliers = self.db_manager.suppliers.list()
+        except Exception as e:
+            logger.error("Error loading suppliers: %s", e)
+            suppliers = []
+        for supplier in suppliers:
+            self.supplier_combo.addItem(supplier['name'], supplier['id'])
+
+    def add_from_input(self):
+        """Add the scanned or searched product, or one more of it if already listed"""
+        product = find_product(self.db_manager, self, self.product_input.text())
+        self.product_input.clear()
+        if product:
+            self.add_line(product, 1)
+
+    def add_suggestions(self):
+        """Add every product due for reordering with its suggested quantity"""
+        try:
+            suggestions = self.db_manager.stock_alerts.suggestions()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to compute reorder suggestions: {str(e)}")
+            return
+        for suggestion in suggestions:
+            product = self.db_manager.catalog.get_product_by_id(suggestion['product_id'])
+            if product:
+                self.add_line(product, suggestion['suggested_quantity'])
+
+    def add_line(self, product, quantity: int):
+        """Add a product line or raise the quantity of its existing line"""
+        for row, line in enumerate(self.lines):
+            if line['product_id'] == product['id']:
+                spin = self.lines_table.cellWidget(row, 2)
+                spin.setValue(spin.value() + quantity)
+                return
+
+        row = len(self.lines)
+        self.lines.append({'product_id': product['id']})
+        self.lines_table.setRowCount(row + 1)
+        self.lines_table.setItem(row, 0, QTableWidgetItem(product['name']))
+        self.lines_table.setItem(row, 1, QTableWidgetItem(product.get('barcode') or ""))
+
+        quantity_spin = QSpinBox()
+        quantity_spin.setRange(1, 999999)
+        quantity_spin.setValue(quantity)
+        cost_spin = QDoubleSpinBox()
+        cost_spin.setRange(0, 999999.99)
+        cost_spin.setDecimals(2)
+        cost_spin.setValue(product.get('cost_price') or 0)
+        quantity_spin.valueChanged.connect(self.update_total)
+        cost_spin.valueChanged.connect(self.update_total)
+        self.lines_table.setCellWidget(row, 2, quantity_spin)
+        self.lines_table.setCellWidget(row, 3, cost_spin)
+        self.lines_table.setItem(row, 4, QTableWidgetItem())
+        self.update_total()
+
+    def remove_line(self):
+        """Remove the selected line"""
+        row = self.lines_table.currentRow()
+        if row < 0:
+            return
+        self.lines_table.removeRow(row)
+        del self.lines[row]
+        self.update_total()
+
+    def items(self):
+        """The order lines as the purchasing service expects them"""
+        return [{'product_id': line['product_id'],
+                 'quantity': self.lines_table.cellWidget(row, 2).value(),
+                 'unit_cost': self.lines_table.cellWidget(row, 3).value()}
+                for row, line in enumerate(self.lines)]
+
+    def update_total(self):
+        """Refresh line totals and the order total"""
+        total = 0.0
+        for row, item in enumerate(self.items()):
+            line_total = item['quantity'] * item['unit_cost']
+            self.lines_table.item(row, 4).setText(f"${line_total:.2f}")
+            total += line_total
+        self.total_label.setText(f"{len(self.lines)} line(s) - Total: ${total:.2f}")
+
+    def save_order(self):
+        """Create the purchase order"""
+        supplier_id = self.supplier_combo.currentData()
+        if supplier_id is None:
+            QMessageBox.warning(self, "Validation Error", "Add a supplier first")
+            return
+        if not self.lines:
+            QMessageBox.warning(self, "Validation Error", "Add at least one product")
+            return
+
+        try:
+            result = self.db_manager.purchasing.create_purchase_order(
+                supplier_id, self.items(), self.user['id'], self.notes_edit.text().strip())
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to create purchase order: {str(e)}")
+            return
+
+        QMessageBox.information(self, "Purchase Order Created",
+                                f"{result['po_number']}: {result['lines']} line(s), ${result['total_cost']:.2f}")
+        self.accept()
+
+class ReceiveDialog(QDialog):
+    """Receives a delivery against a purchase order, or without one, by scanning items"""
+
+    def __init__(self, user, db_manager, purchase_order_id=None, parent=None):
+        super().__init__(parent)
+        self.user = user
+        self.db_manager = db_manager
+        self.purchase_order_id = purchase_order_id
+        self.lines = []
+        self.setup_ui()
+        if purchase_order_id is not None:
+            self.load_order()
+        else:
+            self.load_suppliers()
+
+    def setup_ui(self):
+        """Setup receive dialog UI"""
+        self.setWindowTitle("Receive Delivery")
+        self.setModal(True)
+        self.resize(850, 520)
+
+        layout = QVBoxLayout(self)
+
+        self.title_label = QLabel("Delivery without a purchase order")
+        self.title_label.setFont(QFont("Arial", 12, QFont.Bold))
+
+        top_layout = QHBoxLayout()
+        self.supplier_combo = QComboBox()
+        self.supplier_combo.setMinimumWidth(220)
+        self.scan_input = QLineEdit()
+        self.scan_input.setPlaceholderText("Scan each item as it is unpacked, or type a product name")
+        self.receive_all_button = QPushButton("Receive All Outstanding")
+        top_layout.addWidget(QLabel("Supplier:"))
+        top_layout.addWidget(self.supplier_combo)
+        top_layout.addWidget(self.scan_input, 1)
+        top_layout.addWidget(self.receive_all_button)
+
+        self.lines_table = QTableWidget()
+        self.lines_table.setColumnCount(5)
+        self.lines_table.setHorizontalHeaderLabels(["Product", "Barcode", "Outstanding", "Received", "Unit Cost"])
+        self.lines_table.setStyleSheet(TABLE_STYLE)
+        self.lines_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.lines_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.lines_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+
+        self.note_edit = QLineEdit()
+        self.note_edit.setPlaceholderText("Delivery note / invoice number")
+        self.update_cost_checkbox = QCheckBox("Update product cost prices")
+        self.update_cost_checkbox.setChecked(True)
+
+        bottom_layout = QHBoxLayout()
+        self.summary_label = QLabel()
+        button_box = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Cancel)
+        button_box.button(QDialogButtonBox.Save).setText("Post Receipt")
+        button_box.accepted.connect(self.post_receipt)
+        button_box.rejected.connect(self.reject)
+        bottom_layout.addWidget(self.update_cost_checkbox)
+        bottom_layout.addStretch()
+        bottom_layout.addWidget(self.summary_label)
+        bottom_layout.addWidget(button_box)
+
+        layout.addWidget(self.title_label)
+        layout.addLayout(top_layout)
+        layout.addWidget(self.lines_table)
+        layout.addWidget(self.note_edit)
+        layout.addLayout(bottom_layout)
+
+        self.scan_input.returnPressed.connect(self.scan_item)
+        self.receive_all_button.clicked.connect(self.receive_all)
+        self.receive_all_button.setVisible(self.purchase_order_id is not None)
+        self.update_summary()
+
+    def load_suppliers(self):
+        """Load active suppliers, with a blank entry for deliveries from no particular supplier"""
+        self.supplier_combo.addItem("-", None)
+        try:
+            suppliers = self.db_manager.suppliers.list()
+        except Exception as e:
+            logger.error("Error loading suppliers: %s", e)
+            suppliers = []
+        for supplier in suppliers:
+            self.supplier_combo.addItem(supplier['name'], supplier['id'])
+
+    def load_order(self):
+        """Start from the order's outstanding lines with nothing received yet"""
+        try:
+            purchase_order = self.db_manager.purchasing.get_purchase_order(self.purchase_order_id)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to load purchase order: {str(e)}")
+            return
+        order = purchase_order['order']
+        self.title_label.setText(f"Receiving {order['po_number']}")
+        self.supplier_combo.addItem(order['supplier_name'] or "-", order['supplier_id'])
+        self.supplier_combo.setEnabled(False)
+        for item in purchase_order['items']:
+            if item['remaining_quantity'] > 0:
+                self.add_line({'id': item['product_id'], 'name': item['product_name'],
+                               'barcode': item['barcode'], 'cost_price': item['unit_cost']},
+                              0, item['remaining_quantity'], item['id'])
+
+    def add_line(self, product, received: int, outstanding=None, order_item_id=None):
+        """Add a line for a product"""
+        row = len(self.lines)
+        self.lines.append({'product_id': product['id'], 'outstanding': outstanding,
+                           'purchase_order_item_id': order_item_id})
+        self.lines_table.setRowCount(row + 1)
+        self.lines_table.setItem(row, 0, QTableWidgetItem(product['name']))
+        self.lines_table.setItem(row, 1, QTableWidgetItem(product.get('barcode') or ""))
+        self.lines_table.setItem(row, 2, QTableWidgetItem("-" if outstanding is None else str(outstanding)))
+
+        received_spin = QSpinBox()
+        received_spin.setRange(0, 999999)
+        received_spin.setValue(received)
+        received_spin.valueChanged.connect(self.update_summary)
+        cost_spin = QDoubleSpinBox()
+        cost_spin.setRange(0, 999999.99)
+        cost_spin.setDecimals(2)
+        cost_spin.setValue(product.get('cost_price') or 0)
+        self.lines_table.setCellWidget(row, 3, received_spin)
+        self.lines_table.setCellWidget(row, 4, cost_spin)
+        self.update_summary()
+
+    def scan_item(self):
+        """Count one more of the scanned product, adding a line if it was not ordered"""
+        product = find_product(self.db_manager, self, self.scan_input.text())
+        self.scan_input.clear()
+        if not product:
+            return
+
+        for row, line in enumerate(self.lines):
+            if line['product_id'] == product['id']:
+                spin = self.lines_table.cellWidget(row, 3)
+                spin.setValue(spin.value() + 1)
+                if line['outstanding'] is not None and spin.value() > line['outstanding']:
+                    self.lines_table.item(row, 0).setForeground(Qt.red)
+                self.lines_table.selectRow(row)
+                return
+        self.add_line(product, 1)
+        self.lines_table.selectRow(len(self.lines) - 1)
+
+    def receive_all(self):
+        """Fill every order line with its outstanding quantity"""
+        for row, line in enumerate(self.lines):
+            if line['outstanding'] is not None:
+                self.lines_table.cellWidget(row, 3).setValue(line['outstanding'])
+
+    def items(self):
+        """The received lines as the purchasing service expects them"""
+        items = []
+        for row, line in enumerate(self.lines):
+            quantity = self.lines_table.cellWidget(row, 3).value()
+            if quantity > 0:
+                item = {'product_id': line['product_id'], 'quantity': quantity,
+                        'unit_cost': self.lines_table.cellWidget(row, 4).value()}
+                if line['purchase_order_item_id'] is not None:
+                    item['purchase_order_item_id'] = line['purchase_order_item_id']
+                items.append(item)
+        return items
+
+    def update_summary(self):
+        """Show how many units have been counted"""
+        units = sum(self.lines_table.cellWidget(row, 3).value() for row in range(len(self.lines)))
+        self.summary_label.setText(f"{units} unit(s) counted")
+
+    def post_receipt(self):
+        """Post the receipt in one transaction"""
+        items = self.items()
+        if not items:
+            QMessageBox.warning(self, "Validation Error", "Nothing has been received")
+            return
+
+        try:
+            result = self.db_manager.purchasing.receive(
+                items, self.user['id'], self.purchase_order_id,
+                supplier_id=self.supplier_combo.currentData(),
+                note=self.note_edit.text().strip(),
+                update_cost=self.update_cost_checkbox.isChecked())
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to post receipt: {str(e)}")
+            return
+
+        QMessageBox.information(self, "Receipt Posted",
+                                f"{result['receipt_number']}: {result['units']} unit(s) on "
+                                f"{result['lines']} line(s), ${result['total_cost']:.2f}")
+        self.accept()
+
+class PurchasingModule(QWidget):
+    """Purchasing module widget"""
+
+    def __init__(self, user, db_manager):
+        super().__init__()
+        self.user = user
+        self.db_manager = db_manager
+        self.setup_ui()
+        self.setup_connections()
+        self.refresh()
+
+    def setup_ui(self):
+        """Setup purchasing interface"""
+        layout = QVBoxLayout()
+        layout.setContentsMargins(10, 10, 10, 10)
+
+        # Header
+        header_frame = QFrame()
+        header_layout = QHBoxLayout(header_frame)
+
+        title_label = QLabel("🚚 Purchasing")
+        title_label.setFont(QFont("Arial", 18, QFont.Bold))
+        title_label.setStyleSheet("color: #2c3e50;")
+
+        self.new_order_button = QPushButton("➕ New Order")
+        self.new_order_button.setStyleSheet(button_style("#28a745", "#218838"))
+        self.receive_button = QPushButton("📦 Receive Delivery")
+        self.receive_button.setStyleSheet(button_style("#007bff", "#0056b3"))
+        self.add_supplier_button = QPushButton("🏢 Add Supplier")
+        self.add_supplier_button.setStyleSheet(button_style("#17a2b8", "#138496"))
+
+        header_layout.addWidget(title_label)
+        header_layout.addStretch()
+        header_layout.addWidget(self.add_supplier_button)
+        header_layout.addWidget(self.new_order_button)
+        header_layout.addWidget(self.receive_button)
+
+        self.tabs = QTabWidget()
+
+        # Purchase orders
+        orders_tab = QWidget()
+        orders_layout = QVBoxLayout(orders_tab)
+        filter_layout = QHBoxLayout()
+        self.status_combo = QComboBox()
+        self.status_combo.addItem("All", None)
+        for status in ('open', 'partially_received', 'received', 'cancelled'):
+            self.status_combo.addItem(status.replace('_', ' ').title(), status)
+        filter_layout.addWidget(QLabel("Status:"))
+        filter_layout.addWidget(self.status_combo)
+        filter_layout.addStretch()
+
+        self.orders_table = QTableWidget()
+        self.orders_table.setColumnCount(9)
+        self.orders_table.setHorizontalHeaderLabels([
+            "PO Number", "Supplier", "Status", "Lines", "Ordered", "Received", "Total", "Created", "Actions"
+        ])
+        self.orders_table.setStyleSheet(TABLE_STYLE)
+        self.orders_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.orders_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.orders_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        orders_layout.addLayout(filter_layout)
+        orders_layout.addWidget(self.orders_table)
+
+        # Goods receipts
+        self.receipts_table = QTableWidget()
+        self.receipts_table.setColumnCount(8)
+        self.receipts_table.setHorizontalHeaderLabels([
+            "Receipt", "PO Number", "Supplier", "Lines", "Units", "Total Cost", "Received By", "Date"
+        ])
+        self.receipts_table.setStyleSheet(TABLE_STYLE)
+        self.receipts_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.receipts_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.receipts_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+
+        # Suppliers
+        self.suppliers_table = QTableWidget()
+        self.suppliers_table.setColumnCount(6)
+        self.suppliers_table.setHorizontalHeaderLabels(["Name", "Contact", "Phone", "Email", "Status", "Actions"])
+        self.suppliers_table.setStyleSheet(TABLE_STYLE)
+        self.suppliers_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.suppliers_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.suppliers_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+
+        self.tabs.addTab(orders_tab, "Purchase Orders")
+        self.tabs.addTab(self.receipts_table, "Receipts")
+        self.tabs.addTab(self.suppliers_table, "Suppliers")
+
+        layout.addWidget(header_frame)
+        layout.addWidget(self.tabs)
+
+        self.setLayout(layout)
+
+    def setup_connections(self):
+        """Setup signal connections"""
+        self.new_order_button.clicked.connect(self.new_order)
+        self.receive_button.clicked.connect(lambda: self.receive_delivery())
+        self.add_supplier_button.clicked.connect(lambda: self.edit_supplier())
+        self.status_combo.currentIndexChanged.connect(self.load_orders)
+
+    def refresh(self):
+        """Reload orders, receipts and suppliers"""
+        self.load_orders()
+        self.load_receipts()
+        self.load_suppliers()
+
+    def load_orders(self):
+        """Load purchase orders for the selected status"""
+        try:
+            orders = self.db_manager.purchasing.get_purchase_orders(self.status_combo.currentData())
+        except Exception as e:
+            logger.error("Error loading purchase orders: %s", e)
+            return
+
+        self.orders_table.setRowCount(len(orders))
+        for row, order in enumerate(orders):
+            values = (order['po_number'], order['supplier_name'] or "-",
+                      order['status'].replace('_', ' ').title(), str(order['lines']),
+                      str(order['units_ordered']), str(order['units_received']),
+                      f"${order['total_cost']:.2f}", order['created_at'])
+            for column, value in enumerate(values):
+                self.orders_table.setItem(row, column, QTableWidgetItem(value))
+
+            actions_widget = QWidget()
+            actions_layout = QHBoxLayout(actions_widget)
+            actions_layout.setContentsMargins(2, 2, 2, 2)
+            if order['status'] in ('open', 'partially_received'):
+                receive_button = QPushButton("📦 Receive")
+                receive_button.clicked.connect(lambda checked, o=order: self.receive_delivery(o['id']))
+                cancel_button = QPushButton("✖ Cancel")
+                cancel_button.clicked.connect(lambda checked, o=order: self.cancel_order(o))
+                actions_layout.addWidget(receive_button)
+                actions_layout.addWidget(cancel_button)
+            self.orders_table.setCellWidget(row, 8, actions_widget)
+        self.orders_table.resizeColumnsToContents()
+        self.orders_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+
+    def load_receipts(self):
+        """Load recent goods receipts"""
+        try:
+            receipts = self.db_manager.purchasing.get_receipts()
+        except Exception as e:
+            logger.error("Error loading goods receipts: %s", e)
+            return
+
+        self.receipts_table.setRowCount(len(receipts))
+        for row, receipt in enumerate(receipts):
+            values = (receipt['receipt_number'], receipt['po_number'] or "-", receipt['supplier_name'] or "-",
+                      str(receipt['lines']), str(receipt['units']), f"${receipt['total_cost']:.2f}",
+                      receipt['user_name'] or "-", receipt['created_at'])
+            for column, value in enumerate(values):
+                self.receipts_table.setItem(row, column, QTableWidgetItem(value))
+
+    def load_suppliers(self):
+        """Load all suppliers, including inactive ones"""
+        try:
+            suppliers = self.db_manager.suppliers.list(include_inactive=True)
+        except Exception as e:
+            logger.error("Error loading suppliers: %s", e)
+            return
+
+        self.suppliers_table.setRowCount(len(suppliers))
+        for row, supplier in enumerate(suppliers):
+            values = (supplier['name'], supplier['contact_name'] or "", supplier['phone'] or "",
+                      supplier['email'] or "", "Active" if supplier['is_active'] else "Inactive")
+            for column, value in enumerate(values):
+                self.suppliers_table.setItem(row, column, QTableWidgetItem(value))
+            edit_button = QPushButton("✏️ Edit")
+            edit_button.clicked.connect(lambda checked, s=supplier: self.edit_supplier(s))
+            self.suppliers_table.setCellWidget(row, 5, edit_button)
+
+    def new_order(self):
+        """Open the purchase order dialog"""
+        dialog = PurchaseOrderDialog(self.user, self.db_manager, parent=self)
+        if dialog.exec() == QDialog.Accepted:
+            self.load_orders()
+
+    def receive_delivery(self, purchase_order_id=None):
+        """Open the receive dialog, against an order if one is given"""
+        dialog = ReceiveDialog(self.user, self.db_manager, purchase_order_id, parent=self)
+        if dialog.exec() == QDialog.Accepted:
+            self.refresh()
+
+    def cancel_order(self, order):
+        """Cancel what is outstanding on an order"""
+        reply = QMessageBox.question(self, "Cancel Purchase Order",
+                                     f"Cancel {order['po_number']}? Stock already received stays on hand.",
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        try:
+            self.db_manager.purchasing.cancel_purchase_order(order['id'])
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to cancel purchase order: {str(e)}")
+            return
+        self.load_orders()
+
+    def edit_supplier(self, supplier=None):
+        """Open the supplier dialog"""
+        dialog = SupplierDialog(self.db_manager, supplier, parent=self)
+        if dialog.exec() == QDialog.Accepted:
+            self.load_suppliers()
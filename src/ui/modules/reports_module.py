@@ -7,9 +7,14 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                               QFrame, QComboBox, QDateEdit, QTabWidget,
                               QGroupBox, QGridLayout, QTextEdit, QMessageBox)
 from PySide6.QtCore import Qt, QDate
-from PySide6.QtGui import QFont
+from PySide6.QtGui import QFont, QColor
 from datetime import datetime, timedelta
 import csv
+import logging
+
+from src.database.analytics import WEEKDAY_NAMES
+
+logger = logging.getLogger(__name__)
 
 class ReportsModule(QWidget):
     """Reports and analytics module"""
@@ -18,6 +23,7 @@ class ReportsModule(QWidget):
         super().__init__()
         self.user = user
         self.db_manager = db_manager
+        self.analytics = db_manager.analytics
         self.setup_ui()
         self.setup_connections()
         self.load_default_report()
@@ -53,6 +59,10 @@ class ReportsModule(QWidget):
         summary_tab = self.create_summary_tab()
         self.tab_widget.addTab(summary_tab, "Summary")
         
+        # Analytics Tab
+        analytics_tab = self.create_analytics_tab()
+        self.tab_widget.addTab(analytics_tab, "Analytics")
+        
         # Add to main layout
         layout.addWidget(header_frame)
         layout.addWidget(self.tab_widget, 1)
@@ -300,6 +310,131 @@ class ReportsModule(QWidget):
         
         return tab
         
+    def create_analytics_tab(self):
+        """Create analytics tab (margins, heatmap, baskets, cashiers)"""
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        
+        # Date range selection
+        date_frame = QFrame()
+        date_frame.setStyleSheet("""
+            QFrame {
+                background-color: #f8f9fa;
+                border: 1px solid #dee2e6;
+                border-radius: 5px;
+                padding: 10px;
+            }
+        """)
+        date_layout = QHBoxLayout(date_frame)
+        
+        date_layout.addWidget(QLabel("From:"))
+        self.analytics_start_date = QDateEdit()
+        self.analytics_start_date.setDate(QDate.currentDate().addDays(-30))
+        self.analytics_start_date.setCalendarPopup(True)
+        date_layout.addWidget(self.analytics_start_date)
+        
+        date_layout.addWidget(QLabel("To:"))
+        self.analytics_end_date = QDateEdit()
+        self.analytics_end_date.setDate(QDate.currentDate())
+        self.analytics_end_date.setCalendarPopup(True)
+        date_layout.addWidget(self.analytics_end_date)
+        
+        # Report on one branch of the category tree
+        date_layout.addWidget(QLabel("Category:"))
+        self.analytics_category = QComboBox()
+        date_layout.addWidget(self.analytics_category)
+        self.load_analytics_categories()
+        
+        self.run_analytics_button = QPushButton("Run Analysis")
+        self.run_analytics_button.setStyleSheet("""
+            QPushButton {
+                background-color: #6f42c1;
+                color: white;
+                border: none;
+                padding: 8px 15px;
+                border-radius: 4px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #59339d;
+            }
+        """)
+        date_layout.addWidget(self.run_analytics_button)
+        date_layout.addStretch()
+        
+        # Analytics summary cards
+        summary_frame = QFrame()
+        summary_layout = QHBoxLayout(summary_frame)
+        summary_layout.addWidget(self.create_summary_card("Revenue", "$0.00", "#007bff"))
+        summary_layout.addWidget(self.create_summary_card("Gross Profit", "$0.00", "#28a745"))
+        summary_layout.addWidget(self.create_summary_card("Margin", "0.0%", "#17a2b8"))
+        summary_layout.addWidget(self.create_summary_card("Avg Basket", "$0.00", "#ffc107"))
+        
+        table_style = """
+            QTableWidget {
+                background-color: white;
+                border: 1px solid #dee2e6;
+                border-radius: 5px;
+                gridline-color: #dee2e6;
+            }
+            QHeaderView::section {
+                background-color: #e9ecef;
+                padding: 4px;
+                border: none;
+                font-weight: bold;
+            }
+        """
+        
+        # Margin per category
+        category_group = QGroupBox("Margin by Category")
+        category_layout = QVBoxLayout(category_group)
+        self.category_margin_table = QTableWidget()
+        self.category_margin_table.setColumnCount(5)
+        self.category_margin_table.setHorizontalHeaderLabels(["Category", "Revenue", "Cost", "Profit", "Margin"])
+        self.category_margin_table.setStyleSheet(table_style)
+        category_layout.addWidget(self.category_margin_table)
+        
+        # Cashier productivity
+        cashier_group = QGroupBox("Cashier Productivity")
+        cashier_layout = QVBoxLayout(cashier_group)
+        self.cashier_table = QTableWidget()
+        self.cashier_table.setColumnCount(5)
+        self.cashier_table.setHorizontalHeaderLabels(["Cashier", "Sales", "Revenue", "Avg. Sale", "Units"])
+        self.cashier_table.setStyleSheet(table_style)
+        cashier_layout.addWidget(self.cashier_table)
+        
+        # Basket size distribution
+        basket_group = QGroupBox("Basket Sizes (units)")
+        basket_layout = QVBoxLayout(basket_group)
+        self.basket_table = QTableWidget()
+        self.basket_table.setColumnCount(2)
+        self.basket_table.setHorizontalHeaderLabels(["Units", "Baskets"])
+        self.basket_table.setStyleSheet(table_style)
+        basket_layout.addWidget(self.basket_table)
+        
+        tables_frame = QFrame()
+        tables_layout = QHBoxLayout(tables_frame)
+        tables_layout.addWidget(category_group, 2)
+        tables_layout.addWidget(cashier_group, 2)
+        tables_layout.addWidget(basket_group, 1)
+        
+        # Weekday x hour revenue heatmap
+        heatmap_group = QGroupBox("Revenue by Weekday and Hour")
+        heatmap_layout = QVBoxLayout(heatmap_group)
+        self.heatmap_table = QTableWidget(7, 24)
+        self.heatmap_table.setHorizontalHeaderLabels([f"{hour:02d}" for hour in range(24)])
+        self.heatmap_table.setVerticalHeaderLabels(WEEKDAY_NAMES)
+        self.heatmap_table.setStyleSheet(table_style)
+        self.heatmap_table.horizontalHeader().setDefaultSectionSize(48)
+        heatmap_layout.addWidget(self.heatmap_table)
+        
+        layout.addWidget(date_frame)
+        layout.addWidget(summary_frame)
+        layout.addWidget(tables_frame, 1)
+        layout.addWidget(heatmap_group, 1)
+        
+        return tab
+        
     def create_summary_card(self, title, value, color):
         """Create a summary card widget"""
         card = QFrame()
@@ -335,6 +470,7 @@ class ReportsModule(QWidget):
         """Setup signal connections"""
         self.generate_report_button.clicked.connect(self.generate_sales_report)
         self.export_report_button.clicked.connect(self.export_sales_report)
+        self.run_analytics_button.clicked.connect(self.load_analytics)
         self.tab_widget.currentChanged.connect(self.on_tab_changed)
         
     def load_default_report(self):
@@ -364,9 +500,12 @@ class ReportsModule(QWidget):
             self.sales_table.setItem(row, 3, QTableWidgetItem("N/A"))  # Items count would need separate query
             self.sales_table.setItem(row, 4, QTableWidgetItem(f"${sale['subtotal']:.2f}"))
             self.sales_table.setItem(row, 5, QTableWidgetItem(f"${sale['tax_amount']:.2f}"))
-            self.sales_table.setItem(row, 6, QTableWidgetItem(f"${sale['total_amount']:.2f}"))
+            total_text = f"${sale['total_amount']:.2f}"
+            if sale['refunded_amount']:
+                total_text += f" (-${sale['refunded_amount']:.2f} refunded)"
+            self.sales_table.setItem(row, 6, QTableWidgetItem(total_text))
             
-            total_sales += sale['total_amount']
+            total_sales += sale['total_amount'] - sale['refunded_amount']
         
         # Update summary cards
         avg_sale = total_sales / total_transactions if total_transactions > 0 else 0
@@ -374,20 +513,31 @@ class ReportsModule(QWidget):
         self.total_sales_value_label.setText(f"${total_sales:.2f}")
         self.transactions_value_label.setText(str(total_transactions))
         self.avg_sale_value_label.setText(f"${avg_sale:.2f}")
-        self.profit_value_label.setText("$0.00")  # Would need cost calculation
+        
+        profit = self.db_manager.get_profit_summary(start_date, end_date)
+        self.profit_value_label.setText(f"${profit['gross_profit']:.2f}")
         
     def load_inventory_report(self):
         """Load inventory report data"""
-        products = self.db_manager.get_products()
+        page_size = 500
+        products = self.db_manager.iter_products(
+            limit=page_size, columns=('name', 'category_name', 'price', 'quantity', 'min_quantity')
+        )
         
-        self.inventory_table.setRowCount(len(products))
+        self.inventory_table.setRowCount(0)
+        table_rows = 0
         
-        total_products = len(products)
+        total_products = 0
         low_stock_count = 0
         out_of_stock_count = 0
         total_value = 0
         
+        # Rows are added a page at a time as the products stream in, never the whole catalog at once
         for row, product in enumerate(products):
+            if row == table_rows:
+                table_rows += page_size
+                self.inventory_table.setRowCount(table_rows)
+            total_products += 1
             self.inventory_table.setItem(row, 0, QTableWidgetItem(product['name']))
             self.inventory_table.setItem(row, 1, QTableWidgetItem(product.get('category_name', '')))
             self.inventory_table.setItem(row, 2, QTableWidgetItem(str(product['quantity'])))
@@ -418,6 +568,8 @@ class ReportsModule(QWidget):
             
             total_value += value
         
+        self.inventory_table.setRowCount(total_products)
+        
         # Update inventory summary cards
         self.total_products_value_label.setText(str(total_products))
         self.low_stock_value_label.setText(str(low_stock_count))
@@ -431,16 +583,16 @@ class ReportsModule(QWidget):
         month_start = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
         
         # Today's data
-        today_sales = self.db_manager.get_sales_report(today, today)
-        today_total = sum(sale['total_amount'] for sale in today_sales)
+        today_sales = self.db_manager.get_sales_report(today, today, row_format="columns")
+        today_total = sum(today_sales['total_amount']) - sum(today_sales['refunded_amount']) if len(today_sales) else 0
         
         self.today_sales_label.setText(f"Sales: ${today_total:.2f}")
         self.today_transactions_label.setText(f"Transactions: {len(today_sales)}")
         self.today_items_label.setText("Items Sold: N/A")  # Would need separate calculation
         
         # Week's data
-        week_sales = self.db_manager.get_sales_report(week_start, today)
-        week_total = sum(sale['total_amount'] for sale in week_sales)
+        week_sales = self.db_manager.get_sales_report(week_start, today, row_format="columns")
+        week_total = sum(week_sales['total_amount']) - sum(week_sales['refunded_amount']) if len(week_sales) else 0
         week_avg = week_total / 7
         
         self.week_sales_label.setText(f"Sales: ${week_total:.2f}")
@@ -448,8 +600,8 @@ class ReportsModule(QWidget):
         self.week_avg_label.setText(f"Daily Average: ${week_avg:.2f}")
         
         # Month's data
-        month_sales = self.db_manager.get_sales_report(month_start, today)
-        month_total = sum(sale['total_amount'] for sale in month_sales)
+        month_sales = self.db_manager.get_sales_report(month_start, today, row_format="columns")
+        month_total = sum(month_sales['total_amount']) - sum(month_sales['refunded_amount']) if len(month_sales) else 0
         
         self.month_sales_label.setText(f"Sales: ${month_total:.2f}")
         self.month_transactions_label.setText(f"Transactions: {len(month_sales)}")
@@ -458,21 +610,78 @@ class ReportsModule(QWidget):
         # Recent activity
         self.load_recent_activity()
         
-    def load_recent_activity(self):
-        """Load recent activity log"""
-        conn = self.db_manager.get_connection()
-        cursor = conn.cursor()
+    def load_analytics_categories(self):
+        """Fill the analytics category filter with the category tree"""
+        selected = self.analytics_category.currentData()
+        self.analytics_category.clear()
+        self.analytics_category.addItem("All Categories", None)
+        try:
+            for category in self.db_manager.category_registry.tree():
+                self.analytics_category.addItem(category['label'], category['id'])
+        except Exception as e:
+            logger.error("Error loading categories: %s", e)
+        self.analytics_category.setCurrentIndex(max(self.analytics_category.findData(selected), 0))
+        
+    def load_analytics(self):
+        """Run the analytics engine for the selected range and fill the Analytics tab"""
+        start_date = self.analytics_start_date.date().toString("yyyy-MM-dd")
+        end_date = self.analytics_end_date.date().toString("yyyy-MM-dd")
         
-        cursor.execute('''
-            SELECT al.*, u.full_name
-            FROM activity_logs al
-            JOIN users u ON al.user_id = u.id
-            ORDER BY al.created_at DESC
-            LIMIT 10
-        ''')
+        try:
+            report = self.analytics.compute(start_date, end_date, self.analytics_category.currentData())
+        except Exception as e:
+            QMessageBox.critical(self, "Analytics Error", f"Failed to compute analytics: {str(e)}")
+            return
+        
+        self.revenue_value_label.setText(f"${report['revenue']:.2f}")
+        self.gross_profit_value_label.setText(f"${report['gross_profit']:.2f}")
+        self.margin_value_label.setText(f"{report['margin'] * 100:.1f}%")
+        self.avg_basket_value_label.setText(f"${report['avg_basket_value']:.2f}")
+        
+        # Category margins, each covering its subcategories
+        categories = report['categories']
+        self.category_margin_table.setRowCount(len(categories))
+        for row, category in enumerate(categories):
+            self.category_margin_table.setItem(row, 0, QTableWidgetItem("    " * category['depth'] + category['category_name']))
+            self.category_margin_table.setItem(row, 1, QTableWidgetItem(f"${category['revenue']:.2f}"))
+            self.category_margin_table.setItem(row, 2, QTableWidgetItem(f"${category['cost']:.2f}"))
+            self.category_margin_table.setItem(row, 3, QTableWidgetItem(f"${category['gross_profit']:.2f}"))
+            self.category_margin_table.setItem(row, 4, QTableWidgetItem(f"{category['margin'] * 100:.1f}%"))
+        
+        # Cashier productivity
+        cashiers = report['cashiers']
+        self.cashier_table.setRowCount(len(cashiers))
+        for row, cashier in enumerate(cashiers):
+            self.cashier_table.setItem(row, 0, QTableWidgetItem(cashier['cashier_name']))
+            self.cashier_table.setItem(row, 1, QTableWidgetItem(str(cashier['transactions'])))
+            self.cashier_table.setItem(row, 2, QTableWidgetItem(f"${cashier['revenue']:.2f}"))
+            self.cashier_table.setItem(row, 3, QTableWidgetItem(f"${cashier['avg_sale']:.2f}"))
+            self.cashier_table.setItem(row, 4, QTableWidgetItem(str(cashier['units'])))
+        
+        # Basket size distribution (skip empty bins)
+        basket_sizes = report['basket_sizes']
+        sizes = [size for size in range(1, len(basket_sizes)) if basket_sizes[size]]
+        self.basket_table.setRowCount(len(sizes))
+        for row, size in enumerate(sizes):
+            label = f"{size}+" if size == len(basket_sizes) - 1 else str(size)
+            self.basket_table.setItem(row, 0, QTableWidgetItem(label))
+            self.basket_table.setItem(row, 1, QTableWidgetItem(str(int(basket_sizes[size]))))
+        
+        # Heatmap shaded relative to the busiest slot
+        heatmap = report['heatmap_revenue']
+        peak = heatmap.max()
+        for weekday in range(7):
+            for hour in range(24):
+                value = heatmap[weekday, hour]
+                item = QTableWidgetItem(f"{value:.0f}" if value else "")
+                if peak > 0 and value > 0:
+                    intensity = int(255 - 175 * value / peak)
+                    item.setBackground(QColor(intensity, intensity, 255))
+                self.heatmap_table.setItem(weekday, hour, item)
         
-        activities = cursor.fetchall()
-        conn.close()
+    def load_recent_activity(self):
+        """Load recent activity log"""
+        activities = self.db_manager.activity.recent(10)
         
         activity_text = ""
         for activity in activities:
@@ -502,7 +711,7 @@ class ReportsModule(QWidget):
                 
                 with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
                     writer = csv.writer(csvfile)
-                    writer.writerow(['Sale Number', 'Date', 'Cashier', 'Subtotal', 'Tax', 'Total'])
+                    writer.writerow(['Sale Number', 'Date', 'Cashier', 'Subtotal', 'Tax', 'Total', 'Refunded'])
                     
                     for sale in sales:
                         writer.writerow([
@@ -511,7 +720,8 @@ class ReportsModule(QWidget):
                             sale['cashier_name'],
                             sale['subtotal'],
                             sale['tax_amount'],
-                            sale['total_amount']
+                            sale['total_amount'],
+                            sale['refunded_amount']
                         ])
                 
                 QMessageBox.information(self, "Export Successful", 
@@ -526,3 +736,5 @@ class ReportsModule(QWidget):
             self.load_inventory_report()
         elif index == 2:  # Summary tab
             self.load_summary_data()
+        elif index == 3:  # Analytics tab
+            self.load_analytics_categories()
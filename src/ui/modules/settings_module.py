@@ -6,9 +6,95 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                               QLineEdit, QPushButton, QFrame, QComboBox,
                               QSpinBox, QDoubleSpinBox, QGroupBox, QGridLayout,
                               QCheckBox, QTextEdit, QMessageBox, QTabWidget,
-                              QFileDialog)
-from PySide6.QtCore import Qt, Signal
+                              QFileDialog, QProgressBar)
+from PySide6.QtCore import Qt, Signal, QThread
 from PySide6.QtGui import QFont
+from datetime import datetime
+import logging
+
+from src.database.backup_manager import BackupEngine, RestoreManager
+
+logger = logging.getLogger(__name__)
+
+class BackupWorker(QThread):
+    """Runs an online backup off the UI thread"""
+    
+    progress = Signal(int, int)
+    completed = Signal(dict)
+    failed = Signal(str)
+    
+    def __init__(self, engine, destination, compress, verify, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.destination = destination
+        self.compress = compress
+        self.verify = verify
+        
+    def run(self):
+        """Create the backup and report the outcome through signals"""
+        try:
+            result = self.engine.create_backup(self.destination, compress=self.compress,
+                                               verify=self.verify, progress=self.progress.emit)
+            self.completed.emit(result)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+class ScheduledBackupWorker(QThread):
+    """Runs the next backup of the schedule (or a new full generation) off the UI thread"""
+    
+    completed = Signal(dict)
+    failed = Signal(str)
+    
+    def __init__(self, scheduler, full=False, parent=None):
+        super().__init__(parent)
+        self.scheduler = scheduler
+        self.full = full
+        
+    def run(self):
+        """Run the backup and report the outcome through signals"""
+        try:
+            self.completed.emit(self.scheduler.run_once(full=self.full))
+        except Exception as e:
+            self.failed.emit(str(e))
+
+class ArchiveWorker(QThread):
+    """Moves old sales history into the yearly archives off the UI thread"""
+    
+    progress = Signal(str, int, int)
+    completed = Signal(dict)
+    failed = Signal(str)
+    
+    def __init__(self, archive_manager, retention_months, vacuum, parent=None):
+        super().__init__(parent)
+        self.archive_manager = archive_manager
+        self.retention_months = retention_months
+        self.vacuum = vacuum
+        
+    def run(self):
+        """Archive and report the outcome through signals"""
+        try:
+            self.completed.emit(self.archive_manager.archive(self.retention_months, vacuum=self.vacuum,
+                                                             progress=self.progress.emit))
+        except Exception as e:
+            self.failed.emit(str(e))
+
+class RestoreWorker(QThread):
+    """Validates a backup and swaps it in for the live database off the UI thread"""
+    
+    completed = Signal(dict)
+    failed = Signal(str)
+    
+    def __init__(self, restore_manager, source, parent=None):
+        super().__init__(parent)
+        self.restore_manager = restore_manager
+        self.source = source
+        
+    def run(self):
+        """Run the restore and report the outcome through signals"""
+        try:
+            self.completed.emit(self.restore_manager.restore(self.source))
+        except Exception as e:
+            self.failed.emit(str(e))
 
 class SettingsModule(QWidget):
     """System settings module"""
@@ -19,6 +105,13 @@ class SettingsModule(QWidget):
         super().__init__()
         self.user = user
         self.db_manager = db_manager
+        # Manual backups and restores copy the database file, which only the server can reach
+        self.backup_engine = None if db_manager.is_remote else BackupEngine(db_manager)
+        self.backup_worker = None
+        self.scheduled_backup_worker = None
+        self.restore_manager = None if db_manager.is_remote else RestoreManager(db_manager)
+        self.restore_worker = None
+        self.archive_worker = None
         self.setup_ui()
         self.setup_connections()
         self.load_settings()
@@ -350,6 +443,23 @@ class SettingsModule(QWidget):
         manual_layout.addStretch()
         manual_layout.addWidget(self.backup_now_button)
         
+        # Backup options and progress
+        options_frame = QFrame()
+        options_layout = QHBoxLayout(options_frame)
+        
+        self.compress_backup_checkbox = QCheckBox("Compress backup (.gz)")
+        self.verify_backup_checkbox = QCheckBox("Verify integrity")
+        self.verify_backup_checkbox.setChecked(True)
+        
+        self.backup_progress = QProgressBar()
+        self.backup_progress.setRange(0, 100)
+        self.backup_progress.setValue(0)
+        self.backup_progress.setVisible(False)
+        
+        options_layout.addWidget(self.compress_backup_checkbox)
+        options_layout.addWidget(self.verify_backup_checkbox)
+        options_layout.addWidget(self.backup_progress, 1)
+        
         # Restore Backup
         restore_frame = QFrame()
         restore_layout = QHBoxLayout(restore_frame)
@@ -374,10 +484,80 @@ class SettingsModule(QWidget):
         restore_layout.addStretch()
         restore_layout.addWidget(self.restore_button)
         
+        remote_label = QLabel("Connected to a POS server: manual backups and restores are made on the server.")
+        remote_label.setVisible(self.db_manager.is_remote)
+        for frame in (manual_frame, options_frame, restore_frame):
+            frame.setVisible(not self.db_manager.is_remote)
+        
+        backup_layout.addWidget(remote_label)
         backup_layout.addWidget(manual_frame)
+        backup_layout.addWidget(options_frame)
         backup_layout.addWidget(restore_frame)
         backup_group.setLayout(backup_layout)
         
+        # Scheduled Backups
+        schedule_group = QGroupBox("Scheduled Backups")
+        schedule_layout = QGridLayout()
+        
+        self.schedule_enabled_checkbox = QCheckBox("Take backups automatically")
+        
+        self.backup_interval_spin = QSpinBox()
+        self.backup_interval_spin.setRange(5, 1440)
+        self.backup_interval_spin.setSuffix(" min")
+        
+        self.backup_full_every_spin = QSpinBox()
+        self.backup_full_every_spin.setRange(0, 1000)
+        self.backup_full_every_spin.setToolTip("Incremental backups taken before the next full snapshot")
+        
+        self.backup_retention_spin = QSpinBox()
+        self.backup_retention_spin.setRange(1, 365)
+        self.backup_retention_spin.setToolTip("Number of generations (full snapshot + incrementals) to keep")
+        
+        self.backup_directory_input = QLineEdit()
+        self.backup_directory_input.setPlaceholderText("Default: backups folder next to the database")
+        self.browse_backup_directory_button = QPushButton("Browse...")
+        
+        self.compress_scheduled_checkbox = QCheckBox("Compress full snapshots (.gz)")
+        
+        self.run_scheduled_button = QPushButton("▶️ Run Now")
+        self.full_backup_button = QPushButton("🗄️ New Full Snapshot")
+        
+        schedule_layout.addWidget(self.schedule_enabled_checkbox, 0, 0, 1, 2)
+        schedule_layout.addWidget(self.compress_scheduled_checkbox, 0, 2, 1, 2)
+        schedule_layout.addWidget(QLabel("Every:"), 1, 0)
+        schedule_layout.addWidget(self.backup_interval_spin, 1, 1)
+        schedule_layout.addWidget(QLabel("Incrementals per full:"), 1, 2)
+        schedule_layout.addWidget(self.backup_full_every_spin, 1, 3)
+        schedule_layout.addWidget(QLabel("Keep generations:"), 2, 0)
+        schedule_layout.addWidget(self.backup_retention_spin, 2, 1)
+        schedule_layout.addWidget(QLabel("Directory:"), 3, 0)
+        schedule_layout.addWidget(self.backup_directory_input, 3, 1, 1, 2)
+        schedule_layout.addWidget(self.browse_backup_directory_button, 3, 3)
+        schedule_layout.addWidget(self.run_scheduled_button, 4, 2)
+        schedule_layout.addWidget(self.full_backup_button, 4, 3)
+        schedule_group.setLayout(schedule_layout)
+        
+        # Data Archive
+        archive_group = QGroupBox("Data Archive")
+        archive_layout = QGridLayout()
+        
+        self.archive_months_spin = QSpinBox()
+        self.archive_months_spin.setRange(1, 120)
+        self.archive_months_spin.setSuffix(" months")
+        self.archive_months_spin.setToolTip("Sales and activity older than this move to yearly archive files")
+        
+        self.vacuum_archive_checkbox = QCheckBox("Shrink database file afterwards")
+        self.archive_now_button = QPushButton("📦 Archive Now")
+        self.archive_status_label = QLabel("No archives yet")
+        self.archive_status_label.setWordWrap(True)
+        
+        archive_layout.addWidget(QLabel("Keep live:"), 0, 0)
+        archive_layout.addWidget(self.archive_months_spin, 0, 1)
+        archive_layout.addWidget(self.vacuum_archive_checkbox, 0, 2)
+        archive_layout.addWidget(self.archive_now_button, 0, 3)
+        archive_layout.addWidget(self.archive_status_label, 1, 0, 1, 4)
+        archive_group.setLayout(archive_layout)
+        
         # Backup History
         history_group = QGroupBox("Backup History")
         history_layout = QVBoxLayout()
@@ -391,6 +571,8 @@ class SettingsModule(QWidget):
         history_group.setLayout(history_layout)
         
         layout.addWidget(backup_group)
+        layout.addWidget(schedule_group)
+        layout.addWidget(archive_group)
         layout.addWidget(history_group)
         layout.addStretch()
         
@@ -404,6 +586,10 @@ class SettingsModule(QWidget):
         self.remove_logo_button.clicked.connect(self.remove_logo)
         self.backup_now_button.clicked.connect(self.backup_now)
         self.restore_button.clicked.connect(self.restore_backup)
+        self.browse_backup_directory_button.clicked.connect(self.select_backup_directory)
+        self.run_scheduled_button.clicked.connect(lambda: self.run_scheduled_backup(full=False))
+        self.full_backup_button.clicked.connect(lambda: self.run_scheduled_backup(full=True))
+        self.archive_now_button.clicked.connect(self.archive_now)
         self.change_password_button.clicked.connect(self.change_password)
         
     def load_settings(self):
@@ -434,24 +620,38 @@ class SettingsModule(QWidget):
         # Load receipt settings
         self.receipt_footer_input.setPlainText(self.db_manager.get_setting("receipt_footer") or "Thank you for your business!")
         
+        # Load backup schedule
+        schedule = self.db_manager.backup_scheduler.load_config()
+        self.schedule_enabled_checkbox.setChecked(schedule['enabled'])
+        self.backup_interval_spin.setValue(schedule['interval'] // 60)
+        self.backup_full_every_spin.setValue(schedule['full_every'])
+        self.backup_retention_spin.setValue(schedule['retention'])
+        self.compress_scheduled_checkbox.setChecked(schedule['compress'])
+        self.backup_directory_input.setText(self.db_manager.get_setting("backup_directory") or "")
+        self.load_backup_history()
+        
+        # Load archive settings
+        self.archive_months_spin.setValue(self.db_manager.archive.retention_months)
+        self.load_archive_summary()
+        
     def save_settings(self):
         """Save settings to database - FIXED"""
         try:
-            print("Saving settings...")  # Debug print
+            logger.debug("Saving settings...")
             
             # Save language
             language = "ar" if self.language_combo.currentText() == "العربية" else "en"
             self.db_manager.update_setting("language", language)
-            print(f"Saved language: {language}")
+            logger.debug("Saved language: %s", language)
             
             # Save theme
             theme = self.theme_combo.currentText().lower()
             self.db_manager.update_setting("theme", theme)
-            print(f"Saved theme: {theme}")
+            logger.debug("Saved theme: %s", theme)
             
             # Save currency
             self.db_manager.update_setting("currency", self.currency_combo.currentText())
-            print(f"Saved currency: {self.currency_combo.currentText()}")
+            logger.debug("Saved currency: %s", self.currency_combo.currentText())
             
             # Save company information
             self.db_manager.update_setting("company_name", self.company_name_input.text())
@@ -464,6 +664,17 @@ class SettingsModule(QWidget):
             # Save receipt settings
             self.db_manager.update_setting("receipt_footer", self.receipt_footer_input.toPlainText())
             
+            # Save backup schedule (the scheduler re-reads these on its next run)
+            self.db_manager.update_setting("backup_schedule_enabled",
+                                           "1" if self.schedule_enabled_checkbox.isChecked() else "0")
+            self.db_manager.update_setting("backup_interval_minutes", str(self.backup_interval_spin.value()))
+            self.db_manager.update_setting("backup_full_every", str(self.backup_full_every_spin.value()))
+            self.db_manager.update_setting("backup_retention_generations", str(self.backup_retention_spin.value()))
+            self.db_manager.update_setting("backup_compress",
+                                           "1" if self.compress_scheduled_checkbox.isChecked() else "0")
+            self.db_manager.update_setting("backup_directory", self.backup_directory_input.text().strip())
+            self.db_manager.update_setting("archive_retention_months", str(self.archive_months_spin.value()))
+            
             # Update user account if changed
             new_username = self.new_username_input.text().strip()
             full_name = self.full_name_input.text().strip()
@@ -480,21 +691,17 @@ class SettingsModule(QWidget):
             QMessageBox.information(self, "Success", "Settings saved successfully!\nSome changes may require restart to take full effect.")
             
             # Emit signal to apply changes immediately
-            print("Emitting settings_changed signal...")
+            logger.debug("Emitting settings_changed signal...")
             self.settings_changed.emit()
             
         except Exception as e:
-            print(f"Error saving settings: {e}")
+            logger.error("Error saving settings: %s", e)
             QMessageBox.critical(self, "Error", f"Failed to save settings: {str(e)}")
             
     def update_username(self, new_username):
         """Update username"""
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("UPDATE users SET username = ? WHERE id = ?", (new_username, self.user['id']))
-            conn.commit()
-            conn.close()
+            self.db_manager.users.set_username(self.user['id'], new_username)
             
             self.user['username'] = new_username
             self.current_username_label.setText(new_username)
@@ -506,11 +713,7 @@ class SettingsModule(QWidget):
     def update_full_name(self, full_name):
         """Update full name"""
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("UPDATE users SET full_name = ? WHERE id = ?", (full_name, self.user['id']))
-            conn.commit()
-            conn.close()
+            self.db_manager.users.set_full_name(self.user['id'], full_name)
             
             self.user['full_name'] = full_name
             
@@ -542,12 +745,8 @@ class SettingsModule(QWidget):
             
         try:
             # Update password
-            new_password_hash = self.db_manager.hash_password(new_password)
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_password_hash, self.user['id']))
-            conn.commit()
-            conn.close()
+            self.db_manager.users.set_password(self.user['id'], new_password)
+            self.user['password_hash'] = self.db_manager.hash_password(new_password)
             
             # Clear password fields
             self.current_password_input.clear()
@@ -597,30 +796,183 @@ class SettingsModule(QWidget):
         self.db_manager.update_setting("company_logo", "")
         
     def backup_now(self):
-        """Create manual backup"""
+        """Create manual backup in a worker thread while the database stays in use"""
+        if self.backup_worker and self.backup_worker.isRunning():
+            return
+        
+        compress = self.compress_backup_checkbox.isChecked()
+        extension = ".db.gz" if compress else ".db"
+        file_filter = "Compressed Backups (*.db.gz)" if compress else "Database Files (*.db)"
+        
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Save Backup", 
+            f"lks_pos_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}",
+            file_filter
+        )
+        
+        if not file_path:
+            return
+        
+        self.backup_now_button.setEnabled(False)
+        self.backup_progress.setValue(0)
+        self.backup_progress.setVisible(True)
+        
+        self.backup_worker = BackupWorker(self.backup_engine, file_path, compress,
+                                          self.verify_backup_checkbox.isChecked(), self)
+        self.backup_worker.progress.connect(self.on_backup_progress)
+        self.backup_worker.completed.connect(self.on_backup_completed)
+        self.backup_worker.failed.connect(self.on_backup_failed)
+        self.backup_worker.start()
+        
+    def on_backup_progress(self, copied, total):
+        """Update backup progress bar"""
+        if total:
+            self.backup_progress.setValue(int(copied * 100 / total))
+            
+    def on_backup_completed(self, result):
+        """Handle a finished backup"""
+        self.backup_now_button.setEnabled(True)
+        self.backup_progress.setVisible(False)
+        
+        # Log backup
+        self.db_manager.log_activity(self.user['id'], "backup_created", f"Manual backup created: {result['path']}")
+        
+        size_mb = result['size'] / (1024 * 1024)
+        self.backup_history_text.append(
+            f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {result['path']} "
+            f"({size_mb:.1f} MB, {result['duration']:.1f}s"
+            f"{', verified' if result['verified'] else ''})"
+        )
+        
+        QMessageBox.information(self, "Backup Complete", 
+                              f"Backup created successfully:\n{result['path']}")
+        
+    def on_backup_failed(self, message):
+        """Handle a failed backup"""
+        self.backup_now_button.setEnabled(True)
+        self.backup_progress.setVisible(False)
+        QMessageBox.critical(self, "Backup Error", f"Failed to create backup: {message}")
+            
+    def select_backup_directory(self):
+        """Select the directory scheduled backups are written to"""
+        directory = QFileDialog.getExistingDirectory(self, "Select Backup Directory",
+                                                     self.backup_directory_input.text())
+        if directory:
+            self.backup_directory_input.setText(directory)
+            
+    def run_scheduled_backup(self, full=False):
+        """Take the next scheduled backup (or start a new generation) in a worker thread"""
+        if self.scheduled_backup_worker and self.scheduled_backup_worker.isRunning():
+            return
+        
+        self.run_scheduled_button.setEnabled(False)
+        self.full_backup_button.setEnabled(False)
+        
+        self.scheduled_backup_worker = ScheduledBackupWorker(self.db_manager.backup_scheduler, full, self)
+        self.scheduled_backup_worker.completed.connect(self.on_scheduled_backup_completed)
+        self.scheduled_backup_worker.failed.connect(self.on_scheduled_backup_failed)
+        self.scheduled_backup_worker.start()
+        
+    def on_scheduled_backup_completed(self, result):
+        """Handle a finished scheduled backup"""
+        self.run_scheduled_button.setEnabled(True)
+        self.full_backup_button.setEnabled(True)
+        
+        self.db_manager.log_activity(self.user['id'], "backup_created",
+                                     f"{result['kind'].title()} backup created: {result['path']}")
+        self.load_backup_history()
+        
+    def on_scheduled_backup_failed(self, message):
+        """Handle a failed scheduled backup"""
+        self.run_scheduled_button.setEnabled(True)
+        self.full_backup_button.setEnabled(True)
+        QMessageBox.critical(self, "Backup Error", f"Failed to create backup: {message}")
+        
+    def load_backup_history(self):
+        """Show the backup generations currently kept on disk"""
         try:
-            from datetime import datetime
-            file_path, _ = QFileDialog.getSaveFileName(
-                self, "Save Backup", 
-                f"lks_pos_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db",
-                "Database Files (*.db)"
+            generations = self.db_manager.backup_scheduler.list_generations()
+        except Exception as e:
+            self.backup_history_text.setPlainText(f"Could not read backup history: {e}")
+            return
+        
+        lines = []
+        for generation in reversed(generations):
+            manifest = generation['manifest']
+            last_backup = datetime.fromtimestamp(generation['last_backup_at']).strftime('%Y-%m-%d %H:%M:%S')
+            lines.append(
+                f"{generation['name']}: full {manifest['full']['size'] / (1024 * 1024):.1f} MB"
+                f" + {len(manifest['incrementals'])} incremental(s), "
+                f"{generation['size'] / (1024 * 1024):.1f} MB total, last backup {last_backup}"
             )
+        self.backup_history_text.setPlainText("\n".join(lines))
             
-            if file_path:
-                import shutil
-                shutil.copy2(self.db_manager.db_path, file_path)
-                
-                # Log backup
-                self.db_manager.log_activity(self.user['id'], "backup_created", f"Manual backup created: {file_path}")
-                
-                QMessageBox.information(self, "Backup Complete", 
-                                      f"Backup created successfully:\n{file_path}")
-                
+    def archive_now(self):
+        """Move sales history older than the retention period into the yearly archives"""
+        if self.archive_worker and self.archive_worker.isRunning():
+            return
+        
+        months = self.archive_months_spin.value()
+        reply = QMessageBox.question(self, "Archive Sales History",
+                                   f"Move sales and activity older than {months} months into archive files?\n"
+                                   "Reports will still include archived sales.",
+                                   QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        
+        self.archive_now_button.setEnabled(False)
+        self.archive_worker = ArchiveWorker(self.db_manager.archive, months,
+                                            self.vacuum_archive_checkbox.isChecked(), self)
+        self.archive_worker.progress.connect(self.on_archive_progress)
+        self.archive_worker.completed.connect(self.on_archive_completed)
+        self.archive_worker.failed.connect(self.on_archive_failed)
+        self.archive_worker.start()
+        
+    def on_archive_progress(self, month, done, total):
+        """Show which month is being archived"""
+        self.archive_status_label.setText(f"Archiving {month} ({done}/{total})...")
+        
+    def on_archive_completed(self, result):
+        """Handle a finished archival run"""
+        self.archive_now_button.setEnabled(True)
+        
+        moved = result['moved']
+        details = (f"{moved['sales']} sales, {moved['sale_items']} line items, {moved['returns']} returns and "
+                   f"{moved['activity_logs']} log entries before {result['cutoff']}")
+        self.db_manager.log_activity(self.user['id'], "sales_archived", f"Archived {details}")
+        self.load_archive_summary()
+        
+        QMessageBox.information(self, "Archive Complete", f"Archived {details}.")
+        
+    def on_archive_failed(self, message):
+        """Handle a failed archival run (months already moved stay archived)"""
+        self.archive_now_button.setEnabled(True)
+        self.load_archive_summary()
+        QMessageBox.critical(self, "Archive Error", f"Failed to archive sales: {message}")
+        
+    def load_archive_summary(self):
+        """Show the archive files and what they hold"""
+        try:
+            archives = self.db_manager.archive.get_archive_summary()
         except Exception as e:
-            QMessageBox.critical(self, "Backup Error", f"Failed to create backup: {str(e)}")
-            
+            self.archive_status_label.setText(f"Could not read archives: {e}")
+            return
+        
+        if not archives:
+            self.archive_status_label.setText("No archives yet")
+            return
+        
+        self.archive_status_label.setText("\n".join(
+            f"{archive['year']}: {archive['sales']} sales, {archive['activity_logs']} log entries "
+            f"({archive['size'] / (1024 * 1024):.1f} MB)"
+            for archive in archives
+        ))
+        
     def restore_backup(self):
-        """Restore from backup"""
+        """Restore from a backup file or scheduled backup generation, without restarting"""
+        if self.restore_worker and self.restore_worker.isRunning():
+            return
+        
         reply = QMessageBox.warning(self, "Restore Backup",
                                   "Restoring from backup will replace all current data.\n"
                                   "Are you sure you want to continue?",
@@ -629,17 +981,41 @@ class SettingsModule(QWidget):
         if reply == QMessageBox.Yes:
             file_path, _ = QFileDialog.getOpenFileName(
                 self, "Select Backup File", "",
-                "Database Files (*.db)"
+                "Backups (*.db *.db.gz manifest.json);;Database Files (*.db);;"
+                "Compressed Backups (*.db.gz);;Scheduled Backup Generations (manifest.json)"
             )
             
             if file_path:
-                try:
-                    import shutil
-                    shutil.copy2(file_path, self.db_manager.db_path)
-                    
-                    QMessageBox.information(self, "Restore Complete", 
-                                          "Backup restored successfully!\n"
-                                          "Please restart the application.")
-                    
-                except Exception as e:
-                    QMessageBox.critical(self, "Restore Error", f"Failed to restore backup: {str(e)}")
+                self.restore_button.setEnabled(False)
+                self.restore_button.setText("⏳ Restoring...")
+                
+                self.restore_worker = RestoreWorker(self.restore_manager, file_path, self)
+                self.restore_worker.completed.connect(self.on_restore_completed)
+                self.restore_worker.failed.connect(self.on_restore_failed)
+                self.restore_worker.start()
+                
+    def on_restore_completed(self, result):
+        """Handle a finished restore"""
+        self.reset_restore_button()
+        
+        self.db_manager.log_activity(self.user['id'], "backup_restored", f"Backup restored from: {result['source']}")
+        
+        message = (f"Backup restored successfully!\n"
+                   f"{result['products']} products, {result['sales']} sales.")
+        if result['previous_path']:
+            message += f"\n\nThe previous database was kept as:\n{result['previous_path']}"
+        QMessageBox.information(self, "Restore Complete", message)
+        
+        # Reload everything that was read from the old database
+        self.load_settings()
+        self.settings_changed.emit()
+        
+    def on_restore_failed(self, message):
+        """Handle a failed restore; the live database is left untouched"""
+        self.reset_restore_button()
+        QMessageBox.critical(self, "Restore Error", f"Failed to restore backup: {message}")
+        
+    def reset_restore_button(self):
+        """Re-enable the restore button"""
+        self.restore_button.setEnabled(True)
+        self.restore_button.setText("📥 Restore Backup")
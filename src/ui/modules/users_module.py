@@ -148,34 +148,12 @@ class UserDialog(QDialog):
                 return
         
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            
             if self.is_edit_mode:
-                # Update existing user
-                if password:
-                    password_hash = self.db_manager.hash_password(password)
-                    cursor.execute('''
-                        UPDATE users 
-                        SET username=?, full_name=?, email=?, role=?, password_hash=?, is_active=?
-                        WHERE id=?
-                    ''', (username, fullname, email, role, password_hash, is_active, self.user['id']))
-                else:
-                    cursor.execute('''
-                        UPDATE users 
-                        SET username=?, full_name=?, email=?, role=?, is_active=?
-                        WHERE id=?
-                    ''', (username, fullname, email, role, is_active, self.user['id']))
+                # A blank password keeps the current one
+                self.db_manager.users.update(self.user['id'], username, fullname, email, role,
+                                             is_active, password or None)
             else:
-                # Insert new user
-                password_hash = self.db_manager.hash_password(password)
-                cursor.execute('''
-                    INSERT INTO users (username, full_name, email, role, password_hash, is_active)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (username, fullname, email, role, password_hash, is_active))
-            
-            conn.commit()
-            conn.close()
+                self.db_manager.users.create(username, fullname, email, role, password, is_active)
             
             self.accept()
             
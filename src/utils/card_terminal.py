@@ -0,0 +1,71 @@
+"""
+Card Terminal - Pluggable interface to card payment terminals
+"""
+
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Optional, Type
+
+class CardTerminalError(Exception):
+    """Raised when a terminal cannot be reached or declines a transaction"""
+
+class CardTerminal(ABC):
+    """Interface every card terminal driver implements.
+
+    charge() returns a dict with at least 'approved', 'reference' (the
+    terminal's authorization code) and 'message'. A declined card is an
+    unapproved result; CardTerminalError is for failures of the terminal
+    itself. void() cancels an approved charge whose sale was not recorded.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def charge(self, amount: float, description: str = "") -> Dict:
+        """Charge the amount to a card"""
+
+    @abstractmethod
+    def void(self, reference: str) -> bool:
+        """Cancel an approved charge"""
+
+class StubCardTerminal(CardTerminal):
+    """Local terminal that approves every charge, for tills without a card reader"""
+
+    name = "stub"
+
+    def __init__(self):
+        self.charges: Dict[str, float] = {}
+
+    def charge(self, amount: float, description: str = "") -> Dict:
+        if amount <= 0:
+            return {'approved': False, 'reference': None, 'message': "Invalid amount"}
+
+        reference = f"STUB-{datetime.now().strftime('%H%M%S')}-{str(uuid.uuid4())[:6].upper()}"
+        self.charges[reference] = round(amount, 2)
+        return {'approved': True, 'reference': reference, 'message': "Approved (offline terminal)"}
+
+    def void(self, reference: str) -> bool:
+        return self.charges.pop(reference, None) is not None
+
+# Drivers selectable through the 'card_terminal' setting
+CARD_TERMINALS: Dict[str, Type[CardTerminal]] = {
+    StubCardTerminal.name: StubCardTerminal,
+}
+
+def register_card_terminal(terminal_class: Type[CardTerminal]):
+    """Make a terminal driver selectable by its name"""
+    CARD_TERMINALS[terminal_class.name] = terminal_class
+
+def create_card_terminal(name: Optional[str] = None) -> Optional[CardTerminal]:
+    """Create the terminal driver with the given name.
+
+    Returns None when no terminal is configured, so card payments stay
+    disabled; the stub, which approves everything, must be chosen explicitly.
+    """
+    if not name:
+        return None
+    terminal_class = CARD_TERMINALS.get(name)
+    if terminal_class is None:
+        raise CardTerminalError(f"Unknown card terminal '{name}', expected one of {sorted(CARD_TERMINALS)}")
+    return terminal_class()
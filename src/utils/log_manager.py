@@ -0,0 +1,113 @@
+"""
+Log Manager - Leveled logging through a background queue to rotating JSON files
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+DEFAULT_LOG_DIR = "logs"
+LOG_FILE = "lks_pos.log"
+METRICS_FILE = "lks_pos.prom"
+HANG_FILE = "ui_hangs.log"
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any exception"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'at': datetime.fromtimestamp(record.created, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class RecordQueueHandler(QueueHandler):
+    """QueueHandler that keeps the traceback apart from the message.
+
+    The stock handler folds it into the message text; keeping it in
+    exc_text lets the JSON file store it as its own field.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class LogManager:
+    """Configures the root logger once per process.
+
+    Callers only put records on a queue; a listener thread formats them and
+    does the console and file writes, so logging from the UI thread or a
+    checkout never waits on disk or a slow terminal. The log level comes
+    from $LKS_POS_LOG_LEVEL (default INFO) and the directory from
+    $LKS_POS_LOG_DIR (default ./logs).
+    """
+
+    listener: Optional[QueueListener] = None
+    queue_handler: Optional[QueueHandler] = None
+    log_dir: Optional[str] = None
+
+    @classmethod
+    def setup(cls, log_dir: Optional[str] = None, level: Optional[str] = None,
+              console: bool = True, max_bytes: int = 5 * 1024 * 1024, backup_count: int = 5) -> str:
+        """Start logging; returns the log directory. Calling it again does nothing."""
+        if cls.listener is not None:
+            return cls.log_dir
+
+        log_dir = os.path.abspath(log_dir or os.environ.get("LKS_POS_LOG_DIR") or DEFAULT_LOG_DIR)
+        os.makedirs(log_dir, exist_ok=True)
+        level = (level or os.environ.get("LKS_POS_LOG_LEVEL") or "INFO").upper()
+
+        handlers = []
+        file_handler = RotatingFileHandler(os.path.join(log_dir, LOG_FILE), maxBytes=max_bytes,
+                                           backupCount=backup_count, encoding="utf-8")
+        file_handler.setFormatter(JSONFormatter())
+        handlers.append(file_handler)
+        if console:
+            console_handler = logging.StreamHandler(sys.stderr)
+            console_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+            handlers.append(console_handler)
+
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger()
+        root.setLevel(level)
+        cls.queue_handler = RecordQueueHandler(log_queue)
+        root.addHandler(cls.queue_handler)
+
+        cls.listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        cls.listener.start()
+        cls.log_dir = log_dir
+        atexit.register(cls.shutdown)
+        return log_dir
+
+    @classmethod
+    def file_path(cls, filename: str) -> str:
+        """Path of a file kept in the log directory"""
+        return os.path.join(cls.log_dir or os.path.abspath(DEFAULT_LOG_DIR), filename)
+
+    @classmethod
+    def shutdown(cls):
+        """Flush queued records and stop the listener thread"""
+        if cls.listener is not None:
+            logging.getLogger().removeHandler(cls.queue_handler)
+            cls.listener.stop()
+            cls.listener = None
+            cls.queue_handler = None
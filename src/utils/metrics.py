@@ -0,0 +1,212 @@
+"""
+Metrics - In-process counters and timers exported in Prometheus text format
+"""
+
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# Upper bounds (seconds) of timer buckets; Prometheus adds the +Inf bucket
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+def format_value(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Counter:
+    """A value that only goes up"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        with self.lock:
+            self.value += amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {format_value(self.value)}"]
+
+class Gauge:
+    """A value that is set, or read from a function when exported"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, function: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.help = help_text
+        self.function = function
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self) -> List[str]:
+        value = self.function() if self.function else self.value
+        return [f"{self.name} {format_value(value)}"]
+
+class Timer:
+    """Durations in seconds, exported as a histogram"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        with self.lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.sum += seconds
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        """Observe the duration of a with-block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def samples(self) -> List[str]:
+        with self.lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {format_value(total)}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+class RateMeter:
+    """Events per minute over a sliding window, exported as a gauge"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, window: float = 60.0):
+        self.name = name
+        self.help = help_text
+        self.window = window
+        self.lock = threading.Lock()
+        self.events = deque()
+
+    def mark(self):
+        now = time.monotonic()
+        with self.lock:
+            self.events.append(now)
+            self.expire(now)
+
+    def expire(self, now: float):
+        """Drop events older than the window (call with the lock held)"""
+        while self.events and self.events[0] <= now - self.window:
+            self.events.popleft()
+
+    def per_minute(self) -> float:
+        with self.lock:
+            self.expire(time.monotonic())
+            return len(self.events) * 60.0 / self.window
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {format_value(round(self.per_minute(), 3))}"]
+
+class MetricsRegistry:
+    """Named metrics of one process.
+
+    Metrics are created on first use, so instrumented code only names what
+    it measures. ``render`` produces the Prometheus text format, which the
+    POS server serves on /metrics and ``start_exporter`` writes to a file
+    for a node_exporter textfile collector on tills.
+    """
+
+    def __init__(self, prefix: str = "lks_pos_"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.metrics: Dict[str, object] = {}
+        self.exporter: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+    def get(self, metric_class, name: str, help_text: str, *args):
+        full_name = self.prefix + name
+        metric = self.metrics.get(full_name)
+        if metric is None:
+            with self.lock:
+                metric = self.metrics.get(full_name)
+                if metric is None:
+                    metric = self.metrics[full_name] = metric_class(full_name, help_text, *args)
+        return metric
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        return self.get(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str = "", function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.get(Gauge, name, help_text, function)
+
+    def timer(self, name: str, help_text: str = "", buckets=DEFAULT_BUCKETS) -> Timer:
+        return self.get(Timer, name, help_text, buckets)
+
+    def rate(self, name: str, help_text: str = "", window: float = 60.0) -> RateMeter:
+        return self.get(RateMeter, name, help_text, window)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Write render() to a file, replacing it atomically so readers never see half of it"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            handle.write(self.render())
+        os.replace(temp_path, path)
+
+    def start_exporter(self, path: str, interval: float = 15.0):
+        """Rewrite the metrics file every ``interval`` seconds on a background thread"""
+        if self.exporter is not None and self.exporter.is_alive():
+            return
+        self.stop_event.clear()
+
+        def run():
+            while not self.stop_event.wait(interval):
+                try:
+                    self.write(path)
+                except OSError:
+                    pass
+            self.write(path)
+
+        self.exporter = threading.Thread(target=run, name="metrics-exporter", daemon=True)
+        self.exporter.start()
+
+    def stop_exporter(self):
+        """Write the file a last time and stop the exporter thread"""
+        if self.exporter is not None:
+            self.stop_event.set()
+            self.exporter.join(timeout=5)
+            self.exporter = None
+
+# The process-wide registry
+metrics = MetricsRegistry()
@@ -0,0 +1,214 @@
+"""
+Stall Monitor - Measures how long the Qt event loop is blocked and by which code
+"""
+
+import faulthandler
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from PySide6.QtCore import QTimer, Qt
+
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Frames from files under this directory are the application's own code
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def frame_name(frame) -> str:
+    """Module and qualified function name of a frame, e.g. pos_module:POSModule.print_receipt"""
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?').rsplit('.', 1)[-1]
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+class StallMonitor:
+    """Watches the GUI thread for event-loop stalls.
+
+    A heartbeat QTimer ticks every ``interval_ms`` on the GUI thread; how
+    late each tick fires is the event-loop latency. A sampling thread
+    notices when no tick has arrived for ``stall_ms`` and, until the next
+    one does, samples the GUI thread's stack with sys._current_frames().
+    Each stall is attributed to the action that started it (the outermost
+    application frame, usually the slot a click or scan ran) and to the
+    code it spent its time in (the innermost application frame seen most
+    often). Stalls longer than ``hang_seconds`` also get a faulthandler dump
+    of every thread, written to ``hang_log_path``.
+    """
+
+    def __init__(self, interval_ms: int = 50, stall_ms: int = 200, sample_ms: int = 20,
+                 hang_seconds: float = 5.0, recent_size: int = 50):
+        self.interval = interval_ms / 1000
+        self.stall_threshold = stall_ms / 1000
+        self.sample_interval = sample_ms / 1000
+        self.hang_seconds = hang_seconds
+        self.hang_log_path: Optional[str] = None
+        self.lock = threading.Lock()
+        self.timer: Optional[QTimer] = None
+        self.sampler: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+        self.gui_thread_id: Optional[int] = None
+        self.loop_frame = None
+        self.last_tick = 0.0
+        self.actions: Dict[str, Dict] = {}
+        self.recent = deque(maxlen=recent_size)
+
+    def start(self, hang_log_path: Optional[str] = None):
+        """Start watching; call on the GUI thread from the function that runs the event loop"""
+        if self.timer is not None:
+            return
+        self.hang_log_path = hang_log_path
+        self.gui_thread_id = threading.get_ident()
+        # Frames from here outward run the event loop itself and are not part of any action
+        self.loop_frame = sys._getframe(1)
+        self.last_tick = time.monotonic()
+
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+        self.timer.start(int(self.interval * 1000))
+
+        self.stop_event.clear()
+        self.sampler = threading.Thread(target=self.sample_loop, name="stall-sampler", daemon=True)
+        self.sampler.start()
+
+    def stop(self):
+        """Stop the heartbeat and the sampling thread, logging the report of this session's stalls"""
+        if self.timer is not None:
+            self.timer.stop()
+            self.timer = None
+        if self.sampler is not None:
+            self.stop_event.set()
+            self.sampler.join(timeout=2)
+            self.sampler = None
+        self.loop_frame = None
+        if self.actions:
+            logger.info("%s", self.format_report())
+
+    def tick(self):
+        """Heartbeat on the GUI thread"""
+        now = time.monotonic()
+        metrics.timer('ui_event_loop_lag_seconds', "How late the UI heartbeat fired").observe(
+            max(now - self.last_tick - self.interval, 0.0))
+        self.last_tick = now
+
+    def sample_loop(self):
+        """Sampling thread: wait for a stall, sample the GUI stack until it ends, then record it"""
+        stall_tick = None
+        samples: List[List[str]] = []
+        dumped = False
+        while not self.stop_event.wait(self.sample_interval):
+            last_tick = self.last_tick
+            if stall_tick is not None and last_tick != stall_tick:
+                # The heartbeat is back: the stall lasted from the tick before it to this one
+                self.record_stall(last_tick - stall_tick - self.interval, samples)
+                stall_tick, samples, dumped = None, [], False
+
+            blocked = time.monotonic() - last_tick
+            if blocked < self.stall_threshold:
+                continue
+            stall_tick = last_tick
+            stack = self.sample_stack()
+            if stack:
+                samples.append(stack)
+            if blocked >= self.hang_seconds and not dumped:
+                self.dump_hang(blocked)
+                dumped = True
+
+    def sample_stack(self) -> List[str]:
+        """Application frames of the GUI thread, outermost first
+
+        A stall entirely in library code is named after its innermost frame.
+        """
+        frame = sys._current_frames().get(self.gui_thread_id)
+        innermost = frame
+        names = []
+        while frame is not None and frame is not self.loop_frame:
+            filename = frame.f_code.co_filename
+            if filename.startswith(PROJECT_ROOT) and "site-packages" not in filename:
+                names.append(frame_name(frame))
+            frame = frame.f_back
+        if not names and innermost is not None and innermost is not self.loop_frame:
+            names.append(frame_name(innermost))
+        names.reverse()
+        return names
+
+    def record_stall(self, seconds: float, samples: List[List[str]]):
+        """Account a finished stall to its action and hottest code"""
+        action = samples[0][0] if samples else "(Qt / event loop)"
+        hot_spots = Counter(stack[-1] for stack in samples)
+        hottest = hot_spots.most_common(1)[0][0] if hot_spots else action
+        elapsed_ms = seconds * 1000
+
+        entry = {
+            'at': datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+            'action': action,
+            'hottest': hottest,
+            'elapsed_ms': round(elapsed_ms, 1),
+            'samples': len(samples),
+            'stack': samples[len(samples) // 2] if samples else [],
+        }
+        with self.lock:
+            self.recent.append(entry)
+            stats = self.actions.get(action)
+            if stats is None:
+                stats = self.actions[action] = {'action': action, 'stalls': 0, 'total_ms': 0.0,
+                                                'max_ms': 0.0, 'hot_spots': Counter()}
+            stats['stalls'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['hot_spots'].update(hot_spots)
+
+        metrics.counter('ui_stalls_total', "Times the UI was blocked longer than the stall threshold").inc()
+        metrics.timer('ui_stall_seconds', "Duration of UI stalls").observe(seconds)
+        logger.warning("UI blocked for %.0f ms in %s (hottest: %s)", elapsed_ms, action, hottest)
+
+    def dump_hang(self, blocked: float):
+        """Write every thread's stack for a stall that looks like a hang"""
+        logger.error("UI blocked for %.1f s; dumping thread stacks", blocked)
+        if not self.hang_log_path:
+            return
+        try:
+            with open(self.hang_log_path, "a", encoding="utf-8") as handle:
+                handle.write(f"\n=== UI blocked for {blocked:.1f} s at "
+                             f"{datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')} UTC ===\n")
+                handle.flush()
+                faulthandler.dump_traceback(file=handle, all_threads=True)
+        except OSError as e:
+            logger.error("Error writing hang dump: %s", e)
+
+    def report(self) -> List[Dict]:
+        """Stalls per action, most total blocked time first"""
+        with self.lock:
+            rows = [dict(stats, total_ms=round(stats['total_ms'], 1), max_ms=round(stats['max_ms'], 1),
+                         hot_spots=stats['hot_spots'].most_common(5))
+                    for stats in self.actions.values()]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+    def get_recent(self) -> List[Dict]:
+        """The latest stalls, newest first"""
+        with self.lock:
+            return list(reversed(self.recent))
+
+    def reset(self):
+        """Forget recorded stalls"""
+        with self.lock:
+            self.actions.clear()
+            self.recent.clear()
+
+    def format_report(self) -> str:
+        """Plain-text report of which actions freeze the till"""
+        lines = ["UI stalls by action (total / max / count)"]
+        for row in self.report():
+            lines.append(f"{row['total_ms']:>10.0f} ms {row['max_ms']:>8.0f} ms {row['stalls']:>5}  {row['action']}")
+            for location, count in row['hot_spots']:
+                lines.append(f"{'':>33}{count:>5} samples  {location}")
+        return "\n".join(lines)
+
+# The GUI thread's monitor
+stall_monitor = StallMonitor()